@@ -0,0 +1,111 @@
+from typing import Any, Iterable, Iterator, Union
+
+import numpy as np
+import pandas as pd
+
+from animal_logger.src.animals.animal_record import ANIMAL_FIELDS, AnimalRecord
+from animal_logger.src.animals.base_animal import BaseAnimal
+
+
+# Columns with few distinct values, stored once per value as pandas categories
+CATEGORICAL_FIELDS = ('sex', 'species', 'subspecies', 'genus', 'family', 'order',
+                      'class_', 'phylum', 'kingdom', 'domain')
+
+
+class AnimalCollection:
+    """Columnar store of a herd or a census, one typed array per attribute.
+
+    Names are kept as Python objects, ages as float64 and every other attribute as a categorical
+    column, so each taxonomy string is stored only once. Items are AnimalView objects reading
+    straight from the columns, no per-animal object is built.
+    """
+
+    __slots__ = ('_frame', '_columns')
+
+    def __init__(self, frame: pd.DataFrame) -> None:
+        frame = frame.reindex(columns=ANIMAL_FIELDS)
+        frame['name'] = frame['name'].astype(object)
+        frame['age'] = frame['age'].astype(np.float64)
+        for field in CATEGORICAL_FIELDS:
+            frame[field] = frame[field].astype('category')
+        self._frame = frame.reset_index(drop=True)
+        self._columns = {field: _column_reader(self._frame[field]) for field in ANIMAL_FIELDS}
+
+    @classmethod
+    def from_columns(cls, data: dict) -> 'AnimalCollection':
+        """Build from a columnar dict such as {'name': [...], 'age': [...], 'species': [...], ...}."""
+        return cls(pd.DataFrame(data))
+
+    @classmethod
+    def from_animals(cls, animals: Iterable[Union[BaseAnimal, dict]]) -> 'AnimalCollection':
+        """Build from BaseAnimal-like objects (BaseAnimal, AnimalRecord, AnimalView) or row dicts."""
+        columns = {field: [] for field in ANIMAL_FIELDS}
+        for animal in animals:
+            for field, values in columns.items():
+                values.append(animal.get(field) if isinstance(animal, dict) else getattr(animal, field))
+        return cls(pd.DataFrame(columns))
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        return self._frame
+
+    def record(self, idx: int) -> AnimalRecord:
+        """Copy the animal at _idx_ into an independent AnimalRecord."""
+        view = self[idx]
+        return AnimalRecord(*(getattr(view, field) for field in ANIMAL_FIELDS))
+
+    def memory_usage(self) -> int:
+        """Bytes used by the columns, string contents included."""
+        return int(self._frame.memory_usage(index=False, deep=True).sum())
+
+    def __len__(self) -> int:
+        return len(self._frame)
+
+    def __iter__(self) -> Iterator['AnimalView']:
+        for idx in range(len(self)):
+            yield AnimalView(self._columns, idx)
+
+    def __getitem__(self, idx: Union[int, slice]) -> Union['AnimalView', 'AnimalCollection']:
+        if isinstance(idx, slice):
+            return AnimalCollection(self._frame.iloc[idx])
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError(f"Animal index {idx} out of range.")
+        return AnimalView(self._columns, idx)
+
+
+class AnimalView:
+    """Read-only window on one row of an AnimalCollection, usable wherever a BaseAnimal is expected."""
+
+    __slots__ = ('_columns', '_idx')
+
+    def __init__(self, columns: dict, idx: int) -> None:
+        self._columns = columns
+        self._idx = idx
+
+    __str__ = BaseAnimal.__str__
+
+    def __repr__(self) -> str:
+        return f"AnimalView({self._idx}, {self.name!r})"
+
+
+def _column_reader(series: pd.Series) -> Any:
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes = series.cat.codes.to_numpy()
+        categories = np.append(series.cat.categories.to_numpy(dtype=object), None)
+        # Code -1 (missing value) picks the trailing None
+        return lambda idx: categories[codes[idx]]
+    return series.to_numpy().__getitem__
+
+
+def _view_property(field: str) -> property:
+    def getter(self: AnimalView) -> Any:
+        return self._columns[field](self._idx)
+    return property(getter)
+
+
+for _field in ANIMAL_FIELDS:
+    setattr(AnimalView, _field, _view_property(_field))
+
+BaseAnimal.register(AnimalView)
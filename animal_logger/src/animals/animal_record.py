@@ -0,0 +1,37 @@
+from typing import NamedTuple, Optional
+
+from animal_logger.src.animals.base_animal import BaseAnimal
+
+
+ANIMAL_FIELDS = ('name', 'age', 'species', 'subspecies', 'sex', 'genus', 'family',
+                 'order', 'class_', 'phylum', 'kingdom', 'domain')
+
+
+class AnimalRecord(NamedTuple):
+    """Immutable, tuple-backed animal with the same constructor and attributes as BaseAnimal.
+
+    It has no per-instance __dict__, so it is the representation to use when many individual
+    animals must be kept around.
+    """
+
+    name: str
+    age: float
+    species: str
+    subspecies: str
+    sex: Optional[str] = None
+    genus: Optional[str] = None
+    family: Optional[str] = None
+    order: Optional[str] = None
+    class_: Optional[str] = None
+    phylum: Optional[str] = None
+    kingdom: Optional[str] = None
+    domain: Optional[str] = None
+
+    __str__ = BaseAnimal.__str__
+
+    @classmethod
+    def from_animal(cls, animal: BaseAnimal) -> 'AnimalRecord':
+        return cls(*(getattr(animal, field) for field in ANIMAL_FIELDS))
+
+
+BaseAnimal.register(AnimalRecord)
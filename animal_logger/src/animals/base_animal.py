@@ -3,6 +3,9 @@ from abc import ABC
 
 class BaseAnimal(ABC):
 
+    __slots__ = ('_name', '_age', '_sex', '_domain', '_kingdom', '_phylum', '_class',
+                 '_order', '_family', '_genus', '_subspecies', '_species')
+
     def __init__(self,
                  name: str,
                  age: float,
@@ -30,7 +33,7 @@ class BaseAnimal(ABC):
         self._species = species
 
     def __str__(self) -> str:
-        return f"{self._name.capitalize()} ({self._age}) - {self._sex} {self.species} ({self.subspecies})"
+        return f"{self.name.capitalize()} ({self.age}) - {self.sex} {self.species} ({self.subspecies})"
 
     @property
     def name(self) -> str:
@@ -3,5 +3,7 @@ from animal_logger.src.animals.base_animal import BaseAnimal
 
 class Mammal(BaseAnimal):
 
+    __slots__ = ()
+
     def __init__(self, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
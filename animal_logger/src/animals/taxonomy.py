@@ -0,0 +1,217 @@
+import gzip
+import json
+import sys
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from animal_logger.src.animals.base_animal import BaseAnimal
+
+
+TAXONOMY_RANKS = ('domain', 'kingdom', 'phylum', 'class_', 'order', 'family', 'genus', 'species', 'subspecies')
+ROOT = 0
+
+
+class TaxonomyIndex:
+    """Tree of taxa where every node is stored once and animals only keep the id of their node.
+
+    Nodes live in parallel lists indexed by node id (name, rank, parent, children). Names are
+    interned. The number of animals in each subtree, and per taxon name of each rank, is kept up to
+    date on insertion, so counts are O(1). The tree is at most len(TAXONOMY_RANKS) deep: descendant
+    tests walk up the parents in O(1), subtree listings walk down the children in O(size of the
+    answer), and insertions never invalidate anything.
+    """
+
+    def __init__(self) -> None:
+        self._names: List[str] = ['']
+        self._ranks: List[int] = [-1]
+        self._parents: List[int] = [-1]
+        self._children: List[List[int]] = [[]]
+        self._child_ids: Dict[tuple, int] = {}
+        self._nodes_by_name: Dict[tuple, List[int]] = {}
+        self._subtree_animals: List[int] = [0]
+        self._animal_nodes: Dict[Hashable, int] = {}
+        self._node_animals: Dict[int, List[Hashable]] = {}
+        self._rank_animals: List[Counter] = [Counter() for _ in TAXONOMY_RANKS]
+
+    def __len__(self) -> int:
+        """Number of taxa, the root excluded."""
+        return len(self._names) - 1
+
+    @property
+    def n_animals(self) -> int:
+        return self._subtree_animals[ROOT]
+
+    def add(self, taxonomy: Union[BaseAnimal, dict, Sequence[Optional[str]]], animal_id: Hashable = None) -> int:
+        """Insert the lineage of an animal, creating the missing taxa, and return its deepest node.
+
+        Args:
+            taxonomy (Union[BaseAnimal, dict, Sequence[Optional[str]]]): Animal, row dict with the rank
+                names as keys, or names ordered as TAXONOMY_RANKS. Missing ranks are skipped.
+            animal_id (Hashable, optional): Identifier of the animal, counted under its node. Defaults to
+                None (only the taxa are inserted).
+
+        Returns:
+            int: Node id of the most specific taxon.
+        """
+        node = ROOT
+        for rank, name in enumerate(self._lineage_names(taxonomy)):
+            name = _taxon_name(name)
+            if name is None:
+                continue
+            child = self._child_ids.get((node, rank, name))
+            node = child if child is not None else self._create_node(node, rank, name)
+        if animal_id is not None:
+            self._assign(animal_id, node)
+        return node
+
+    def add_rows(self, rows: Iterable[Union[dict, BaseAnimal]], id_col: Optional[str] = 'id') -> None:
+        """Insert database rows (dicts or BaseAnimal objects) incrementally, e.g. a chunk of get_table."""
+        for row in rows:
+            animal_id = row.get(id_col) if isinstance(row, dict) and id_col else None
+            self.add(row, animal_id)
+
+    def find(self, rank: str, name: str) -> List[int]:
+        """Node ids of the taxa of _rank_ called _name_ (usually a single one)."""
+        return list(self._nodes_by_name.get((TAXONOMY_RANKS.index(rank), name), ()))
+
+    def items(self) -> Iterator[Tuple[Hashable, int]]:
+        """(animal id, node id) of every animal in the index."""
+        return iter(self._animal_nodes.items())
+
+    def node_of(self, animal_id: Hashable) -> int:
+        return self._animal_nodes[animal_id]
+
+    def name(self, node: int) -> str:
+        return self._names[node]
+
+    def rank(self, node: int) -> str:
+        return TAXONOMY_RANKS[self._ranks[node]]
+
+    def ancestors(self, node: int) -> List[int]:
+        """Ancestors of _node_ from its parent up to the top rank. There are at most len(TAXONOMY_RANKS)."""
+        ancestors = []
+        node = self._parents[node]
+        while node > ROOT:
+            ancestors.append(node)
+            node = self._parents[node]
+        return ancestors
+
+    def lineage(self, node: int) -> Dict[str, str]:
+        """{rank: name} from the top rank down to _node_."""
+        nodes = [node, *self.ancestors(node)] if node != ROOT else []
+        return {self.rank(n): self._names[n] for n in reversed(nodes)}
+
+    def is_descendant(self, node: int, ancestor: int) -> bool:
+        """Whether _node_ is _ancestor_ or lies in its subtree, in O(1)."""
+        while node != -1:
+            if node == ancestor:
+                return True
+            node = self._parents[node]
+        return False
+
+    def subtree(self, node: int) -> List[int]:
+        """Node ids of _node_ and all of its descendants, in pre-order."""
+        nodes = []
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            nodes.append(node)
+            stack.extend(reversed(self._children[node]))
+        return nodes
+
+    def animals_under(self, rank: str, name: str) -> List[Hashable]:
+        """Ids of all animals under a taxon, e.g. animals_under('order', 'carnivora')."""
+        return [animal_id
+                for node in self.find(rank, name)
+                for child in self.subtree(node)
+                for animal_id in self._node_animals.get(child, ())]
+
+    def count_under(self, rank: str, name: str) -> int:
+        """Number of animals under a taxon, in O(1)."""
+        return sum(self._subtree_animals[node] for node in self.find(rank, name))
+
+    def count_by_rank(self, rank: str) -> Counter:
+        """Number of animals per taxon of _rank_, e.g. count_by_rank('class_'), in O(taxa of the rank)."""
+        # Unary plus copies the counter without the taxa left empty by reassigned animals
+        return +self._rank_animals[TAXONOMY_RANKS.index(rank)]
+
+    def save(self, path: Union[str, Path]) -> None:
+        """Write the index to a gzipped JSON file, so it can be loaded at startup instead of rebuilt."""
+        data = {
+            'ranks': list(TAXONOMY_RANKS),
+            'names': self._names,
+            'node_ranks': self._ranks,
+            'parents': self._parents,
+            'animals': [[animal_id, node] for animal_id, node in self.items()],
+        }
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            json.dump(data, f)
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> 'TaxonomyIndex':
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+        if tuple(data['ranks']) != TAXONOMY_RANKS:
+            raise ValueError(f"Taxonomy index '{path}' was saved with different ranks: {data['ranks']}.")
+        index = cls()
+        # Parents are always created before their children, so nodes can be replayed in order
+        for name, rank, parent in zip(data['names'][1:], data['node_ranks'][1:], data['parents'][1:]):
+            index._create_node(parent, rank, name)
+        for animal_id, node in data['animals']:
+            index._assign(_as_key(animal_id), node)
+        return index
+
+    def _create_node(self, parent: int, rank: int, name: str) -> int:
+        name = sys.intern(name)
+        node = len(self._names)
+        self._names.append(name)
+        self._ranks.append(rank)
+        self._parents.append(parent)
+        self._children.append([])
+        self._children[parent].append(node)
+        self._subtree_animals.append(0)
+        self._child_ids[(parent, rank, name)] = node
+        self._nodes_by_name.setdefault((rank, name), []).append(node)
+        return node
+
+    def _assign(self, animal_id: Hashable, node: int) -> None:
+        previous = self._animal_nodes.get(animal_id)
+        if previous is not None:
+            self._node_animals[previous].remove(animal_id)
+            self._update_counts(previous, -1)
+        self._animal_nodes[animal_id] = node
+        self._node_animals.setdefault(node, []).append(animal_id)
+        self._update_counts(node, 1)
+
+    def _update_counts(self, node: int, delta: int) -> None:
+        while node != ROOT:
+            self._subtree_animals[node] += delta
+            self._rank_animals[self._ranks[node]][self._names[node]] += delta
+            node = self._parents[node]
+        self._subtree_animals[ROOT] += delta
+
+    @staticmethod
+    def _lineage_names(taxonomy: Any) -> List[Optional[str]]:
+        if isinstance(taxonomy, dict):
+            return [taxonomy.get(rank) for rank in TAXONOMY_RANKS]
+        if isinstance(taxonomy, BaseAnimal):
+            return [getattr(taxonomy, rank) for rank in TAXONOMY_RANKS]
+        return list(taxonomy)
+
+
+def _as_key(animal_id: Any) -> Hashable:
+    """Animal id read back from JSON, where tuples (e.g. composite keys) come back as lists."""
+    return tuple(_as_key(value) for value in animal_id) if isinstance(animal_id, list) else animal_id
+
+
+def _taxon_name(value: Any) -> Optional[str]:
+    """Name of a taxon read from a row: None for missing values (None, NaN, pd.NA), a str otherwise."""
+    if value is None:
+        return None
+    try:
+        if value != value:  # NaN
+            return None
+    except TypeError:  # pd.NA cannot be compared
+        return None
+    return value if isinstance(value, str) else str(value)
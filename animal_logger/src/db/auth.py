@@ -0,0 +1,177 @@
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple, Union
+
+import sqlalchemy
+from sqlalchemy import column, select, table
+
+from config.log_config import LOGGER
+
+
+HASH_ALGORITHM = 'pbkdf2_sha256'
+HASH_ITERATIONS = 200_000
+
+
+def hash_password(password: str, salt: Optional[str] = None, iterations: int = HASH_ITERATIONS) -> str:
+    """Return a salted PBKDF2 hash of the type 'pbkdf2_sha256$<iterations>$<salt>$<hex digest>'."""
+    salt = salt or secrets.token_hex(16)
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), iterations)
+    return f"{HASH_ALGORITHM}${iterations}${salt}${digest.hex()}"
+
+
+def verify_password(password: str, stored_hash: Union[str, bytes]) -> bool:
+    """Check _password_ against a hash created by hash_password, in constant time.
+
+    Malformed hashes, e.g. a legacy plaintext password, never match.
+    """
+    try:
+        stored_hash = _as_text(stored_hash)
+        algorithm, iterations, salt, _ = stored_hash.split('$')
+        iterations = int(iterations)
+    except (AttributeError, ValueError):  # UnicodeDecodeError is a ValueError
+        return False
+    if algorithm != HASH_ALGORITHM or iterations < 1:
+        return False
+    return hmac.compare_digest(hash_password(password, salt, iterations).encode(), stored_hash.encode())
+
+
+def is_password_hash(value: Union[str, bytes]) -> bool:
+    """Whether _value_ was created by hash_password, rather than being a legacy plaintext password."""
+    try:
+        return _as_text(value).startswith(f"{HASH_ALGORITHM}$")
+    except (AttributeError, ValueError):
+        return False
+
+
+def _as_text(value: Union[str, bytes]) -> str:
+    # Some drivers return text columns as bytes or memoryview
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).decode()
+    return value
+
+
+class AuthService:
+    """Check app credentials with one indexed lookup per username.
+
+    The password column of the login table stores hashes built with hash_password. Legacy plaintext
+    passwords are still accepted, and replaced by their hash on the first successful login. Results are
+    cached for a short time, keyed by username and a digest of the password, so repeated attempts do not
+    hit the database nor re-run the key derivation.
+    """
+
+    def __init__(self,
+                 engine: sqlalchemy.Engine,
+                 schema: str = 'credentials',
+                 table_name: str = 'login_app',
+                 ttl: float = 30.0,
+                 negative_ttl: float = 5.0,
+                 max_entries: int = 1024) -> None:
+        self.engine = engine
+        self.schema = schema
+        self.table_name = table_name
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._table = table(table_name, column('username'), column('password'), schema=schema)
+        self._lookup = (select(self._table.c.password)
+                        .where(self._table.c.username == sqlalchemy.bindparam('username'))
+                        .limit(1))
+        self._cache: OrderedDict[Tuple[str, bytes], Tuple[bool, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def authenticate(self, username: str, password: str) -> bool:
+        """Return whether _username_ exists and _password_ matches its stored hash.
+
+        Database errors (e.g. invalid DB credentials) are raised to the caller.
+        """
+        key = (username, hashlib.sha256(password.encode()).digest())
+        cached = self._get_cached(key)
+        if cached is not None:
+            return cached
+        stored_hash = self._fetch_hash(username)
+        if stored_hash is None:
+            is_valid = False
+        elif is_password_hash(stored_hash):
+            is_valid = verify_password(password, stored_hash)
+        else:
+            is_valid = self._verify_legacy(username, password, stored_hash)
+        self._set_cached(key, is_valid)
+        return is_valid
+
+    def set_password(self, username: str, password: str) -> None:
+        """Store the hash of _password_ for _username_, creating the user if needed."""
+        password_hash = hash_password(password)
+        with self.engine.begin() as conn:
+            updated = conn.execute(
+                self._table.update().where(self._table.c.username == username).values(password=password_hash)
+            ).rowcount
+            if not updated:
+                conn.execute(self._table.insert().values(username=username, password=password_hash))
+        self.invalidate(username)
+
+    def ensure_index(self) -> None:
+        """Create the index on the username column the lookup relies on."""
+        index = sqlalchemy.Index(f"ix_{self.table_name}_username", self._reflect_table().c.username)
+        index.create(self.engine, checkfirst=True)
+        LOGGER.info(f"Index on '{self.schema}.{self.table_name}.username' is in place.")
+
+    def invalidate(self, username: Optional[str] = None) -> None:
+        """Drop the cached results of _username_, or all of them."""
+        with self._lock:
+            if username is None:
+                self._cache.clear()
+            else:
+                for key in [key for key in self._cache if key[0] == username]:
+                    del self._cache[key]
+
+    def _fetch_hash(self, username: str) -> Optional[str]:
+        with self.engine.connect() as conn:
+            return conn.execute(self._lookup, {'username': username}).scalar_one_or_none()
+
+    def _verify_legacy(self, username: str, password: str, stored_password: Union[str, bytes]) -> bool:
+        """Check _password_ against a plaintext _stored_password_, and store its hash instead on success."""
+        try:
+            is_valid = hmac.compare_digest(password.encode(), _as_text(stored_password).encode())
+        except (AttributeError, ValueError):
+            return False
+        if not is_valid:
+            return False
+        try:
+            with self.engine.begin() as conn:
+                # Only if the password was not changed meanwhile
+                conn.execute(self._table.update()
+                             .where(self._table.c.username == username, self._table.c.password == stored_password)
+                             .values(password=hash_password(password)))
+            LOGGER.info(f"Plaintext password of user '{username}' replaced by its hash.")
+        except sqlalchemy.exc.DBAPIError as e:
+            # E.g. no UPDATE rights on the login table: the login goes on, the hash is stored next time
+            LOGGER.warning(f"Could not hash the plaintext password of user '{username}': {e}")
+        return True
+
+    def _reflect_table(self) -> sqlalchemy.Table:
+        return sqlalchemy.Table(self.table_name, sqlalchemy.MetaData(), schema=self.schema,
+                                autoload_with=self.engine)
+
+    def _get_cached(self, key: Tuple[str, bytes]) -> Optional[bool]:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            is_valid, expires = entry
+            if expires < time.monotonic():
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return is_valid
+
+    def _set_cached(self, key: Tuple[str, bytes], is_valid: bool) -> None:
+        ttl = self.ttl if is_valid else self.negative_ttl
+        with self._lock:
+            self._cache[key] = (is_valid, time.monotonic() + ttl)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
@@ -0,0 +1,238 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import sqlalchemy
+
+from config.log_config import LOGGER
+from animal_logger.src.db.bulk_load import iter_row_batches
+from animal_logger.src.db.merge import BatchMerger
+from animal_logger.src.db.metrics import current_operation, in_context
+
+
+class WriterMetrics:
+    """Thread-safe throughput and latency figures of a ConcurrentBatchWriter run."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.rows_written = 0
+        self.rows_updated = 0
+        self.rows_skipped = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.retries = 0
+        self.latencies = []
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def record_batch(self, latency: float, written: int, skipped: int, updated: int = 0) -> None:
+        with self._lock:
+            self.batches += 1
+            self.rows_written += written
+            self.rows_updated += updated
+            self.rows_skipped += skipped
+            self.latencies.append(latency)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failed_batches += 1
+
+    def record_retry(self) -> None:
+        with self._lock:
+            self.retries += 1
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows_written / self.elapsed if self.elapsed else 0.0
+
+    def latency_percentile(self, percentile: float) -> float:
+        """Batch latency in seconds at the given percentile (0-100)."""
+        with self._lock:
+            latencies = sorted(self.latencies)
+        if not latencies:
+            return 0.0
+        idx = min(len(latencies) - 1, round(percentile / 100 * (len(latencies) - 1)))
+        return latencies[idx]
+
+    def snapshot(self) -> dict:
+        return {
+            'rows_written': self.rows_written,
+            'rows_updated': self.rows_updated,
+            'rows_skipped': self.rows_skipped,
+            'batches': self.batches,
+            'failed_batches': self.failed_batches,
+            'retries': self.retries,
+            'elapsed_s': self.elapsed,
+            'rows_per_second': self.rows_per_second,
+            'latency_p50_s': self.latency_percentile(50),
+            'latency_p95_s': self.latency_percentile(95),
+            'latency_max_s': self.latency_percentile(100),
+        }
+
+    def __str__(self) -> str:
+        return (f"{self.rows_written} rows written, {self.rows_updated} updated, {self.rows_skipped} skipped "
+                f"in {self.batches} batches "
+                f"({self.failed_batches} failed, {self.retries} retries), {self.rows_per_second:,.0f} rows/s, "
+                f"p95 batch latency {self.latency_percentile(95) * 1000:.1f} ms")
+
+
+class ConcurrentBatchWriter:
+    """Write independent batches through a bounded thread pool.
+
+    Every batch runs in its own transaction on a connection checked out from the engine pool, so
+    the pool size should be at least _max_workers_. Transient errors (dropped connections, locked
+    SQLite files...) are retried with exponential backoff. Each batch is inserted inside a savepoint:
+    on IntegrityError the batch is bisected so that only the offending rows are skipped.
+
+    With _on_conflict_ set, batches are merged instead, see merge.BatchMerger: rows whose primary
+    key exists are updated ('update') or ignored ('nothing') in set-based statements.
+
+    _on_written(table, columns, inserted, updated)_ is called from the writer threads with the rows
+    of each committed batch that were inserted, and those that updated an existing row. Skipped rows
+    are in neither list.
+    """
+
+    def __init__(self,
+                 engine: sqlalchemy.Engine,
+                 max_workers: int = 4,
+                 max_retries: int = 3,
+                 retry_backoff: float = 0.1,
+                 on_conflict: Optional[str] = None,
+                 update_policies: Optional[Dict[str, str]] = None,
+                 on_written: Optional[Callable[[sqlalchemy.Table, List[str], List[tuple], List[tuple]], None]] = None) -> None:
+        self.engine = engine
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.on_conflict = on_conflict
+        self.update_policies = update_policies
+        self.on_written = on_written
+
+    def write(self, source: Any, model: Any, batch_size: int = 10_000) -> WriterMetrics:
+        """Insert _source_ into the table of _model_.
+
+        Args:
+            source (Any): Any input accepted by bulk_load.iter_row_batches.
+            model (Any): Declarative model class or sqlalchemy.Table.
+            batch_size (int, optional): Maximum rows per batch. Defaults to 10_000.
+
+        Returns:
+            WriterMetrics: Rows written and skipped, throughput and batch latencies.
+        """
+        table = getattr(model, '__table__', model)
+        metrics = WriterMetrics()
+        merger = None
+        if self.on_conflict is not None:
+            merger = BatchMerger(table, self.engine.dialect.name, self.on_conflict, self.update_policies)
+        # At most two batches per worker wait in memory
+        in_flight = threading.BoundedSemaphore(2 * self.max_workers)
+        LOGGER.info(f"Starting data storage in DB for table '{table.name}'.")
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='db-writer') as pool:
+            for columns, rows in iter_row_batches(source, batch_size):
+                in_flight.acquire()
+                future = pool.submit(in_context(self._write_batch), table, columns, rows, metrics, merger)
+                future.add_done_callback(lambda _: in_flight.release())
+        metrics.finished = time.perf_counter()
+        LOGGER.info(f"Table '{table.name}' stored in DB: {metrics}.")
+        return metrics
+
+    def _write_batch(self, table: sqlalchemy.Table, columns: List[str], rows: List[tuple],
+                     metrics: WriterMetrics, merger: Optional[BatchMerger] = None) -> None:
+        start = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self.engine.connect() as conn, self._transaction(conn):
+                    if merger is not None:
+                        written_rows, updated_rows, skipped_rows = merger.merge(conn, columns, rows)
+                        skipped = len(skipped_rows)
+                    else:
+                        written_rows, skipped = self._insert_with_savepoints(conn, table, columns, rows)
+                        updated_rows = []
+                metrics.record_batch(time.perf_counter() - start, len(written_rows), skipped, len(updated_rows))
+                current_operation().record_batch(len(rows))
+                break
+            except sqlalchemy.exc.DBAPIError as e:
+                if attempt < self.max_retries and _is_transient(e):
+                    metrics.record_retry()
+                    LOGGER.debug(f"Transient error writing to '{table.name}', retrying: {e}")
+                    time.sleep(self.retry_backoff * 2 ** attempt)
+                    continue
+                metrics.record_failure()
+                LOGGER.error(f"An error occurred when inserting data into database: {e}.")
+                return
+            except Exception as e:
+                metrics.record_failure()
+                LOGGER.error(f"An error occurred when inserting data into database: {e}.")
+                return
+        # The batch is committed: a failing listener must not count it as failed, nor retry it
+        if (written_rows or updated_rows) and self.on_written is not None:
+            try:
+                self.on_written(table, columns, written_rows, updated_rows)
+            except Exception as e:
+                LOGGER.error(f"Listener of the rows written to '{table.name}' failed: {e}")
+
+    def _transaction(self, conn: sqlalchemy.Connection):
+        if conn.dialect.name == 'sqlite':
+            return _sqlite_write_transaction(conn)
+        return conn.begin()
+
+    def _insert_with_savepoints(self, conn: sqlalchemy.Connection, table: sqlalchemy.Table,
+                                columns: List[str], rows: List[tuple]) -> Tuple[List[tuple], int]:
+        """Rows of _rows_ inserted, and the number of rows skipped."""
+        try:
+            with conn.begin_nested():
+                conn.execute(table.insert(), [dict(zip(columns, row)) for row in rows])
+            return rows, 0
+        except sqlalchemy.exc.IntegrityError as e:
+            if len(rows) == 1:
+                LOGGER.warning(f"Skipping row {rows[0]} of table '{table.name}': {e.orig}")
+                return [], 1
+        middle = len(rows) // 2
+        written_left, skipped_left = self._insert_with_savepoints(conn, table, columns, rows[:middle])
+        written_right, skipped_right = self._insert_with_savepoints(conn, table, columns, rows[middle:])
+        return written_left + written_right, skipped_left + skipped_right
+
+
+# Messages of OperationalErrors worth retrying: locks, busy files, deadlocks and serialization failures
+_TRANSIENT_MESSAGES = ('database is locked', 'database table is locked', 'database is busy', 'deadlock',
+                       'could not serialize', 'lock wait timeout', 'lock timeout', 'server closed the connection',
+                       'connection reset', 'connection refused', 'terminating connection')
+
+
+def _is_transient(error: sqlalchemy.exc.DBAPIError) -> bool:
+    """Whether _error_ may go away by itself, unlike e.g. a missing table or a syntax error."""
+    if error.connection_invalidated:
+        return True
+    if not isinstance(error, sqlalchemy.exc.OperationalError):
+        return False
+    message = str(error.orig).lower()
+    return any(transient in message for transient in _TRANSIENT_MESSAGES)
+
+
+@contextmanager
+def _sqlite_write_transaction(conn: sqlalchemy.Connection) -> Iterator[None]:
+    """Transaction of a writer connection, begun with BEGIN IMMEDIATE.
+
+    pysqlite's implicit transactions break SAVEPOINT, so the driver is put in autocommit mode and
+    the transaction is begun explicitly, for this connection only: other users of the engine, e.g.
+    readers, keep their deferred transactions. BEGIN IMMEDIATE takes the write lock up front, so
+    concurrent writers wait on the busy timeout instead of failing when upgrading a read transaction.
+    """
+    dbapi_connection = conn.connection.dbapi_connection
+    isolation_level = dbapi_connection.isolation_level
+    dbapi_connection.isolation_level = None
+    try:
+        with conn.begin():
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+            yield
+    finally:
+        try:
+            dbapi_connection.isolation_level = isolation_level
+        except Exception:
+            pass  # Closed after an invalidation, the pool discards it anyway
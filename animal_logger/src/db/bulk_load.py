@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import csv
+import io
+import time
+import tracemalloc
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+
+import sqlalchemy
+
+from config.log_config import LOGGER
+from animal_logger.src.lazy import lazy_import
+
+pd = lazy_import('pandas')
+dd = lazy_import('dask.dataframe')
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+
+RowBatch = Tuple[List[str], List[tuple]]
+
+
+class LoadStats:
+    """Counters collected while streaming rows into a table."""
+
+    def __init__(self) -> None:
+        self.rows = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.seconds = 0.0
+        self.peak_traced_bytes = None
+        self.peak_rss_bytes = None
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def __str__(self) -> str:
+        message = (f"{self.rows} rows in {self.batches} batches ({self.failed_batches} failed), "
+                   f"{self.seconds:.2f} s, {self.rows_per_second:,.0f} rows/s")
+        if self.peak_traced_bytes is not None:
+            message += f", peak traced memory {self.peak_traced_bytes / 2**20:.1f} MiB"
+        if self.peak_rss_bytes is not None:
+            message += f", peak RSS {self.peak_rss_bytes / 2**20:.1f} MiB"
+        return message
+
+
+def iter_row_batches(source: Any, batch_size: int = 10_000) -> Iterator[RowBatch]:
+    """Yield (columns, rows) pairs of at most _batch_size_ rows without materialising the whole source.
+
+    Args:
+        source (Any): Columnar dict of lists or arrays, pd.DataFrame, dd.DataFrame (read one partition
+                      at a time), or an iterable of row dicts or of pd.DataFrame chunks.
+        batch_size (int, optional): Maximum number of rows per batch. Defaults to 10_000.
+
+    Yields:
+        RowBatch: Column names and a list of row tuples.
+    """
+    if isinstance(source, dict):
+        yield from _iter_columnar(source, batch_size)
+    elif isinstance(source, pd.DataFrame):
+        yield from _iter_pandas(source, batch_size)
+    elif isinstance(source, dd.DataFrame):
+        for partition in source.partitions:
+            yield from _iter_pandas(partition.compute(), batch_size)
+    else:
+        yield from _iter_iterable(source, batch_size)
+
+
+def _iter_columnar(data_dict: dict, batch_size: int) -> Iterator[RowBatch]:
+    columns = list(data_dict)
+    n_rows = len(data_dict[columns[0]]) if columns else 0
+    for start in range(0, n_rows, batch_size):
+        chunk = [_as_list(data_dict[col][start: start + batch_size]) for col in columns]
+        yield columns, list(zip(*chunk))
+
+
+def _iter_pandas(df: pd.DataFrame, batch_size: int) -> Iterator[RowBatch]:
+    if df.index.name is not None:
+        df = df.reset_index()
+    columns = [str(col) for col in df.columns]
+    for start in range(0, len(df), batch_size):
+        chunk = df.iloc[start: start + batch_size].astype(object)
+        chunk = chunk.where(chunk.notna(), None)
+        yield columns, list(chunk.itertuples(index=False, name=None))
+
+
+def _iter_iterable(rows: Iterable, batch_size: int) -> Iterator[RowBatch]:
+    columns, batch = None, []
+    for item in rows:
+        if isinstance(item, pd.DataFrame):
+            # Chunks of a larger source, e.g. pd.read_csv(..., chunksize=...)
+            yield from _iter_pandas(item, batch_size)
+            continue
+        if columns is None:
+            columns = list(item)
+        batch.append(tuple(item[col] for col in columns))
+        if len(batch) == batch_size:
+            yield columns, batch
+            batch = []
+    if batch:
+        yield columns, batch
+
+
+def _as_list(values: Any) -> list:
+    return values.tolist() if hasattr(values, 'tolist') else list(values)
+
+
+class BulkLoader:
+    """Stream rows into a table in bounded-memory batches.
+
+    PostgreSQL engines running on psycopg2 use COPY FROM STDIN, every other backend uses
+    executemany through SQLAlchemy Core.
+    """
+
+    def __init__(self, engine: sqlalchemy.Engine, track_memory: bool = False) -> None:
+        self.engine = engine
+        self.track_memory = track_memory
+
+    @property
+    def supports_copy(self) -> bool:
+        return self.engine.dialect.name == 'postgresql' and self.engine.dialect.driver == 'psycopg2'
+
+    def load(self, source: Any, model: Any, batch_size: int = 10_000) -> LoadStats:
+        """Insert _source_ into the table of _model_.
+
+        Args:
+            source (Any): Any input accepted by iter_row_batches.
+            model (Any): Declarative model class or sqlalchemy.Table.
+            batch_size (int, optional): Maximum rows sent to the DB per round trip. Defaults to 10_000.
+
+        Returns:
+            LoadStats: Throughput and memory figures of the load.
+        """
+        table = getattr(model, '__table__', model)
+        stats = LoadStats()
+        write_batch = self._copy_batch if self.supports_copy else self._executemany_batch
+        if self.track_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        LOGGER.info(f"Starting data storage in DB for table '{table.name}'.")
+        try:
+            for columns, rows in iter_row_batches(source, batch_size):
+                stats.batches += 1
+                try:
+                    write_batch(table, columns, rows)
+                    stats.rows += len(rows)
+                    LOGGER.debug(f"Batch number {stats.batches} of table '{table.name}' has been stored in DB.")
+                except sqlalchemy.exc.IntegrityError as e:
+                    stats.failed_batches += 1
+                    LOGGER.warning(f"Duplicated primary key entries. Skipping. Error log: \n {e}")
+                except Exception as e:
+                    stats.failed_batches += 1
+                    LOGGER.error(f"An error occurred when inserting data into database: {e}.")
+        finally:
+            stats.seconds = time.perf_counter() - start
+            if self.track_memory:
+                stats.peak_traced_bytes = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            stats.peak_rss_bytes = _peak_rss_bytes()
+        LOGGER.info(f"Table '{table.name}' stored in DB: {stats}.")
+        return stats
+
+    def _executemany_batch(self, table: sqlalchemy.Table, columns: List[str], rows: List[tuple]) -> None:
+        with self.engine.begin() as conn:
+            conn.execute(table.insert(), [dict(zip(columns, row)) for row in rows])
+
+    def _copy_batch(self, table: sqlalchemy.Table, columns: List[str], rows: List[tuple]) -> None:
+        buffer = io.StringIO()
+        csv.writer(buffer, quoting=csv.QUOTE_NOTNULL).writerows(rows)
+        buffer.seek(0)
+        preparer = self.engine.dialect.identifier_preparer
+        target = preparer.format_table(table)
+        column_list = ", ".join(preparer.quote(col) for col in columns)
+        raw_conn = self.engine.raw_connection()
+        try:
+            with raw_conn.cursor() as cursor:
+                cursor.copy_expert(f"COPY {target} ({column_list}) FROM STDIN WITH (FORMAT csv)", buffer)
+            raw_conn.commit()
+        except Exception as e:
+            raw_conn.rollback()
+            # Surface unique violations the same way the executemany path does
+            if getattr(e, 'pgcode', None) == '23505':
+                raise sqlalchemy.exc.IntegrityError(f"COPY {target}", None, e) from e
+            raise
+        finally:
+            raw_conn.close()
+
+
+def _peak_rss_bytes() -> Optional[int]:
+    if resource is None:
+        return None
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
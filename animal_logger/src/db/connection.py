@@ -1,13 +1,15 @@
-from sqlalchemy import MetaData, create_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
+import threading
+import time
+from typing import Dict, Optional, Tuple, Union
 
-from config.config import Config
+from sqlalchemy import Engine, MetaData, create_engine, event
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import QueuePool
 
+from animal_logger.src.db.metrics import METRICS, watch_engine
 
-# used to create a database engine
-# the engine manages the database connection.
-# The echo=True argument is optional and is often used for debugging purposes (turned off)
-engine = create_engine(Config.get_info()['db_url'])
 
 # used to create a models (tables) based on an object-oriented approach
 Base = declarative_base()
@@ -15,5 +17,153 @@ Base = declarative_base()
 # Manages information about the database schema
 metadata = MetaData()
 
-# used to manage database sessions for your application
-SessionLocal = sessionmaker(bind=engine)
\ No newline at end of file
+# used to manage database sessions for your application, bind it with SessionLocal(bind=get_engine(url))
+SessionLocal = sessionmaker()
+
+
+class PoolStats:
+    """Checkout and wait statistics of a connection pool."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkins = 0
+        self.waits = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.timeouts = 0
+
+    def record_wait(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            self.waits += 1
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+            self.timeouts += timed_out
+
+    def record_checkout(self) -> None:
+        with self._lock:
+            self.checkouts += 1
+
+    def record_checkin(self) -> None:
+        with self._lock:
+            self.checkins += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'checkouts': self.checkouts,
+                'checked_out': self.checkouts - self.checkins,
+                'waits': self.waits,
+                'mean_wait_s': self.total_wait / self.waits if self.waits else 0.0,
+                'max_wait_s': self.max_wait,
+                'timeouts': self.timeouts,
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool timing how long callers wait to get a connection."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+        event.listen(self, 'checkout', lambda *_: self.stats.record_checkout())
+        event.listen(self, 'checkin', lambda *_: self.stats.record_checkin())
+
+    def _do_get(self):
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            timed_out = True
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            self.stats.record_wait(waited, timed_out)
+            METRICS.record_pool_wait(waited)
+
+
+class EngineRegistry:
+    """Process-wide cache of engines keyed by URL (credentials included) and pool settings.
+
+    Every engine owns a connection pool, so engines must be reused rather than created per call
+    and disposed explicitly once their credentials are no longer valid.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._engines: Dict[Tuple, Engine] = {}
+
+    def get_engine(self,
+                   url: Union[str, URL],
+                   pool_size: int = 5,
+                   max_overflow: int = 10,
+                   pool_timeout: float = 30,
+                   pool_pre_ping: bool = True) -> Engine:
+        """Return the engine for _url_, creating it on first use.
+
+        Args:
+            url (Union[str, URL]): Database URL, credentials included.
+            pool_size (int, optional): Connections kept open in the pool. Defaults to 5.
+            max_overflow (int, optional): Extra connections allowed above pool_size. Defaults to 10.
+            pool_timeout (float, optional): Seconds to wait for a free connection. Defaults to 30.
+            pool_pre_ping (bool, optional): Test connections on checkout. Defaults to True.
+
+        Returns:
+            Engine: Cached engine.
+        """
+        url = make_url(url)
+        key = (self._url_key(url), pool_size, max_overflow, pool_timeout, pool_pre_ping)
+        with self._lock:
+            engine = self._engines.get(key)
+            if engine is None:
+                if _is_memory_sqlite(url):
+                    # In-memory SQLite relies on SQLAlchemy's single-connection pool
+                    engine = create_engine(url, pool_pre_ping=pool_pre_ping)
+                else:
+                    engine = create_engine(url,
+                                           poolclass=InstrumentedQueuePool,
+                                           pool_size=pool_size,
+                                           max_overflow=max_overflow,
+                                           pool_timeout=pool_timeout,
+                                           pool_pre_ping=pool_pre_ping)
+                watch_engine(engine)
+                self._engines[key] = engine
+        return engine
+
+    def dispose(self, url: Optional[Union[str, URL]] = None) -> None:
+        """Dispose and forget the engines of _url_, or every engine when no URL is given."""
+        url_key = self._url_key(make_url(url)) if url is not None else None
+        with self._lock:
+            keys = [key for key in self._engines if url_key is None or key[0] == url_key]
+            engines = [self._engines.pop(key) for key in keys]
+        for engine in engines:
+            engine.dispose()
+
+    def pool_stats(self) -> Dict[str, dict]:
+        """Pool statistics per engine, with passwords masked in the URL."""
+        with self._lock:
+            engines = list(self._engines.values())
+        stats = {}
+        for engine in engines:
+            pool_stats = getattr(engine.pool, 'stats', None)
+            if pool_stats is not None:
+                stats[engine.url.render_as_string(hide_password=True)] = {
+                    **pool_stats.snapshot(),
+                    'pool_size': engine.pool.size(),
+                    'overflow': engine.pool.overflow(),
+                }
+        return stats
+
+    @staticmethod
+    def _url_key(url: URL) -> str:
+        return url.render_as_string(hide_password=False)
+
+
+def _is_memory_sqlite(url: URL) -> bool:
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+ENGINES = EngineRegistry()
+get_engine = ENGINES.get_engine
+dispose_engines = ENGINES.dispose
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+from collections import Counter
+from itertools import compress
+from typing import Any, Hashable, List, Literal, Sequence, Tuple, Union
+
+from animal_logger.src.lazy import lazy_import
+
+pd = lazy_import('pandas')
+dd = lazy_import('dask.dataframe')
+np = lazy_import('numpy')
+
+
+KeepPolicy = Literal['first', 'last']
+KeyColumns = Union[str, Sequence[str]]
+
+
+def remove_duplicates(data: Any,
+                      keys: KeyColumns = 'id',
+                      keep: KeepPolicy = 'first',
+                      count_dropped: bool = True) -> Tuple[Any, Counter]:
+    """Remove rows sharing the same key from a columnar dict, a pandas or a Dask dataframe.
+
+    Every strategy is hash based, so the cost grows linearly with the number of rows.
+
+    Args:
+        data (Any): Columnar dict ({'col': [...], ...}), pd.DataFrame or dd.DataFrame.
+        keys (KeyColumns, optional): Column, or list of columns forming a composite key. Defaults to 'id'.
+        keep (KeepPolicy, optional): Which occurrence of a duplicated key survives. Defaults to 'first'.
+        count_dropped (bool, optional): Whether to build the report of dropped rows. For Dask dataframes
+                                        this triggers a computation. Defaults to True.
+
+    Returns:
+        Tuple[Any, Counter]: Deduplicated data, of the same type as the input, and the number of
+                             rows dropped per key value.
+    """
+    keys = [keys] if isinstance(keys, str) else list(keys)
+    if keep not in ('first', 'last'):
+        raise ValueError(f"Unknown keep policy '{keep}'. Use 'first' or 'last'.")
+    if isinstance(data, dict):
+        return _dedup_columnar(data, keys, keep)
+    if isinstance(data, pd.DataFrame):
+        return _dedup_pandas(data, keys, keep, count_dropped)
+    if isinstance(data, dd.DataFrame):
+        return _dedup_dask(data, keys, keep, count_dropped)
+    raise TypeError(f"Cannot remove duplicates from an object of type '{type(data).__name__}'.")
+
+
+def _dedup_columnar(data_dict: dict, keys: List[str], keep: KeepPolicy) -> Tuple[dict, Counter]:
+    lengths = {len(values) for values in data_dict.values()}
+    if len(lengths) > 1:
+        raise ValueError("Not all values in the keys of the dictionary are of the same size")
+    missing = [key for key in keys if key not in data_dict]
+    if missing:
+        raise ValueError(f"Key columns {missing} not found in the dictionary.")
+
+    key_values = _iter_keys(data_dict, keys)
+    dropped = Counter()
+    if keep == 'first':
+        seen = set()
+        mask = []
+        for key in key_values:
+            if key in seen:
+                mask.append(False)
+                dropped[key] += 1
+            else:
+                seen.add(key)
+                mask.append(True)
+    else:
+        # Last position wins: a first pass records it, a second one keeps only that position
+        last_position = {}
+        for idx, key in enumerate(key_values):
+            last_position[key] = idx
+        mask = []
+        for idx, key in enumerate(_iter_keys(data_dict, keys)):
+            is_last = last_position[key] == idx
+            mask.append(is_last)
+            if not is_last:
+                dropped[key] += 1
+
+    if not dropped:
+        return data_dict, dropped
+    return {col: _apply_mask(values, mask) for col, values in data_dict.items()}, dropped
+
+
+def _iter_keys(data_dict: dict, keys: List[str]) -> Any:
+    if len(keys) == 1:
+        return iter(data_dict[keys[0]])
+    return zip(*(data_dict[key] for key in keys))
+
+
+def _apply_mask(values: Any, mask: List[bool]) -> Any:
+    if isinstance(values, list):
+        return list(compress(values, mask))
+    # Checked by module, so that plain columns do not import numpy or pandas
+    if type(values).__module__.split('.')[0] in ('numpy', 'pandas'):
+        return values[np.asarray(mask, dtype=bool)]
+    return list(compress(values, mask))
+
+
+def _dedup_pandas(df: pd.DataFrame, keys: List[str], keep: KeepPolicy,
+                  count_dropped: bool) -> Tuple[pd.DataFrame, Counter]:
+    duplicated = df.duplicated(subset=keys, keep=keep)
+    dropped = Counter()
+    if count_dropped and duplicated.any():
+        dropped = _counter_from_sizes(df.loc[duplicated].groupby(keys, sort=False).size())
+    return df.loc[~duplicated], dropped
+
+
+def _dedup_dask(ddf: dd.DataFrame, keys: List[str], keep: KeepPolicy,
+                count_dropped: bool) -> Tuple[dd.DataFrame, Counter]:
+    dropped = Counter()
+    if count_dropped:
+        sizes = ddf.groupby(keys).size()
+        dropped = _counter_from_sizes(sizes[sizes > 1].compute() - 1)
+    return ddf.drop_duplicates(subset=keys, keep=keep), dropped
+
+
+def _counter_from_sizes(sizes: pd.Series) -> Counter:
+    return Counter({_as_key(key): int(size) for key, size in sizes.items()})
+
+
+def _as_key(key: Any) -> Hashable:
+    return tuple(key) if isinstance(key, list) else key
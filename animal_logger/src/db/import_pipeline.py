@@ -0,0 +1,455 @@
+from __future__ import annotations
+
+import csv
+import datetime
+import decimal
+import json
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+import sqlalchemy
+
+from config.log_config import LOGGER
+from animal_logger.src.lazy import lazy_import
+
+pq = lazy_import('pyarrow.parquet')
+
+FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.parquet': 'parquet', '.pq': 'parquet'}
+_END = object()
+
+
+class Chunk(NamedTuple):
+    columns: List[str]
+    rows: List[tuple]
+    position: int  # where reading resumes after this chunk: byte offset (CSV, JSON lines) or row number (Parquet)
+
+
+class ImportStats:
+    """Counters of an ImportPipeline run."""
+
+    def __init__(self, resumed_from: int = 0) -> None:
+        self.resumed_from = resumed_from
+        self.chunks = 0
+        self.rows_read = 0
+        self.rows_loaded = 0
+        self.rows_rejected = 0
+        self.duplicates = 0
+        self.rows_skipped = 0  # rejected by the database, e.g. primary keys already present
+        self.seconds = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows_read / self.seconds if self.seconds else 0.0
+
+    def __str__(self) -> str:
+        return (f"{self.rows_read} rows read in {self.chunks} chunks, {self.rows_loaded} loaded, "
+                f"{self.rows_rejected} rejected, {self.duplicates} duplicates, {self.rows_skipped} skipped by the "
+                f"database, {self.seconds:.2f} s, {self.rows_per_second:,.0f} rows/s")
+
+
+def iter_chunks(path: Union[str, Path], file_format: str, chunk_size: int, position: int = 0,
+                columns: Optional[List[str]] = None) -> Iterator[Chunk]:
+    """Read _path_ in chunks of _chunk_size_ rows, starting at _position_ (see Chunk.position).
+
+    CSV files are read with their header; resuming a CSV file needs its _columns_.
+    """
+    if file_format == 'csv':
+        return _iter_csv(Path(path), chunk_size, position, columns)
+    if file_format == 'jsonl':
+        return _iter_jsonl(Path(path), chunk_size, position)
+    if file_format == 'parquet':
+        return _iter_parquet(Path(path), chunk_size, position)
+    raise ValueError(f"Unknown file format '{file_format}', choose among {sorted(set(FORMATS.values()))}.")
+
+
+def _iter_csv(path: Path, chunk_size: int, position: int, columns: Optional[List[str]]) -> Iterator[Chunk]:
+    with open(path, 'rb') as file:
+        # csv pulls the lines of multi-line fields itself, so the offset is right after every row
+        reader = csv.reader(line.decode('utf-8-sig') for line in file)
+        if position == 0:
+            columns = next(reader, [])
+            position = file.tell()
+        else:
+            file.seek(position)
+        rows = []
+        for row in reader:
+            if not row:
+                continue
+            rows.append(tuple(value if value != '' else None for value in row))
+            if len(rows) == chunk_size:
+                yield Chunk(columns, rows, file.tell())
+                rows = []
+        if rows:
+            yield Chunk(columns, rows, file.tell())
+
+
+def _iter_jsonl(path: Path, chunk_size: int, position: int) -> Iterator[Chunk]:
+    with open(path, 'rb') as file:
+        file.seek(position)
+        records = []
+        for line in file:
+            if line.strip():
+                records.append(json.loads(line))
+            if len(records) == chunk_size:
+                yield _records_chunk(records, file.tell())
+                records = []
+        if records:
+            yield _records_chunk(records, file.tell())
+
+
+def _records_chunk(records: List[dict], position: int) -> Chunk:
+    columns = list(dict.fromkeys(key for record in records for key in record))
+    return Chunk(columns, [tuple(record.get(col) for col in columns) for record in records], position)
+
+
+def _iter_parquet(path: Path, chunk_size: int, position: int) -> Iterator[Chunk]:
+    parquet_file = pq.ParquetFile(path)
+    # Skip whole row groups from the metadata, then the rows already read of the next one
+    first_group, skip = 0, position
+    while first_group < parquet_file.num_row_groups and skip >= parquet_file.metadata.row_group(first_group).num_rows:
+        skip -= parquet_file.metadata.row_group(first_group).num_rows
+        first_group += 1
+    row_groups = range(first_group, parquet_file.num_row_groups)
+    for batch in parquet_file.iter_batches(batch_size=chunk_size, row_groups=row_groups):
+        if skip:
+            dropped = min(skip, batch.num_rows)
+            batch = batch.slice(dropped)
+            skip -= dropped
+        if batch.num_rows:
+            columns = batch.schema.names
+            rows = list(zip(*(batch.column(idx).to_pylist() for idx in range(len(columns)))))
+            position += batch.num_rows
+            yield Chunk(columns, rows, position)
+
+
+class RowValidator:
+    """Check and convert rows to the types of the columns of _table_.
+
+    Columns of the file unknown to the table are dropped. A row is rejected when a value cannot be
+    converted, is too long for its column, or is missing in a NOT NULL column without default.
+    """
+
+    def __init__(self, table: sqlalchemy.Table) -> None:
+        self.table = table
+        self.coercers = {col.name: _coercer(col) for col in table.columns}
+        self.required = {col.name for col in table.columns if not col.nullable and col.default is None
+                         and col.server_default is None and not _is_autoincrement(col)}
+
+    def check_columns(self, columns: Sequence[str]) -> None:
+        """Raises:
+            ValueError: A required column of the table is missing from _columns_.
+        """
+        missing = self.required - set(columns)
+        if missing:
+            raise ValueError(f"Columns {sorted(missing)} of table '{self.table.name}' are missing from the file.")
+        unknown = [col for col in columns if col not in self.coercers]
+        if unknown:
+            LOGGER.warning(f"Columns {unknown} are not in table '{self.table.name}' and will be ignored.")
+
+    def validate(self, chunk: Chunk) -> Tuple[List[str], List[tuple], List[Tuple[int, str]]]:
+        """Columns kept, converted rows and (index in the chunk, reason) of the rejected rows of _chunk_."""
+        positions = [(idx, col) for idx, col in enumerate(chunk.columns) if col in self.coercers]
+        columns = [col for _, col in positions]
+        checks = [(idx, col, self.coercers[col], col in self.required) for idx, col in positions]
+        valid, rejected = [], []
+        for row_idx, row in enumerate(chunk.rows):
+            try:
+                valid.append(tuple(_convert(row[idx] if idx < len(row) else None, col, coerce, required)
+                                   for idx, col, coerce, required in checks))
+            except (ValueError, TypeError, decimal.InvalidOperation) as e:
+                rejected.append((row_idx, str(e)))
+        return columns, valid, rejected
+
+
+def _convert(value: Any, col: str, coerce: Callable[[Any], Any], required: bool) -> Any:
+    if value is None:
+        if required:
+            raise ValueError(f"'{col}' is required")
+        return None
+    try:
+        return coerce(value)
+    except (ValueError, TypeError, decimal.InvalidOperation) as e:
+        raise ValueError(f"'{col}': {e}") from e
+
+
+def _is_autoincrement(col: sqlalchemy.Column) -> bool:
+    return col.primary_key and col.autoincrement in (True, 'auto') and col.table.autoincrement_column is col
+
+
+def _coercer(col: sqlalchemy.Column) -> Callable[[Any], Any]:
+    try:
+        python_type = col.type.python_type
+    except NotImplementedError:
+        return lambda value: value
+    if python_type is str:
+        length = getattr(col.type, 'length', None)
+        return lambda value: _to_str(value, length)
+    return {
+        bool: _to_bool,
+        int: _to_int,
+        float: float,
+        decimal.Decimal: lambda value: decimal.Decimal(str(value)),
+        datetime.datetime: _to_datetime,
+        datetime.date: _to_date,
+    }.get(python_type, lambda value: value)
+
+
+def _to_str(value: Any, length: Optional[int]) -> str:
+    value = str(value)
+    if length is not None and len(value) > length:
+        raise ValueError(f"longer than {length} characters")
+    return value
+
+
+def _to_bool(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in ('1', 'true', 't', 'yes', 'y'):
+        return True
+    if text in ('0', 'false', 'f', 'no', 'n'):
+        return False
+    raise ValueError(f"invalid boolean {value!r}")
+
+
+def _to_int(value: Any) -> int:
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            pass
+    number = float(value)  # e.g. '3.0', or floats read by the JSON and Parquet readers
+    if not number.is_integer():
+        raise ValueError(f"invalid integer {value!r}")
+    return int(number)
+
+
+def _to_datetime(value: Any) -> datetime.datetime:
+    return value if isinstance(value, datetime.datetime) else datetime.datetime.fromisoformat(str(value))
+
+
+def _to_date(value: Any) -> datetime.date:
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    return value if isinstance(value, datetime.date) else datetime.date.fromisoformat(str(value))
+
+
+class ImportState:
+    """Seen keys and checkpoint of an import, in a SQLite file.
+
+    The keys of a chunk and the position after it are committed in one transaction once the chunk
+    is in the database, so a crashed import resumes after the last chunk fully loaded. Rows of the
+    chunk being loaded during the crash are read again, and skipped by the writer if they made it.
+    """
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = Path(path)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS seen (key TEXT PRIMARY KEY) WITHOUT ROWID")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS checkpoint (source TEXT PRIMARY KEY, fingerprint TEXT, "
+                               "position INTEGER, columns TEXT, rows INTEGER, finished INTEGER)")
+
+    def checkpoint(self, source: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT fingerprint, position, columns, rows, finished FROM checkpoint "
+                                     "WHERE source = ?", (source,)).fetchone()
+        if row is None:
+            return None
+        return {'fingerprint': row[0], 'position': row[1], 'columns': json.loads(row[2]) if row[2] else None,
+                'rows': row[3], 'finished': bool(row[4])}
+
+    def filter_new(self, keys: Sequence[str]) -> List[bool]:
+        """Whether each key of _keys_ is new: neither committed nor earlier in _keys_."""
+        known = set()
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                batch = keys[start: start + 500]
+                query = f"SELECT key FROM seen WHERE key IN ({', '.join('?' * len(batch))})"
+                known.update(key for (key,) in self._conn.execute(query, batch))
+        mask = []
+        for key in keys:
+            mask.append(key not in known)
+            known.add(key)
+        return mask
+
+    def commit(self, source: str, keys: Sequence[str], fingerprint: str, position: int,
+               columns: Optional[List[str]], rows: int, finished: bool = False) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR IGNORE INTO seen (key) VALUES (?)", ((key,) for key in keys))
+            self._conn.execute("INSERT OR REPLACE INTO checkpoint VALUES (?, ?, ?, ?, ?, ?)",
+                               (source, fingerprint, position, json.dumps(columns), rows, int(finished)))
+
+    def clear(self, source: str) -> None:
+        """Start _source_ over. Keys seen in other imports sharing this state are kept."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM checkpoint WHERE source = ?", (source,))
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class ImportPipeline:
+    """Stream a CSV, JSON lines or Parquet file into the table of a model in bounded memory.
+
+    A producer thread reads and validates chunks of _chunk_size_ rows while the calling thread
+    drops keys already imported (persistent across chunks, runs and files sharing _state_path_)
+    and loads the rest with UtilsDB.insert_dict_in_db. At most _queue_depth_ validated chunks wait
+    between the two, so memory stays flat whatever the size of the file. Progress is checkpointed
+    after every chunk: running the same import again resumes where it stopped.
+    """
+
+    def __init__(self,
+                 engine: sqlalchemy.Engine,
+                 model: Any,
+                 state_path: Optional[Union[str, Path]] = None,
+                 chunk_size: int = 50_000,
+                 batch_size: int = 10_000,
+                 max_workers: int = 4,
+                 queue_depth: int = 2,
+                 rejects_path: Optional[Union[str, Path]] = None) -> None:
+        self.engine = engine
+        self.model = model
+        self.table = getattr(model, '__table__', model)
+        self.state_path = state_path
+        self.chunk_size = chunk_size
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.queue_depth = queue_depth
+        self.rejects_path = rejects_path
+        self.key_columns = [col.name for col in self.table.primary_key.columns]
+        self.validator = RowValidator(self.table)
+
+    def run(self, path: Union[str, Path], file_format: Optional[str] = None, restart: bool = False) -> ImportStats:
+        """Import _path_, resuming from its checkpoint unless _restart_.
+
+        Args:
+            path (Union[str, Path]): File to import.
+            file_format (Optional[str], optional): 'csv', 'jsonl' or 'parquet'. Defaults to None (from the suffix).
+            restart (bool, optional): Ignore the checkpoint and read the file from the start. Defaults to False.
+
+        Returns:
+            ImportStats: Rows read, loaded, rejected and dropped as duplicates.
+        """
+        from animal_logger.src.db.utils_db import UtilsDB
+        path = Path(path)
+        file_format = file_format or FORMATS.get(path.suffix.lower())
+        source = str(path.resolve())
+        stat = path.stat()
+        fingerprint = f"{stat.st_size}:{stat.st_mtime_ns}"
+        state = ImportState(self.state_path or path.with_name(path.name + '.import-state.db'))
+        try:
+            checkpoint = None if restart else state.checkpoint(source)
+            if checkpoint is not None and checkpoint['fingerprint'] != fingerprint:
+                LOGGER.warning(f"'{path}' changed since its last import, importing it from the start.")
+                checkpoint = None
+            if checkpoint is not None and checkpoint['finished']:
+                LOGGER.info(f"'{path}' has already been imported into '{self.table.name}'.")
+                return ImportStats(checkpoint['position'])
+            position = checkpoint['position'] if checkpoint else 0
+            columns = checkpoint['columns'] if checkpoint else None
+            stats = ImportStats(position)
+            if position:
+                LOGGER.info(f"Resuming the import of '{path}' after {checkpoint['rows']} rows.")
+            rows_done = checkpoint['rows'] if checkpoint else 0
+            utils = UtilsDB(self.engine)
+            start = time.perf_counter()
+            LOGGER.info(f"Starting the import of '{path}' into table '{self.table.name}'.")
+            for chunk, (columns_kept, rows, rejected) in self._validated_chunks(path, file_format, position, columns):
+                stats.chunks += 1
+                stats.rows_read += len(chunk.rows)
+                stats.rows_rejected += len(rejected)
+                self._write_rejects(path, chunk, rejected, rows_done)
+                keys = self._keys(columns_kept, rows)
+                if keys is not None:
+                    mask = state.filter_new(keys)
+                    stats.duplicates += mask.count(False)
+                    rows = [row for row, new in zip(rows, mask) if new]
+                    keys = [key for key, new in zip(keys, mask) if new]
+                if rows:
+                    data_dict = {col: list(values) for col, values in zip(columns_kept, zip(*rows))}
+                    metrics = utils.insert_dict_in_db(data_dict, self.model, self.batch_size, self.max_workers)
+                    if metrics.failed_batches:
+                        raise RuntimeError(f"{metrics.failed_batches} batches of '{path}' failed to load, "
+                                           f"the import can be resumed from row {rows_done}.")
+                    stats.rows_loaded += metrics.rows_written
+                    stats.rows_skipped += metrics.rows_skipped
+                rows_done += len(chunk.rows)
+                position, columns = chunk.position, chunk.columns
+                state.commit(source, keys or [], fingerprint, position, columns, rows_done)
+                LOGGER.debug(f"Chunk {stats.chunks} of '{path}' imported, {rows_done} rows done.")
+            state.commit(source, [], fingerprint, position, columns, rows_done, finished=True)
+            stats.seconds = time.perf_counter() - start
+            LOGGER.info(f"'{path}' imported into '{self.table.name}': {stats}.")
+            return stats
+        finally:
+            state.close()
+
+    def _validated_chunks(self, path: Path, file_format: str, position: int,
+                          columns: Optional[List[str]]) -> Iterator[Tuple[Chunk, tuple]]:
+        """Chunks read and validated by a producer thread, _queue_depth_ of them at most ahead."""
+        chunks: queue.Queue = queue.Queue(maxsize=self.queue_depth)
+        stop = threading.Event()
+
+        def put(item: Any) -> bool:
+            while not stop.is_set():
+                try:
+                    chunks.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def produce() -> None:
+            try:
+                checked = False
+                for chunk in iter_chunks(path, file_format, self.chunk_size, position, columns):
+                    if not checked:
+                        self.validator.check_columns(chunk.columns)
+                        checked = True
+                    if not put((chunk, self.validator.validate(chunk))):
+                        return
+                put(_END)
+            except Exception as e:
+                put(e)
+
+        producer = threading.Thread(target=produce, name='import-reader', daemon=True)
+        producer.start()
+        try:
+            while True:
+                item = chunks.get()
+                if item is _END:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            producer.join()
+
+    def _keys(self, columns: List[str], rows: List[tuple]) -> Optional[List[str]]:
+        if not self.key_columns or any(col not in columns for col in self.key_columns):
+            return None  # Keys generated by the database cannot repeat
+        positions = [columns.index(col) for col in self.key_columns]
+        if len(positions) == 1:
+            return [str(row[positions[0]]) for row in rows]
+        return [json.dumps([row[pos] for pos in positions], default=str) for row in rows]
+
+    def _write_rejects(self, path: Path, chunk: Chunk, rejected: List[Tuple[int, str]], rows_done: int) -> None:
+        if not rejected:
+            return
+        row_idx, reason = rejected[0]
+        LOGGER.warning(f"{len(rejected)} rows of '{path}' rejected, e.g. row {rows_done + row_idx}: {reason}")
+        if self.rejects_path is not None:
+            with open(self.rejects_path, 'a', encoding='utf-8') as file:
+                for row_idx, reason in rejected:
+                    file.write(json.dumps({'row': rows_done + row_idx, 'reason': reason,
+                                           'values': dict(zip(chunk.columns, chunk.rows[row_idx]))}, default=str) + '\n')
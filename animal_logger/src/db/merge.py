@@ -0,0 +1,184 @@
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Set
+
+import sqlalchemy
+from sqlalchemy import case, func, literal_column, or_, select, tuple_
+
+ON_CONFLICT = ('update', 'nothing')
+# How an existing row's column is updated from the incoming row
+POLICIES = ('overwrite', 'keep', 'coalesce', 'greatest', 'least', 'add')
+
+
+class MergeResult(NamedTuple):
+    inserted: List[tuple]
+    updated: List[tuple]
+    skipped: List[tuple]  # key already present and nothing to update
+
+
+def _policy_expression(policy: str, new: sqlalchemy.ColumnElement,
+                       old: sqlalchemy.ColumnElement) -> sqlalchemy.ColumnElement:
+    if policy == 'overwrite':
+        return new
+    if policy == 'coalesce':
+        # Keep the stored value when the incoming one is NULL
+        return func.coalesce(new, old)
+    if policy == 'greatest':
+        return case((or_(new.is_(None), old >= new), old), else_=new)
+    if policy == 'least':
+        return case((or_(new.is_(None), old <= new), old), else_=new)
+    if policy == 'add':
+        return func.coalesce(old, 0) + func.coalesce(new, 0)
+    raise ValueError(f"Unknown update policy '{policy}', choose among {POLICIES}.")
+
+
+def _python_type(col: sqlalchemy.Column) -> Optional[type]:
+    try:
+        return col.type.python_type
+    except NotImplementedError:
+        return None
+
+
+def _coerce(value: Any, python_type: Optional[type]) -> Any:
+    """_value_ as the type the database returns for its column, e.g. 3 for '3', 1.0 or Decimal('1')."""
+    if value is None or python_type is None or isinstance(value, python_type):
+        return value
+    try:
+        coerced = python_type(value)
+    except (TypeError, ValueError, ArithmeticError):
+        return value
+    # A lossy conversion, e.g. int(1.5), would match another key
+    return coerced if isinstance(value, str) or coerced == value else value
+
+
+def _key(row: tuple, positions: Sequence[int], types: Sequence[Optional[type]]) -> tuple:
+    # Incoming values may not have the type the database returns
+    return tuple(_coerce(row[pos], python_type) for pos, python_type in zip(positions, types))
+
+
+class BatchMerger:
+    """Insert batches of rows, updating or ignoring those whose primary key already exists.
+
+    PostgreSQL and SQLite use INSERT ... ON CONFLICT. Other backends copy the batch into a
+    temporary table and merge it with one MERGE statement. Either way a batch costs a fixed
+    number of statements, whatever its number of conflicts.
+
+    With _on_conflict_ 'update', every column outside the key is updated following its policy in
+    _update_policies_, 'overwrite' by default:
+        - overwrite: take the incoming value.
+        - keep: keep the stored value.
+        - coalesce: take the incoming value unless it is NULL.
+        - greatest / least: keep the greatest / least of both values.
+        - add: add the incoming value to the stored one, e.g. for counters.
+    """
+
+    def __init__(self, table: sqlalchemy.Table, dialect_name: str, on_conflict: str = 'update',
+                 update_policies: Optional[Dict[str, str]] = None) -> None:
+        if on_conflict not in ON_CONFLICT:
+            raise ValueError(f"Unknown conflict mode '{on_conflict}', choose among {ON_CONFLICT}.")
+        self.table = table
+        self.dialect_name = dialect_name
+        self.on_conflict = on_conflict
+        self.update_policies = update_policies or {}
+        for col, policy in self.update_policies.items():
+            if col not in table.c:
+                raise ValueError(f"Column '{col}' of the update policies is not in table '{table.name}'.")
+            if policy not in POLICIES:
+                raise ValueError(f"Unknown update policy '{policy}', choose among {POLICIES}.")
+        self.key_columns = [col.name for col in table.primary_key.columns]
+        if not self.key_columns:
+            raise ValueError(f"Table '{table.name}' has no primary key to merge on.")
+        self._key_types = [_python_type(col) for col in table.primary_key.columns]
+
+    def merge(self, conn: sqlalchemy.Connection, columns: List[str], rows: List[tuple]) -> MergeResult:
+        """Merge _rows_ into the table, within the transaction of _conn_.
+
+        The batch should not repeat a key. Rows are told apart by the keys present before the merge,
+        so the split can be off if other clients write the same keys at the same time.
+
+        Returns:
+            MergeResult: Rows inserted, updated and skipped.
+        """
+        missing = [col for col in self.key_columns if col not in columns]
+        if missing:
+            raise ValueError(f"Rows merged into '{self.table.name}' need its key columns, {missing} missing.")
+        existing = self._existing_keys(conn, columns, rows)
+        updated_columns = self._updated_columns(columns)
+        if self.dialect_name in ('postgresql', 'sqlite'):
+            self._insert_on_conflict(conn, columns, rows, updated_columns)
+        else:
+            self._merge_from_staging(conn, columns, rows, updated_columns)
+        positions = [columns.index(col) for col in self.key_columns]
+        inserted, present = [], []
+        for row in rows:
+            (present if _key(row, positions, self._key_types) in existing else inserted).append(row)
+        if self.on_conflict == 'update' and updated_columns:
+            return MergeResult(inserted, present, [])
+        return MergeResult(inserted, [], present)
+
+    def _updated_columns(self, columns: List[str]) -> List[str]:
+        if self.on_conflict == 'nothing':
+            return []
+        return [col for col in columns
+                if col not in self.key_columns and self.update_policies.get(col, 'overwrite') != 'keep']
+
+    def _existing_keys(self, conn: sqlalchemy.Connection, columns: List[str], rows: List[tuple]) -> Set[tuple]:
+        positions = [columns.index(col) for col in self.key_columns]
+        key_columns = [self.table.c[col] for col in self.key_columns]
+        keys = [_key(row, positions, self._key_types) for row in rows]
+        if len(positions) == 1:
+            condition = key_columns[0].in_([key[0] for key in keys])
+        else:
+            condition = tuple_(*key_columns).in_(keys)
+        return {_key(row, range(len(key_columns)), self._key_types)
+                for row in conn.execute(select(*key_columns).where(condition))}
+
+    def _insert_on_conflict(self, conn: sqlalchemy.Connection, columns: List[str], rows: List[tuple],
+                            updated_columns: List[str]) -> None:
+        if self.dialect_name == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(self.table)
+        if updated_columns:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=self.key_columns,
+                set_={col: _policy_expression(self.update_policies.get(col, 'overwrite'), stmt.excluded[col],
+                                              self.table.c[col])
+                      for col in updated_columns})
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=self.key_columns)
+        conn.execute(stmt, [dict(zip(columns, row)) for row in rows])
+
+    def _merge_from_staging(self, conn: sqlalchemy.Connection, columns: List[str], rows: List[tuple],
+                            updated_columns: List[str]) -> None:
+        prefix = '#' if self.dialect_name == 'mssql' else ''
+        stage = sqlalchemy.Table(f'{prefix}{self.table.name}_merge', sqlalchemy.MetaData(),
+                                 *(sqlalchemy.Column(col, self.table.c[col].type) for col in columns),
+                                 prefixes=[] if prefix else ['TEMPORARY'])
+        stage.create(conn)
+        try:
+            conn.execute(stage.insert(), [dict(zip(columns, row)) for row in rows])
+            conn.execute(sqlalchemy.text(self._merge_sql(stage, columns, updated_columns, conn.dialect)))
+        finally:
+            stage.drop(conn)
+
+    def _merge_sql(self, stage: sqlalchemy.Table, columns: List[str], updated_columns: List[str],
+                   dialect: sqlalchemy.Dialect) -> str:
+        quote = dialect.identifier_preparer.quote
+        target = dialect.identifier_preparer.format_table(self.table)
+
+        def compiled(expression: sqlalchemy.ColumnElement) -> str:
+            return str(expression.compile(dialect=dialect, compile_kwargs={'literal_binds': True}))
+
+        on = ' AND '.join(f"t.{quote(col)} = s.{quote(col)}" for col in self.key_columns)
+        sql = f"MERGE INTO {target} t USING {dialect.identifier_preparer.format_table(stage)} s ON ({on})"
+        if updated_columns:
+            assignments = ', '.join(
+                f"{quote(col)} = " + compiled(_policy_expression(self.update_policies.get(col, 'overwrite'),
+                                                                 literal_column(f"s.{quote(col)}"),
+                                                                 literal_column(f"t.{quote(col)}")))
+                for col in updated_columns)
+            sql += f" WHEN MATCHED THEN UPDATE SET {assignments}"
+        sql += (f" WHEN NOT MATCHED THEN INSERT ({', '.join(quote(col) for col in columns)}) "
+                f"VALUES ({', '.join(f's.{quote(col)}' for col in columns)})")
+        # SQL Server requires MERGE statements to be terminated
+        return sql + ';' if self.dialect_name == 'mssql' else sql
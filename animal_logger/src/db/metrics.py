@@ -0,0 +1,448 @@
+import contextvars
+import functools
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from config.log_config import LOGGER
+
+
+# Upper bounds of the histogram buckets, the last bucket (+Inf) is implicit
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+ROWS_BUCKETS = (1, 10, 100, 1_000, 5_000, 10_000, 50_000, 100_000, 500_000, 1_000_000)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Counter:
+
+    def __init__(self) -> None:
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class Histogram:
+    """Counts of observations per bucket, plus their sum, as exported by Prometheus histograms."""
+
+    def __init__(self, buckets: Iterable[float]) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[idx] += 1
+            self.sum += value
+            self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the _q_ quantile, inf when it is in the last one."""
+        with self._lock:
+            counts, count = list(self.counts), self.count
+        if not count:
+            return 0.0
+        rank, seen = q * count, 0
+        for bound, bucket_count in zip((*self.buckets, float('inf')), counts):
+            seen += bucket_count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+
+class Operation:
+    """Figures of one call to an instrumented operation, reachable with current_operation().
+
+    SQL and pool wait times are summed over every thread working for the operation, including
+    the writer and reader threads it starts, and are also added to the enclosing operations.
+    """
+
+    def __init__(self, name: str, parent: Optional['Operation'] = None) -> None:
+        self.name = name
+        self.parent = parent
+        self.rows = 0
+        self.bytes = 0
+        self.sql_seconds = 0.0
+        self.sql_statements = 0
+        self.pool_wait_seconds = 0.0
+        self.failed = False
+        self.batches: List[int] = []
+        self.counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def add_rows(self, rows: int, nbytes: int = 0) -> None:
+        with self._lock:
+            self.rows += rows
+            self.bytes += nbytes
+
+    def record_batch(self, rows: int) -> None:
+        with self._lock:
+            self.batches.append(rows)
+
+    def count(self, name: str, amount: int = 1) -> None:
+        """Add to an operation-specific counter, exported as db_operation_<name>_total."""
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + amount
+
+    def fail(self) -> None:
+        self.failed = True
+
+    def add_sql(self, seconds: float) -> None:
+        operation = self
+        while operation is not None:
+            with operation._lock:
+                operation.sql_seconds += seconds
+                operation.sql_statements += 1
+            operation = operation.parent
+
+    def add_pool_wait(self, seconds: float) -> None:
+        operation = self
+        while operation is not None:
+            with operation._lock:
+                operation.pool_wait_seconds += seconds
+            operation = operation.parent
+
+
+class _NoOperation(Operation):
+    """Returned by current_operation() outside of instrumented code, or when metrics are disabled."""
+
+    def __init__(self) -> None:
+        super().__init__('')
+
+    def add_rows(self, rows: int, nbytes: int = 0) -> None:
+        pass
+
+    def record_batch(self, rows: int) -> None:
+        pass
+
+    def count(self, name: str, amount: int = 1) -> None:
+        pass
+
+    def fail(self) -> None:
+        pass
+
+    def add_sql(self, seconds: float) -> None:
+        pass
+
+    def add_pool_wait(self, seconds: float) -> None:
+        pass
+
+
+_NO_OPERATION = _NoOperation()
+_CURRENT = contextvars.ContextVar('db_operation', default=None)
+
+
+class MetricsRegistry:
+    """Timers, counters and histograms of the data layer, exportable as Prometheus text or JSON.
+
+    Every instrumented operation records its wall time, split into SQL time (measured by cursor
+    events of the watched engines) and Python time, the rows and bytes it handled, its batch
+    sizes and the time spent waiting for pooled connections. With _enabled_ False, instrumented
+    functions are called directly and nothing is recorded.
+    """
+
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self.profiled: Dict[str, str] = {}  # operation -> profiler
+        self.profile_dir = Path(tempfile.gettempdir()) / 'animal_logger_profiles'
+        self._counters: Dict[Tuple[str, Labels], Counter] = {}
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._help: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str = '', **labels: str) -> Counter:
+        key = (name, tuple(sorted(labels.items())))
+        metric = self._counters.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self._counters.setdefault(key, Counter())
+                self._help.setdefault(name, help_text)
+        return metric
+
+    def histogram(self, name: str, buckets: Iterable[float] = SECONDS_BUCKETS, help_text: str = '',
+                  **labels: str) -> Histogram:
+        key = (name, tuple(sorted(labels.items())))
+        metric = self._histograms.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self._histograms.setdefault(key, Histogram(buckets))
+                self._help.setdefault(name, help_text)
+        return metric
+
+    def operation(self, name: str) -> '_OperationContext':
+        """Context manager instrumenting a block of code as the operation _name_."""
+        return _OperationContext(self, name)
+
+    def enable_profiling(self, operations: Iterable[str], profiler: str = 'cprofile',
+                         output_dir: Optional[Union[str, Path]] = None) -> None:
+        """Profile every call of _operations_ with 'cprofile' or 'pyinstrument', one file per call.
+
+        cProfile writes .prof files (open them with pstats or snakeviz), pyinstrument HTML reports.
+        Only the thread calling the operation is profiled.
+        """
+        if profiler not in ('cprofile', 'pyinstrument'):
+            raise ValueError(f"Unknown profiler '{profiler}', use 'cprofile' or 'pyinstrument'.")
+        self.profiled.update({operation: profiler for operation in operations})
+        if output_dir is not None:
+            self.profile_dir = Path(output_dir)
+
+    def disable_profiling(self) -> None:
+        self.profiled.clear()
+
+    def record_sql(self, seconds: float) -> None:
+        if not self.enabled:
+            return
+        self.histogram('db_sql_seconds', help_text="Duration of SQL statements.").observe(seconds)
+        operation = _CURRENT.get()
+        if operation is not None:
+            operation.add_sql(seconds)
+
+    def record_pool_wait(self, seconds: float) -> None:
+        if not self.enabled:
+            return
+        operation = _CURRENT.get()
+        if operation is not None:
+            operation.add_pool_wait(seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """All metrics as a JSON-serialisable dict, the connection pools included."""
+        with self._lock:
+            counters = list(self._counters.items())
+            histograms = list(self._histograms.items())
+        return {
+            'timestamp': time.time(),
+            'counters': [{'name': name, 'labels': dict(labels), 'value': metric.value}
+                         for (name, labels), metric in counters],
+            'histograms': [{'name': name, 'labels': dict(labels), 'count': metric.count, 'sum': metric.sum,
+                            'buckets': dict(zip(map(str, (*metric.buckets, '+Inf')), metric.counts)),
+                            'p50': metric.quantile(0.5), 'p95': metric.quantile(0.95),
+                            'p99': metric.quantile(0.99)}
+                           for (name, labels), metric in histograms],
+            'pools': _pool_stats(),
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), default=str)
+
+    def to_prometheus(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items())
+        lines = []
+        described = set()
+
+        def describe(name: str, kind: str) -> None:
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {name} {self._help.get(name, '')}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), metric in counters:
+            describe(name, 'counter')
+            lines.append(f"{name}{_format_labels(labels)} {metric.value}")
+        for (name, labels), metric in histograms:
+            describe(name, 'histogram')
+            cumulative = 0
+            for bound, count in zip((*metric.buckets, '+Inf'), metric.counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {metric.sum}")
+            lines.append(f"{name}_count{_format_labels(labels)} {metric.count}")
+        for url, stats in _pool_stats().items():
+            for key, value in stats.items():
+                describe(f"db_pool_{key}", 'gauge')
+                lines.append(f"db_pool_{key}{_format_labels((('engine', url),))} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def _record(self, operation: Operation, seconds: float) -> None:
+        name = operation.name
+        self.counter('db_operation_calls_total', "Calls of data layer operations.", operation=name).inc()
+        if operation.failed:
+            self.counter('db_operation_errors_total', "Failed calls.", operation=name).inc()
+        self.histogram('db_operation_seconds', help_text="Wall time of operations.", operation=name).observe(seconds)
+        self.histogram('db_operation_sql_seconds', help_text="Time spent executing SQL, summed over threads.",
+                       operation=name).observe(operation.sql_seconds)
+        self.histogram('db_operation_python_seconds', help_text="Wall time not spent executing SQL.",
+                       operation=name).observe(max(0.0, seconds - operation.sql_seconds))
+        self.counter('db_operation_sql_statements_total', "SQL statements executed.",
+                     operation=name).inc(operation.sql_statements)
+        self.counter('db_operation_pool_wait_seconds_total', "Time spent waiting for a pooled connection.",
+                     operation=name).inc(operation.pool_wait_seconds)
+        self.counter('db_operation_rows_total', "Rows handled.", operation=name).inc(operation.rows)
+        self.counter('db_operation_bytes_total', "Bytes handled.", operation=name).inc(operation.bytes)
+        if operation.batches:
+            batch_rows = self.histogram('db_operation_batch_rows', ROWS_BUCKETS, "Rows per batch.", operation=name)
+            for rows in operation.batches:
+                batch_rows.observe(rows)
+        for counter_name, amount in operation.counts.items():
+            self.counter(f'db_operation_{counter_name}_total', operation=name).inc(amount)
+
+
+class _OperationContext:
+
+    def __init__(self, registry: MetricsRegistry, name: str) -> None:
+        self.registry = registry
+        self.name = name
+        self._token = None
+        self._profiler = None
+
+    def __enter__(self) -> Operation:
+        if not self.registry.enabled:
+            return _NO_OPERATION
+        self.operation = Operation(self.name, _CURRENT.get())
+        self._token = _CURRENT.set(self.operation)
+        profiler = self.registry.profiled.get(self.name)
+        if profiler:
+            self._profiler = _start_profiler(profiler)
+        self._start = time.perf_counter()
+        return self.operation
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self._token is None:
+            return
+        seconds = time.perf_counter() - self._start
+        _CURRENT.reset(self._token)
+        self._token = None
+        if exc_type is not None:
+            self.operation.fail()
+        if self._profiler is not None:
+            _stop_profiler(self._profiler, self.registry.profile_dir, self.name)
+            self._profiler = None
+        self.registry._record(self.operation, seconds)
+
+
+def _pool_stats() -> Dict[str, dict]:
+    # Without an engine registry there are no pools, and no reason to import SQLAlchemy
+    connection = sys.modules.get('animal_logger.src.db.connection')
+    return connection.ENGINES.pool_stats() if connection is not None else {}
+
+
+def _start_profiler(profiler: str) -> Tuple[str, Any]:
+    if profiler == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            LOGGER.warning("pyinstrument is not installed, profiling with cProfile instead.")
+        else:
+            session = Profiler()
+            session.start()
+            return 'pyinstrument', session
+    import cProfile
+    session = cProfile.Profile()
+    session.enable()
+    return 'cprofile', session
+
+
+def _stop_profiler(profiler: Tuple[str, Any], output_dir: Path, name: str) -> None:
+    kind, session = profiler
+    output_dir.mkdir(parents=True, exist_ok=True)
+    stem = output_dir / f"{name}_{time.strftime('%Y%m%d_%H%M%S')}_{threading.get_ident()}_{time.perf_counter_ns()}"
+    if kind == 'pyinstrument':
+        session.stop()
+        path = stem.with_suffix('.html')
+        path.write_text(session.output_html())
+    else:
+        session.disable()
+        path = stem.with_suffix('.prof')
+        session.dump_stats(path)
+    LOGGER.debug(f"Profile of '{name}' written to '{path}'.")
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ''
+    escaped = (f'{key}="{_escape(str(value))}"' for key, value in labels)
+    return '{' + ','.join(escaped) + '}'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+METRICS = MetricsRegistry(enabled=os.environ.get('DB_METRICS', '1') != '0')
+if os.environ.get('DB_PROFILE'):
+    # e.g. DB_PROFILE=get_table,insert_dict_in_db DB_PROFILE_BACKEND=pyinstrument
+    METRICS.enable_profiling(os.environ['DB_PROFILE'].split(','), os.environ.get('DB_PROFILE_BACKEND', 'cprofile'),
+                             os.environ.get('DB_PROFILE_DIR'))
+
+
+def instrument(name: str) -> Callable[[Callable], Callable]:
+    """Decorator recording every call of the function as the operation _name_ of METRICS."""
+
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not METRICS.enabled:
+                return fn(*args, **kwargs)
+            with METRICS.operation(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_operation() -> Operation:
+    """Operation being instrumented in this context, or a no-op stand-in when there is none."""
+    return _CURRENT.get() or _NO_OPERATION
+
+
+def record_frame(frame: Any) -> None:
+    """Add the rows and in-memory bytes of a pandas dataframe to the current operation.
+
+    Dask dataframes are left alone, sizing them would compute them.
+    """
+    if frame is None or hasattr(frame, 'npartitions'):
+        return
+    current_operation().add_rows(len(frame), int(frame.memory_usage(index=True).sum()))
+
+
+def in_context(fn: Callable) -> Callable:
+    """Bind _fn_ to a copy of the current context, so that a thread running it reports to the same operation.
+
+    Call it when submitting to an executor: a context can only be entered by one thread at a time.
+    """
+    return functools.partial(contextvars.copy_context().run, fn)
+
+
+def watch_engine(engine: Any) -> None:
+    """Time the SQL statements of _engine_. Idempotent."""
+    from sqlalchemy import event
+    if event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        return
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(engine, 'handle_error', _handle_error)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info.setdefault('metrics_query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    starts = conn.info.get('metrics_query_start')
+    if starts:
+        METRICS.record_sql(time.perf_counter() - starts.pop())
+
+
+def _handle_error(exception_context) -> None:
+    conn = exception_context.connection
+    starts = conn.info.get('metrics_query_start') if conn is not None else None
+    if starts:
+        METRICS.record_sql(time.perf_counter() - starts.pop())
@@ -0,0 +1,106 @@
+import importlib
+import inspect
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import sqlalchemy
+
+from config.log_config import LOGGER
+from animal_logger.src.db.connection import Base
+
+TableKey = Tuple[str, str]  # (schema, table name)
+
+
+class ModelRegistry:
+    """Declarative model classes, built or collected once and looked up by table.
+
+    Dynamic models are cached by (schema, table), so asking for the same table again returns the
+    same class instead of declaring it twice on the shared metadata. Model modules are scanned once.
+    The tables present in the database are read with one query per schema and remembered, so
+    checking for missing tables costs no round trip after the first one; tables created elsewhere
+    are seen after refresh().
+    """
+
+    def __init__(self) -> None:
+        self._models: Dict[TableKey, Any] = {}
+        self._by_table_name: Dict[str, Any] = {}
+        self._modules: Dict[str, List[Any]] = {}
+        self._existing: Dict[Tuple[str, str], Set[str]] = {}  # (engine url, schema) -> table names
+        self._lock = threading.RLock()
+
+    def create_dynamic_model(self, class_name: str, table_name: str, schema_name: str, column_data: dict) -> Any:
+        """Declarative class of _schema_name.table_name_ with the columns of _column_data_, built on first call."""
+        with self._lock:
+            model_class = self._models.get((schema_name, table_name))
+            if model_class is None:
+                attributes = {'__tablename__': table_name, '__table_args__': {'schema': schema_name}, **column_data}
+                model_class = type(class_name, (Base,), attributes)
+                self.register(model_class)
+            return model_class
+
+    def register(self, model_class: Any) -> None:
+        table = model_class.__table__
+        with self._lock:
+            self._models[(table.schema, table.name)] = model_class
+            self._by_table_name[table.name] = model_class
+
+    def register_module(self, module_name: str) -> List[Any]:
+        """Models defined in _module_name_, imported and scanned on the first call only."""
+        with self._lock:
+            if module_name not in self._modules:
+                module = importlib.import_module(module_name)
+                classes = [member for _, member in inspect.getmembers(module, inspect.isclass)
+                           if member.__module__ == module_name and hasattr(member, '__table__')]
+                for model_class in classes:
+                    self.register(model_class)
+                self._modules[module_name] = classes
+            return self._modules[module_name]
+
+    def get(self, table_name: str, schema_name: Optional[str] = None) -> Any:
+        """Model of _table_name_, in _schema_name_ if given.
+
+        Raises:
+            KeyError: No such model was registered.
+        """
+        model_class = self._models.get((schema_name, table_name)) if schema_name else self._by_table_name.get(table_name)
+        if model_class is None:
+            raise KeyError(f"No model registered for table '{table_name}'.")
+        return model_class
+
+    def existing_tables(self, engine: sqlalchemy.Engine, schemas: Iterable[str]) -> Dict[str, Set[str]]:
+        """Table names of each schema of _schemas_, reflected once per schema and engine."""
+        url = engine.url.render_as_string(hide_password=True)
+        schemas = set(schemas)
+        with self._lock:
+            missing = [schema for schema in schemas if (url, schema) not in self._existing]
+            if missing:
+                inspector = sqlalchemy.inspect(engine)
+                for schema in missing:
+                    self._existing[(url, schema)] = set(inspector.get_table_names(schema=schema))
+            return {schema: self._existing[(url, schema)] for schema in schemas}
+
+    def create_missing(self, engine: sqlalchemy.Engine, model_classes: Iterable[Any]) -> List[Any]:
+        """Create the tables of _model_classes_ missing in the database, in a single create_all.
+
+        Returns:
+            List[Any]: Models whose table was created.
+        """
+        model_classes = list(model_classes)
+        with self._lock:
+            existing = self.existing_tables(engine, {cls.__table__.schema for cls in model_classes})
+            to_create = [cls for cls in model_classes if cls.__table__.name not in existing[cls.__table__.schema]]
+            if not to_create:
+                return []
+            Base.metadata.create_all(engine, tables=[cls.__table__ for cls in to_create], checkfirst=False)
+            for cls in to_create:
+                existing[cls.__table__.schema].add(cls.__table__.name)
+                LOGGER.info(f"Model '{cls.__table__.name}' created successfully in schema '{cls.__table__.schema}'.")
+            return to_create
+
+    def refresh(self) -> None:
+        """Forget the reflected table names, e.g. after tables were created or dropped by another client."""
+        with self._lock:
+            self._existing.clear()
+
+
+MODEL_REGISTRY = ModelRegistry()
@@ -0,0 +1,95 @@
+from typing import Any, List, NamedTuple, Optional, Sequence, Tuple
+
+import sqlalchemy
+from sqlalchemy import column, func, select, table, tuple_
+
+from animal_logger.src.db.query import Filters, filtered_select
+
+Key = Tuple[Any, Any]  # (sort value, id) of a row
+
+
+class Page(NamedTuple):
+    columns: List[str]
+    rows: List[tuple]
+    has_more: bool  # whether more rows follow in the direction the page was read
+
+    @property
+    def first_key(self) -> Optional[Key]:
+        return self._key(self.rows[0]) if self.rows else None
+
+    @property
+    def last_key(self) -> Optional[Key]:
+        return self._key(self.rows[-1]) if self.rows else None
+
+    def _key(self, row: tuple) -> Key:
+        return row[-2], row[-1]
+
+
+class KeysetPager:
+    """Read a table page by page, seeking past the last row read instead of using OFFSET.
+
+    Rows are ordered by (_sort_col_, _index_col_), so the order is total even when sort values
+    repeat, and every page costs an index seek however deep in the table it is. Filters and
+    ordering are applied by the database. The sort column should not contain NULLs.
+    """
+
+    def __init__(self,
+                 engine: sqlalchemy.Engine,
+                 schema: str,
+                 table_name: str,
+                 columns: Optional[Sequence[str]] = None,
+                 filters: Optional[Filters] = None,
+                 sort_col: str = 'id',
+                 descending: bool = False,
+                 page_size: int = 100,
+                 index_col: str = 'id') -> None:
+        self.engine = engine
+        self.schema = schema
+        self.table_name = table_name
+        self.columns = list(columns) if columns else None
+        self.filters = filters
+        self.sort_col = sort_col
+        self.descending = descending
+        self.page_size = page_size
+        self.index_col = index_col
+
+    def first_page(self) -> Page:
+        return self._read(None, forward=True)
+
+    def page_after(self, key: Key) -> Page:
+        """Rows following the row with _key_, in display order."""
+        return self._read(key, forward=True)
+
+    def page_before(self, key: Key) -> Page:
+        """Rows preceding the row with _key_, in display order."""
+        return self._read(key, forward=False)
+
+    def count(self) -> int:
+        with self.engine.connect() as conn, filtered_select(conn, self.schema, self.table_name,
+                                                            filters=self.filters) as stmt:
+            count = select(func.count()).select_from(table(self.table_name, schema=self.schema))
+            if stmt.whereclause is not None:
+                count = count.where(stmt.whereclause)
+            return conn.execute(count).scalar()
+
+    def _read(self, key: Optional[Key], forward: bool) -> Page:
+        ascending = forward != self.descending
+        sort_key = tuple_(column(self.sort_col), column(self.index_col))
+        conditions = []
+        if key is not None:
+            conditions.append(sort_key > tuple_(*key) if ascending else sort_key < tuple_(*key))
+        order = [col if ascending else f'-{col}' for col in (self.sort_col, self.index_col)]
+        with self.engine.connect() as conn, filtered_select(conn, self.schema, self.table_name, self.columns,
+                                                            self.filters, order, self.page_size + 1,
+                                                            conditions) as stmt:
+            # The key columns go last, so pages can find them without knowing the projection
+            stmt = stmt.add_columns(column(self.sort_col).label('_sort_key'),
+                                    column(self.index_col).label('_index_key'))
+            result = conn.execute(stmt)
+            columns = list(result.keys())[:-2]
+            rows = [tuple(row) for row in result]
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if not forward:
+            rows.reverse()
+        return Page(columns, rows, has_more)
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import sqlalchemy
+from sqlalchemy import column, func, select, table, text
+from sqlalchemy.pool import QueuePool
+
+from config.log_config import LOGGER
+from animal_logger.src.lazy import lazy_import
+from animal_logger.src.db.metrics import in_context
+from animal_logger.src.db.query import Filters, filtered_select, has_large_lists, read_query, with_index
+
+pd = lazy_import('pandas')
+dd = lazy_import('dask.dataframe')
+
+
+class PartitionedReader:
+    """Read a table in index-range partitions planned up front and fetched concurrently.
+
+    Partitions are split evenly between min(index) and max(index), with their number derived from the
+    row count, so neither Dask nor the caller has to probe the table. Tables whose index is not an
+    integer, e.g. text ids, cannot be split evenly and are read as a single partition.
+    """
+
+    def __init__(self,
+                 engine: sqlalchemy.Engine,
+                 schema: str,
+                 table_name: str,
+                 index_col: str = 'id',
+                 columns: Optional[Sequence[str]] = None,
+                 filters: Optional[Filters] = None,
+                 npartitions: Optional[int] = None,
+                 rows_per_partition: int = 250_000,
+                 max_workers: int = 4) -> None:
+        self.engine = engine
+        self.schema = schema
+        self.table_name = table_name
+        self.index_col = index_col
+        self.columns = with_index(columns, index_col)
+        self.filters = filters or {}
+        self.npartitions = npartitions
+        self.rows_per_partition = rows_per_partition
+        # Never ask for more connections than the pool can hand out without overflowing
+        pool_size = engine.pool.size() if isinstance(engine.pool, QueuePool) else max_workers
+        self.max_workers = max(1, min(max_workers, pool_size))
+        self._divisions = None
+
+    @property
+    def divisions(self) -> List[int]:
+        """Partition boundaries: partition i covers [divisions[i], divisions[i + 1]), the last one is closed."""
+        if self._divisions is None:
+            with self.engine.connect() as conn, filtered_select(conn, self.schema, self.table_name,
+                                                                filters=self.filters) as stmt:
+                self._divisions = self._plan(conn, stmt)
+        return self._divisions
+
+    def iter_partitions(self) -> Iterator[pd.DataFrame]:
+        """Yield partitions in index order, keeping at most _max_workers_ of them in flight.
+
+        Only the partitions being read or waiting to be consumed are held in memory, so tables
+        bigger than RAM can be processed one partition at a time.
+        """
+        if has_large_lists(self.filters, self.engine.dialect.name):
+            yield from self._iter_on_one_connection()
+            return
+        bounds = list(zip(self.divisions[:-1], self.divisions[1:]))
+        if not bounds:
+            return
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='db-reader') as pool:
+            pending = deque()
+            for idx, (lower, upper) in enumerate(bounds):
+                pending.append(pool.submit(in_context(self.read_partition), lower, upper, idx == len(bounds) - 1))
+                if len(pending) >= self.max_workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def read_partition(self, lower: int, upper: int, is_last: bool = False) -> pd.DataFrame:
+        return read_query(self.engine, self.schema, self.table_name, self.columns, self.filters,
+                          index_col=self.index_col, conditions=self._range(lower, upper, is_last))
+
+    def _iter_on_one_connection(self) -> Iterator[pd.DataFrame]:
+        """Partitions read in turn on one connection, so the temporary tables of long filter lists,
+        which only that connection sees, are loaded once for the whole read."""
+        with self.engine.connect() as conn, filtered_select(conn, self.schema, self.table_name, self.columns,
+                                                            self.filters) as stmt:
+            if self._divisions is None:
+                self._divisions = self._plan(conn, stmt)
+            bounds = list(zip(self._divisions[:-1], self._divisions[1:]))
+            for idx, (lower, upper) in enumerate(bounds):
+                yield pd.read_sql(stmt.where(*self._range(lower, upper, idx == len(bounds) - 1)), conn,
+                                  index_col=self.index_col)
+
+    def _range(self, lower: int, upper: int, is_last: bool) -> List[sqlalchemy.ColumnElement]:
+        index = column(self.index_col)
+        return [index >= lower, index <= upper if is_last else index < upper]
+
+    def to_pandas(self) -> pd.DataFrame:
+        partitions = list(self.iter_partitions())
+        if not partitions:
+            return read_query(self.engine, self.schema, self.table_name, self.columns, self.filters,
+                              limit=0, index_col=self.index_col)
+        return pd.concat(partitions)
+
+    def to_dask(self) -> dd.DataFrame:
+        if len(self.divisions) < 2:
+            return dd.from_pandas(self.to_pandas(), npartitions=1)
+        if has_large_lists(self.filters, self.engine.dialect.name):
+            # Dask reads every partition on its own connection, which would not see the temporary tables
+            return dd.from_pandas(self.to_pandas(), npartitions=len(self.divisions) - 1)
+        bounds = [(lower, upper, idx == len(self.divisions) - 2)
+                  for idx, (lower, upper) in enumerate(zip(self.divisions[:-1], self.divisions[1:]))]
+        meta = read_query(self.engine, self.schema, self.table_name, self.columns, self.filters,
+                          limit=0, index_col=self.index_col)
+        # Partitions are read through this reader and its engine: the graph holds no connection string,
+        # so the password cannot leak into task keys, reprs or error messages
+        return dd.from_map(self._read_bounds, bounds,
+                           meta = meta,
+                           divisions = self.divisions,
+                           label = f'read-{self.table_name}',
+                           token = self._token())
+
+    def _read_bounds(self, bounds: Tuple[int, int, bool]) -> pd.DataFrame:
+        return self.read_partition(*bounds)
+
+    def _token(self) -> str:
+        description = json.dumps([self.engine.url.render_as_string(hide_password=True), self.schema,
+                                  self.table_name, self.columns, self.filters, self.divisions],
+                                 default=str, sort_keys=True)
+        return hashlib.sha1(description.encode()).hexdigest()
+
+    def _plan(self, conn: sqlalchemy.Connection, stmt: sqlalchemy.Select) -> List[int]:
+        """Divisions of the rows matched by _stmt_, a filtered_select statement of _conn_."""
+        index = column(self.index_col)
+        source = table(self.table_name, index, schema=self.schema)
+        bounds = select(func.min(index), func.max(index)).select_from(source)
+        if stmt.whereclause is not None:
+            bounds = bounds.where(stmt.whereclause)
+        lowest, highest = conn.execute(bounds).one()
+        if lowest is None:
+            return []
+        if not all(isinstance(value, int) and not isinstance(value, bool) for value in (lowest, highest)):
+            LOGGER.debug(f"Index '{self.index_col}' of '{self.schema}.{self.table_name}' is not an integer, "
+                         f"reading it in a single partition.")
+            return [lowest, highest]
+        npartitions = self.npartitions or math.ceil(self._row_count(conn, stmt) / self.rows_per_partition)
+        npartitions = max(1, min(npartitions, highest - lowest + 1))
+        step = (highest - lowest) / npartitions
+        divisions = sorted({lowest + math.floor(i * step) for i in range(npartitions)} | {highest})
+        if len(divisions) == 1:
+            # A single index value still needs a closed [lowest, highest] partition
+            divisions = [lowest, highest]
+        LOGGER.debug(f"Reading '{self.schema}.{self.table_name}' in {len(divisions) - 1} partitions.")
+        return divisions
+
+    def _row_count(self, conn: sqlalchemy.Connection, stmt: sqlalchemy.Select) -> int:
+        if self.engine.dialect.name == 'postgresql' and not self.filters:
+            # Planner statistics are good enough to size partitions and avoid a full count
+            estimate = conn.execute(
+                text("SELECT c.reltuples FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+                     "WHERE n.nspname = :schema AND c.relname = :table_name"),
+                {'schema': self.schema, 'table_name': self.table_name},
+            ).scalar()
+            if estimate and estimate > 0:
+                return int(estimate)
+        return conn.execute(select(func.count()).select_from(stmt.subquery())).scalar()
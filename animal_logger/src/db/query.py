@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+import sqlalchemy
+from sqlalchemy import any_, bindparam, column, literal_column, select, table
+from sqlalchemy.dialects import postgresql
+
+from animal_logger.src.lazy import lazy_import
+
+pd = lazy_import('pandas')
+
+
+# Lists longer than this are sent as one array parameter (PostgreSQL) or joined from a temp table
+LARGE_LIST_THRESHOLD = 1_000
+
+Filters = Dict[str, Any]
+OrderBy = Union[str, Sequence[str]]
+
+_OPERATORS = {
+    '==': lambda col, val: col == val,
+    '!=': lambda col, val: col != val,
+    '<': lambda col, val: col < val,
+    '<=': lambda col, val: col <= val,
+    '>': lambda col, val: col > val,
+    '>=': lambda col, val: col >= val,
+    'in': lambda col, val: col.in_(list(val)),
+    'not in': lambda col, val: col.not_in(list(val)),
+    'like': lambda col, val: col.like(val),
+}
+
+
+def build_select(schema: str,
+                 table_name: str,
+                 columns: Optional[Sequence[str]] = None,
+                 filters: Optional[Filters] = None,
+                 order_by: Optional[OrderBy] = None,
+                 limit: Optional[int] = None,
+                 dialect_name: Optional[str] = None,
+                 conditions: Sequence[sqlalchemy.ColumnElement] = ()) -> sqlalchemy.Select:
+    """Translate a projection, filters, ordering and limit into a single SELECT statement.
+
+    Args:
+        schema (str): Schema of the table.
+        table_name (str): Table name.
+        columns (Optional[Sequence[str]], optional): Columns to fetch. Defaults to None (all of them).
+        filters (Optional[Filters], optional): {column: value}. A list, tuple or set value becomes an IN,
+                                               None becomes IS NULL and an (operator, value) pair applies
+                                               one of ==, !=, <, <=, >, >=, in, not in, like. Defaults to None.
+        order_by (Optional[OrderBy], optional): Column or columns to sort by, prefixed with '-' for
+                                                descending order. Defaults to None.
+        limit (Optional[int], optional): Maximum number of rows. Defaults to None.
+        dialect_name (Optional[str], optional): Target dialect. On 'postgresql' long lists are bound as a
+                                                single array parameter. Defaults to None.
+        conditions (Sequence[sqlalchemy.ColumnElement], optional): Extra WHERE clauses, e.g. index ranges.
+                                                                   Defaults to ().
+
+    Returns:
+        sqlalchemy.Select: Statement with all values as bound parameters.
+    """
+    source = table(table_name, schema=schema)
+    stmt = select(*[column(col) for col in columns]) if columns else select(literal_column('*'))
+    stmt = stmt.select_from(source)
+    for condition in [*_conditions(filters or {}, dialect_name), *conditions]:
+        stmt = stmt.where(condition)
+    for col in _as_list(order_by):
+        stmt = stmt.order_by(column(col[1:]).desc() if col.startswith('-') else column(col))
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+
+@contextmanager
+def filtered_select(conn: sqlalchemy.Connection,
+                    schema: str,
+                    table_name: str,
+                    columns: Optional[Sequence[str]] = None,
+                    filters: Optional[Filters] = None,
+                    order_by: Optional[OrderBy] = None,
+                    limit: Optional[int] = None,
+                    conditions: Sequence[sqlalchemy.ColumnElement] = ()) -> Iterator[sqlalchemy.Select]:
+    """build_select for statements run on _conn_, whatever the length of the filter lists.
+
+    Outside PostgreSQL, lists longer than LARGE_LIST_THRESHOLD are loaded into temporary tables of
+    _conn_ and joined, instead of being expanded into thousands of bound parameters, more than SQLite
+    accepts. The temporary tables are dropped when the block exits: run the statement inside it.
+    """
+    filters = dict(filters or {})
+    joins = []
+    try:
+        if conn.dialect.name != 'postgresql':
+            for col, value in list(filters.items()):
+                values = _large_list(value)
+                if values is not None:
+                    joins.append((col, _load_temp_values(conn, values)))
+                    del filters[col]
+        stmt = build_select(schema, table_name, columns, filters, order_by, limit, conn.dialect.name, conditions)
+        for col, values_table in joins:
+            stmt = stmt.where(column(col).in_(select(values_table.c.value)))
+        yield stmt
+    finally:
+        # Pooled connections outlive the query, so do not leave the temp tables behind
+        for _, values_table in joins:
+            values_table.drop(conn)
+
+
+def has_large_lists(filters: Optional[Filters], dialect_name: str) -> bool:
+    """Whether filtered_select loads temporary tables for _filters_ on _dialect_name_."""
+    return dialect_name != 'postgresql' and any(_large_list(value) is not None for value in (filters or {}).values())
+
+
+def read_query(engine: sqlalchemy.Engine,
+               schema: str,
+               table_name: str,
+               columns: Optional[Sequence[str]] = None,
+               filters: Optional[Filters] = None,
+               order_by: Optional[OrderBy] = None,
+               limit: Optional[int] = None,
+               index_col: Optional[str] = 'id',
+               conditions: Sequence[sqlalchemy.ColumnElement] = ()) -> pd.DataFrame:
+    """Run filtered_select on _engine_ and return the matching rows as a pandas dataframe."""
+    columns = with_index(columns, index_col)
+    with engine.connect() as conn, filtered_select(conn, schema, table_name, columns, filters, order_by, limit,
+                                                   conditions) as stmt:
+        return pd.read_sql(stmt, conn, index_col=index_col)
+
+
+def _conditions(filters: Filters, dialect_name: Optional[str]) -> List[sqlalchemy.ColumnElement]:
+    conditions = []
+    for col, value in filters.items():
+        col_expr = column(col)
+        if isinstance(value, tuple) and len(value) == 2 and value[0] in _OPERATORS:
+            operator, value = value
+            conditions.append(_OPERATORS[operator](col_expr, value))
+        elif value is None:
+            conditions.append(col_expr.is_(None))
+        elif _is_list(value):
+            values = list(value)
+            if dialect_name == 'postgresql' and len(values) > LARGE_LIST_THRESHOLD:
+                array_type = postgresql.ARRAY(sqlalchemy.types.to_instance(_sql_type(values)))
+                conditions.append(col_expr == any_(bindparam(f"{col}_values", values, type_=array_type)))
+            else:
+                conditions.append(col_expr.in_(values))
+        else:
+            conditions.append(col_expr == value)
+    return conditions
+
+
+def _load_temp_values(conn: sqlalchemy.Connection, values: Iterable) -> sqlalchemy.Table:
+    values = list(values)
+    values_table = sqlalchemy.Table(
+        f"tmp_filter_{uuid.uuid4().hex[:12]}",
+        sqlalchemy.MetaData(),
+        sqlalchemy.Column('value', _sql_type(values), primary_key=True),
+        prefixes=['TEMPORARY'],
+    )
+    values_table.create(conn)
+    conn.execute(values_table.insert(), [{'value': value} for value in set(values)])
+    return values_table
+
+
+def _sql_type(values: List[Any]) -> Any:
+    sample = next((value for value in values if value is not None), None)
+    if isinstance(sample, bool):
+        return sqlalchemy.Boolean
+    if isinstance(sample, int):
+        return sqlalchemy.BigInteger
+    if isinstance(sample, float):
+        return sqlalchemy.Float
+    return sqlalchemy.String
+
+
+def with_index(columns: Optional[Sequence[str]], index_col: Optional[str]) -> Optional[List[str]]:
+    if not columns:
+        return None
+    columns = list(columns)
+    if index_col and index_col not in columns:
+        columns.insert(0, index_col)
+    return columns
+
+
+def _large_list(value: Any) -> Optional[list]:
+    """Values of an IN filter longer than LARGE_LIST_THRESHOLD, given as a list or as an ('in', values) pair."""
+    if isinstance(value, tuple) and len(value) == 2 and value[0] == 'in':
+        value = value[1]
+    if _is_list(value) and len(value) > LARGE_LIST_THRESHOLD:
+        return list(value)
+    return None
+
+
+def _is_list(value: Any) -> bool:
+    if isinstance(value, (list, set, frozenset, tuple)):
+        return True
+    # Checked by name, so that plain filters do not import pandas
+    return type(value).__name__ == 'Series' and type(value).__module__.startswith('pandas')
+
+
+def _as_list(value: Optional[OrderBy]) -> List[str]:
+    if value is None:
+        return []
+    return [value] if isinstance(value, str) else list(value)
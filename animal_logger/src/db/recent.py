@@ -0,0 +1,140 @@
+import threading
+from collections import deque
+from datetime import datetime
+from itertools import islice
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+import sqlalchemy
+
+from config.log_config import LOGGER
+from animal_logger.src.db.bulk_load import iter_row_batches
+from animal_logger.src.db.query import build_select
+
+
+class Activity(NamedTuple):
+    timestamp: Optional[datetime]  # None for rows loaded from a table without the time column
+    kind: str  # 'insert' or 'edit'
+    record: Dict[str, Any]
+
+
+class RecentFeed:
+    """Latest inserts and edits of a table, in a ring buffer of _capacity_ entries.
+
+    The buffer is fed by UtilsDB's insert hook (see start) and by record_edit, so reading it never
+    touches the database: latest(k) costs O(k) whatever the size of the table. On a cold start,
+    warm_up fills it with the newest rows by _time_col_, a query served by an index on that column.
+    Tables without _time_col_ fall back to the newest ids.
+    """
+
+    def __init__(self,
+                 engine: sqlalchemy.Engine,
+                 schema: str,
+                 table_name: str,
+                 columns: Optional[Sequence[str]] = None,
+                 capacity: int = 500,
+                 time_col: str = 'created_at',
+                 index_col: str = 'id') -> None:
+        self.engine = engine
+        self.schema = schema
+        self.table_name = table_name
+        self.columns = list(columns) if columns else None
+        self.capacity = capacity
+        self.time_col = time_col
+        self.index_col = index_col
+        self.warm = False
+        self._items: deque = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def start(self) -> 'RecentFeed':
+        """Follow the inserts made through UtilsDB, then load the newest rows of the table."""
+        from animal_logger.src.db.utils_db import UtilsDB
+        UtilsDB.add_insert_listener(self.on_insert)
+        UtilsDB.add_update_listener(self.on_update)
+        self.warm_up()
+        return self
+
+    def stop(self) -> None:
+        from animal_logger.src.db.utils_db import UtilsDB
+        UtilsDB.remove_insert_listener(self.on_insert)
+        UtilsDB.remove_update_listener(self.on_update)
+
+    def warm_up(self) -> None:
+        """Fill the buffer with the _capacity_ newest rows, older than anything recorded since start."""
+        inspector = sqlalchemy.inspect(self.engine)
+        table_columns = {col['name'] for col in inspector.get_columns(self.table_name, schema=self.schema)}
+        if self.time_col in table_columns:
+            self.ensure_index()
+            order = [f'-{self.time_col}', f'-{self.index_col}']
+        else:
+            LOGGER.warning(f"'{self.schema}.{self.table_name}' has no '{self.time_col}' column, "
+                           f"recent activity is read by descending '{self.index_col}'.")
+            order = [f'-{self.index_col}']
+        columns = self.columns
+        if columns is not None and self.time_col in table_columns and self.time_col not in columns:
+            columns = columns + [self.time_col]
+        stmt = build_select(self.schema, self.table_name, columns, order_by=order, limit=self.capacity,
+                            dialect_name=self.engine.dialect.name)
+        with self.engine.connect() as conn:
+            result = conn.execute(stmt)
+            keys = list(result.keys())
+            rows = result.all()
+        with self._lock:
+            recorded = {item.record.get(self.index_col) for item in self._items}
+            loaded = deque(maxlen=self.capacity)
+            for row in reversed(rows):
+                record = dict(zip(keys, row))
+                if record.get(self.index_col) not in recorded:
+                    loaded.append(Activity(self._timestamp(record), 'insert', record))
+            loaded.extend(self._items)
+            self._items = loaded
+            self.warm = True
+        LOGGER.info(f"Recent activity of '{self.schema}.{self.table_name}' loaded with {len(rows)} records.")
+
+    def ensure_index(self) -> None:
+        table = sqlalchemy.Table(self.table_name, sqlalchemy.MetaData(), sqlalchemy.Column(self.time_col),
+                                 schema=self.schema)
+        index = sqlalchemy.Index(f'ix_{self.table_name}_{self.time_col}', table.c[self.time_col])
+        index.create(self.engine, checkfirst=True)
+
+    def on_insert(self, table: sqlalchemy.Table, data: Any) -> None:
+        if table.name != self.table_name:
+            return
+        for columns, rows in iter_row_batches(data):
+            # Rows pushed out of the buffer by the same batch are never built
+            self._add('insert', columns, rows[-self.capacity:])
+
+    def on_update(self, table: sqlalchemy.Table, data: Any) -> None:
+        if table.name != self.table_name:
+            return
+        for columns, rows in iter_row_batches(data):
+            self._add('edit', columns, rows[-self.capacity:])
+
+    def record_edit(self, record: Dict[str, Any]) -> None:
+        """Record an edited row, given as a {column: value} dict."""
+        self._add('edit', list(record), [tuple(record.values())])
+
+    def latest(self, k: int = 20) -> List[Activity]:
+        """The _k_ most recent entries, newest first."""
+        with self._lock:
+            return list(islice(reversed(self._items), k))
+
+    def _add(self, kind: str, columns: Sequence[str], rows: Sequence[tuple]) -> None:
+        now = datetime.now()
+        positions = [(col, idx) for idx, col in enumerate(columns)
+                     if self.columns is None or col in self.columns or col == self.time_col]
+        records = [{col: row[idx] for col, idx in positions} for row in rows]
+        with self._lock:
+            self._items.extend(Activity(self._timestamp(record) or now, kind, record) for record in records)
+
+    def _timestamp(self, record: Dict[str, Any]) -> Optional[datetime]:
+        value = record.get(self.time_col)
+        if isinstance(value, str):
+            # Backends without a native datetime type, e.g. SQLite, return the ISO text
+            try:
+                return datetime.fromisoformat(value)
+            except ValueError:
+                return None
+        return value if isinstance(value, datetime) else None
@@ -0,0 +1,370 @@
+import re
+import threading
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from itertools import islice
+from typing import Any, Dict, Hashable, Iterator, List, Optional, Sequence, Set, Tuple, Union
+
+import sqlalchemy
+from sqlalchemy import text
+
+from config.log_config import LOGGER
+from animal_logger.src.db.bulk_load import iter_row_batches
+from animal_logger.src.db.partitioned_reader import PartitionedReader
+
+SEARCH_FIELDS = ('name', 'species', 'genus', 'family', 'order', 'class_')
+
+# Letters and digits, anything else (underscores included) separates words, like SQLite's unicode61
+_WORD = re.compile(r'[^\W_]+')
+# Words whose postings are counted to estimate how many records a query word matches
+_COST_SAMPLE = 64
+
+
+def tokenize(value: Any) -> List[str]:
+    return _WORD.findall(str(value).lower())
+
+
+class SearchBackend(ABC):
+    """Search-as-you-type over some text columns of a table.
+
+    Every word of the query must match a word of the record, by its start at least (a prefix
+    match), so results can be listed while the user is still typing. pg_trgm and the in-memory
+    index also match fragments inside words.
+    """
+
+    def __init__(self, table_name: str, fields: Sequence[str], index_col: str) -> None:
+        self.table_name = table_name
+        self.fields = tuple(fields)
+        self.index_col = index_col
+
+    @abstractmethod
+    def search(self, query: str, limit: int = 20, job=None) -> List[Dict[str, Any]]:
+        """Up to _limit_ records matching _query_, as {index_col: ..., field: ...} dicts.
+
+        _job_ is the BackgroundWorker job running the search, if any: long searches stop once it is cancelled.
+        """
+
+    def on_insert(self, table: sqlalchemy.Table, data: Any) -> None:
+        """UtilsDB insert and update listener. Backends whose index is maintained by the database ignore it."""
+
+    def close(self) -> None:
+        """Stop following the inserts, for backends that do."""
+
+
+class MemorySearchIndex(SearchBackend):
+    """In-memory word index, with a trigram index of the words for matches inside words.
+
+    Words are kept in a sorted list, so the words starting with a prefix are found with a binary
+    search. New words first go to a small unsorted list merged into the sorted one once it grows
+    past _merge_threshold_, which keeps insertions cheap. Updated records are re-indexed and their
+    stale postings are filtered out when searching.
+    """
+
+    def __init__(self,
+                 table_name: str = 'animals',
+                 fields: Sequence[str] = SEARCH_FIELDS,
+                 index_col: str = 'id',
+                 merge_threshold: int = 10_000) -> None:
+        super().__init__(table_name, fields, index_col)
+        self.merge_threshold = merge_threshold
+        self._docs: Dict[Hashable, tuple] = {}
+        self._texts: Dict[Hashable, str] = {}  # ' word word ...' of every record, to verify matches
+        self._postings: Dict[str, List[Hashable]] = {}
+        self._words: List[str] = []
+        self._pending: List[str] = []
+        self._trigrams: Dict[str, Set[str]] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def load(self, engine: sqlalchemy.Engine, schema: str) -> 'MemorySearchIndex':
+        """Index the whole table, one partition at a time."""
+        reader = PartitionedReader(engine, schema, self.table_name, self.index_col, list(self.fields))
+        for partition in reader.iter_partitions():
+            for columns, rows in iter_row_batches(partition):
+                self.add_rows(columns, rows)
+        LOGGER.info(f"Search index of '{schema}.{self.table_name}' built with {len(self._docs)} records.")
+        return self
+
+    def on_insert(self, table: sqlalchemy.Table, data: Any) -> None:
+        if table.name == self.table_name:
+            for columns, rows in iter_row_batches(data):
+                self.add_rows(columns, rows)
+
+    def close(self) -> None:
+        from animal_logger.src.db.utils_db import UtilsDB
+        UtilsDB.remove_insert_listener(self.on_insert)
+        UtilsDB.remove_update_listener(self.on_insert)
+
+    def add_rows(self, columns: Sequence[str], rows: Sequence[tuple]) -> None:
+        if self.index_col not in columns:
+            # Ids generated by the database are unknown here, those records show up after a reload
+            LOGGER.debug(f"Rows without '{self.index_col}' not added to the search index of '{self.table_name}'.")
+            return
+        positions = [columns.index(field) if field in columns else None for field in self.fields]
+        id_position = columns.index(self.index_col)
+        with self._lock:
+            for row in rows:
+                values = tuple(row[pos] if pos is not None else None for pos in positions)
+                words = [word for value in values if value is not None for word in tokenize(value)]
+                doc_id = row[id_position]
+                doc_text = ' ' + ' '.join(words)
+                if self._texts.get(doc_id) == doc_text:
+                    continue
+                self._docs[doc_id] = values
+                self._texts[doc_id] = doc_text
+                for word in set(words):
+                    posting = self._postings.get(word)
+                    if posting is None:
+                        posting = self._postings[word] = []
+                        self._add_word(word)
+                    posting.append(doc_id)
+            if len(self._pending) >= self.merge_threshold:
+                self._merge_pending()
+
+    def search(self, query: str, limit: int = 20, job=None) -> List[Dict[str, Any]]:
+        """Records where every word of _query_ starts a word, then, if fewer than _limit_, records
+        where every word of _query_ appears inside a word (words of 3 characters or more drive that
+        second pass, as the trigram index needs them)."""
+        words = tokenize(query)
+        if not words:
+            return []
+        hits: List[Hashable] = []
+        seen: Set[Hashable] = set()
+        with self._lock:
+            for words_of, needles, drivers in ((self._prefix_words, [' ' + word for word in words], words),
+                                               (self._infix_words, words, [word for word in words if len(word) >= 3])):
+                if not drivers or len(hits) >= limit:
+                    continue
+                # Walk the postings of the rarest word only, the other words are checked on the record text
+                driver = self._most_selective(drivers, words_of)
+                for checked, doc_id in enumerate(self._docs_of(words_of(driver))):
+                    if job is not None and checked % 1024 == 0:
+                        job.check_cancelled()
+                    if doc_id in seen:
+                        continue
+                    doc_text = self._texts[doc_id]
+                    if all(needle in doc_text for needle in needles):
+                        seen.add(doc_id)
+                        hits.append(doc_id)
+                        if len(hits) >= limit:
+                            break
+            return [dict(zip((self.index_col, *self.fields), (doc_id, *self._docs[doc_id]))) for doc_id in hits]
+
+    def _most_selective(self, words: Sequence[str], words_of) -> str:
+        return words[0] if len(words) == 1 else min(words, key=lambda word: self._cost(word, words_of))
+
+    def _cost(self, word: str, words_of) -> float:
+        """Estimated number of postings to walk for _word_, from those of its first matching words."""
+        sample = list(islice(words_of(word), _COST_SAMPLE))
+        cost = sum(len(self._postings[matching_word]) for matching_word in sample)
+        if len(sample) == _COST_SAMPLE and words_of == self._prefix_words:
+            cost *= self._prefix_count(word) / _COST_SAMPLE
+        return cost
+
+    def _add_word(self, word: str) -> None:
+        self._pending.append(word)
+        for idx in range(len(word) - 2):
+            self._trigrams.setdefault(word[idx: idx + 3], set()).add(word)
+
+    def _merge_pending(self) -> None:
+        # Both lists are runs for timsort, the merge is linear
+        self._words = sorted(self._words + self._pending)
+        self._pending = []
+
+    def _prefix_range(self, prefix: str) -> Tuple[int, int]:
+        return bisect_left(self._words, prefix), bisect_left(self._words, prefix + '\U0010ffff')
+
+    def _prefix_count(self, prefix: str) -> int:
+        lower, upper = self._prefix_range(prefix)
+        return upper - lower + sum(1 for word in self._pending if word.startswith(prefix))
+
+    def _prefix_words(self, prefix: str) -> Iterator[str]:
+        yield from sorted(word for word in self._pending if word.startswith(prefix))
+        lower, upper = self._prefix_range(prefix)
+        for idx in range(lower, upper):
+            yield self._words[idx]
+
+    def _infix_words(self, fragment: str) -> Iterator[str]:
+        trigram_sets = sorted((self._trigrams.get(fragment[idx: idx + 3], set())
+                               for idx in range(len(fragment) - 2)), key=len)
+        for word in sorted(trigram_sets[0]):
+            if fragment in word and all(word in trigram_set for trigram_set in trigram_sets[1:]):
+                yield word
+
+    def _docs_of(self, words: Iterator[str]) -> Iterator[Hashable]:
+        for word in words:
+            yield from self._postings[word]
+
+
+class SqliteFtsSearch(SearchBackend):
+    """SQLite FTS5 index of the table, kept in sync by triggers on inserts, updates and deletes."""
+
+    def __init__(self, engine: sqlalchemy.Engine, schema: str, table_name: str,
+                 fields: Sequence[str] = SEARCH_FIELDS, index_col: str = 'id') -> None:
+        super().__init__(table_name, fields, index_col)
+        self.engine = engine
+        self.schema = schema
+        quote = engine.dialect.identifier_preparer.quote
+        self._table = quote(table_name)
+        self._fts = quote(f'{table_name}_search')
+        self._index_col = quote(index_col)
+        self._fields = [quote(field) for field in self.fields]
+
+    def index_exists(self) -> bool:
+        schema = self.engine.dialect.identifier_preparer.quote(self.schema)
+        with self.engine.connect() as conn:
+            return conn.execute(text(f"SELECT 1 FROM {schema}.sqlite_master WHERE name = :name"),
+                                {'name': f'{self.table_name}_search'}).first() is not None
+
+    def ensure_index(self) -> None:
+        """Create the FTS5 table and its triggers, and index the existing rows, unless already done.
+
+        Raises:
+            sqlalchemy.exc.OperationalError: SQLite was built without FTS5.
+        """
+        schema = self.engine.dialect.identifier_preparer.quote(self.schema)
+        fields = ', '.join(self._fields)
+        new_fields = ', '.join(f'new.{field}' for field in self._fields)
+        old_fields = ', '.join(f'old.{field}' for field in self._fields)
+        delete = (f"INSERT INTO {self._fts}({self._fts}, rowid, {fields}) "
+                  f"VALUES ('delete', old.{self._index_col}, {old_fields});")
+        insert = f"INSERT INTO {self._fts}(rowid, {fields}) VALUES (new.{self._index_col}, {new_fields});"
+        if self.index_exists():
+            return
+        with self.engine.begin() as conn:
+            conn.execute(text(f"CREATE VIRTUAL TABLE {schema}.{self._fts} USING fts5({fields}, "
+                              f"content={self._table}, content_rowid={self._index_col}, prefix='2 3')"))
+            for suffix, event, body in (('ai', 'INSERT', insert),
+                                        ('ad', 'DELETE', delete),
+                                        ('au', 'UPDATE', delete + ' ' + insert)):
+                trigger = self.engine.dialect.identifier_preparer.quote(f'{self.table_name}_search_{suffix}')
+                conn.execute(text(f"CREATE TRIGGER {schema}.{trigger} AFTER {event} ON {self._table} "
+                                  f"BEGIN {body} END"))
+            conn.execute(text(f"INSERT INTO {schema}.{self._fts}({self._fts}) VALUES ('rebuild')"))
+        LOGGER.info(f"FTS5 search index of '{self.schema}.{self.table_name}' created.")
+
+    def search(self, query: str, limit: int = 20, job=None) -> List[Dict[str, Any]]:
+        words = tokenize(query)
+        if not words:
+            return []
+        schema = self.engine.dialect.identifier_preparer.quote(self.schema)
+        match = ' '.join(f'"{word}"*' for word in words)
+        fields = ', '.join(f't.{field}' for field in self._fields)
+        stmt = text(f"SELECT t.{self._index_col}, {fields} FROM {schema}.{self._fts} "
+                    f"JOIN {schema}.{self._table} t ON t.{self._index_col} = {self._fts}.rowid "
+                    f"WHERE {self._fts} MATCH :match LIMIT :limit")
+        with self.engine.connect() as conn:
+            rows = conn.execute(stmt, {'match': match, 'limit': limit}).all()
+        return [dict(zip((self.index_col, *self.fields), row)) for row in rows]
+
+
+class PgTrgmSearch(SearchBackend):
+    """PostgreSQL search served by a pg_trgm GIN index on the concatenated fields."""
+
+    def __init__(self, engine: sqlalchemy.Engine, schema: str, table_name: str,
+                 fields: Sequence[str] = SEARCH_FIELDS, index_col: str = 'id') -> None:
+        super().__init__(table_name, fields, index_col)
+        self.engine = engine
+        self.schema = schema
+        quote = engine.dialect.identifier_preparer.quote
+        self._table = f"{quote(schema)}.{quote(table_name)}"
+        self._index_col = quote(index_col)
+        self._fields = [quote(field) for field in self.fields]
+        # || on text is immutable, unlike concat_ws, so the expression can be indexed
+        self._document = "lower(" + " || ' ' || ".join(f"coalesce({field}::text, '')" for field in self._fields) + ")"
+
+    @staticmethod
+    def is_available(engine: sqlalchemy.Engine) -> bool:
+        with engine.connect() as conn:
+            return conn.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).first() is not None
+
+    def index_exists(self) -> bool:
+        with self.engine.connect() as conn:
+            return conn.execute(text("SELECT 1 FROM pg_indexes WHERE schemaname = :schema AND indexname = :name"),
+                                {'schema': self.schema, 'name': f'{self.table_name}_search_trgm'}).first() is not None
+
+    def ensure_index(self) -> None:
+        index_name = self.engine.dialect.identifier_preparer.quote(f'{self.table_name}_search_trgm')
+        with self.engine.begin() as conn:
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS {index_name} ON {self._table} "
+                              f"USING gin (({self._document}) gin_trgm_ops)"))
+
+    def search(self, query: str, limit: int = 20, job=None) -> List[Dict[str, Any]]:
+        words = tokenize(query)
+        if not words:
+            return []
+        conditions = ' AND '.join(f"{self._document} LIKE :word_{idx}" for idx in range(len(words)))
+        params = {f'word_{idx}': f'%{word}%' for idx, word in enumerate(words)}
+        fields = ', '.join(self._fields)
+        stmt = text(f"SELECT {self._index_col}, {fields} FROM {self._table} WHERE {conditions} LIMIT :limit")
+        with self.engine.connect() as conn:
+            rows = conn.execute(stmt, {**params, 'limit': limit}).all()
+        return [dict(zip((self.index_col, *self.fields), row)) for row in rows]
+
+
+def _database_backend(engine: sqlalchemy.Engine, schema: str, table_name: str, fields: Sequence[str],
+                      index_col: str) -> Optional[Union[SqliteFtsSearch, PgTrgmSearch]]:
+    if engine.dialect.name == 'postgresql' and PgTrgmSearch.is_available(engine):
+        return PgTrgmSearch(engine, schema, table_name, fields, index_col)
+    if engine.dialect.name == 'sqlite':
+        return SqliteFtsSearch(engine, schema, table_name, fields, index_col)
+    return None
+
+
+def create_search_index(engine: sqlalchemy.Engine,
+                        schema: str,
+                        table_name: str,
+                        fields: Sequence[str] = SEARCH_FIELDS,
+                        index_col: str = 'id') -> bool:
+    """Create the database search index of the table, a setup step: on large tables it takes a while
+    and locks the table for writes.
+
+    Returns:
+        bool: Whether the database supports one (pg_trgm installed, SQLite with FTS5).
+    """
+    backend = _database_backend(engine, schema, table_name, fields, index_col)
+    if backend is None:
+        return False
+    try:
+        backend.ensure_index()
+    except sqlalchemy.exc.OperationalError as e:
+        LOGGER.warning(f"No search index created on '{schema}.{table_name}': {e}")
+        return False
+    return True
+
+
+def open_search_backend(engine: sqlalchemy.Engine,
+                        schema: str,
+                        table_name: str,
+                        fields: Sequence[str] = SEARCH_FIELDS,
+                        index_col: str = 'id',
+                        create_index: bool = False) -> SearchBackend:
+    """Best search backend for _engine_: pg_trgm on PostgreSQL, or FTS5 on SQLite, when the table has the
+    search index, otherwise an in-memory index loaded from the table.
+
+    The database index is only created here with _create_index_, see create_search_index. The in-memory
+    index is registered as a UtilsDB insert and update listener, so it follows the records until it is closed.
+    """
+    from animal_logger.src.db.utils_db import UtilsDB
+    backend: Optional[SearchBackend] = None
+    try:
+        database_backend = _database_backend(engine, schema, table_name, fields, index_col)
+        if database_backend is not None:
+            if create_index:
+                database_backend.ensure_index()
+            if database_backend.index_exists():
+                backend = database_backend
+            else:
+                LOGGER.info(f"No search index on '{schema}.{table_name}', using an in-memory index. "
+                            f"See search.create_search_index.")
+    except (sqlalchemy.exc.OperationalError, sqlalchemy.exc.ProgrammingError) as e:
+        LOGGER.warning(f"Database search index unavailable, using an in-memory index instead: {e}")
+        backend = None
+    if backend is None:
+        backend = MemorySearchIndex(table_name, fields, index_col).load(engine, schema)
+        # Updated records are re-indexed like new ones
+        UtilsDB.add_insert_listener(backend.on_insert)
+        UtilsDB.add_update_listener(backend.on_insert)
+    return backend
@@ -0,0 +1,237 @@
+import math
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import sqlalchemy
+from sqlalchemy import text
+
+from config.log_config import LOGGER
+from animal_logger.src.db.bulk_load import iter_row_batches
+
+# Dimension of the summary -> column of the records table
+DIMENSIONS = {'class': 'class_', 'sex': 'sex', 'species': 'species'}
+AGE_COLUMN = 'age'
+
+SummaryRow = Tuple[str, str, int, float, int]  # dimension, value, animals, sum of ages, animals with an age
+
+
+class HerdSummary:
+    """Counts of animals per class, sex, species and age bucket, with age totals to derive means.
+
+    Its size depends on the number of distinct classes, species... not on the number of animals, so
+    reading it costs the same whatever the size of the herd. Rows are added incrementally with
+    add_rows, or the whole summary is loaded from the summary table with from_rows.
+    """
+
+    def __init__(self, age_bucket: int = 5) -> None:
+        self.age_bucket = age_bucket
+        self.animals = 0
+        self.age_sum = 0.0
+        self.age_count = 0
+        self.counts: Dict[str, Counter] = {dimension: Counter() for dimension in (*DIMENSIONS, 'age')}
+        self.updated = time.time()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[SummaryRow], age_bucket: int = 5) -> 'HerdSummary':
+        summary = cls(age_bucket)
+        for dimension, value, animals, age_sum, age_count in rows:
+            if dimension == 'all':
+                summary.animals, summary.age_sum, summary.age_count = animals, age_sum or 0.0, age_count
+            else:
+                summary.counts[dimension][value] = animals
+        return summary
+
+    def add_rows(self, columns: Sequence[str], rows: Sequence[tuple]) -> None:
+        positions = {dimension: columns.index(col) for dimension, col in DIMENSIONS.items() if col in columns}
+        age_position = columns.index(AGE_COLUMN) if AGE_COLUMN in columns else None
+        with self._lock:
+            self.animals += len(rows)
+            for dimension, position in positions.items():
+                self.counts[dimension].update(str(row[position]) for row in rows if row[position] is not None)
+            if age_position is not None:
+                ages = [row[age_position] for row in rows if row[age_position] is not None]
+                self.age_sum += sum(ages)
+                self.age_count += len(ages)
+                self.counts['age'].update(self.age_label(age) for age in ages)
+            self.updated = time.time()
+
+    def age_label(self, age: float) -> str:
+        lower = math.floor(age / self.age_bucket) * self.age_bucket
+        return f"{lower}-{lower + self.age_bucket - 1}"
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Copy of the figures, safe to read from another thread."""
+        with self._lock:
+            return {
+                'animals': self.animals,
+                'mean_age': self.age_sum / self.age_count if self.age_count else None,
+                'by_class': dict(self.counts['class']),
+                'by_sex': dict(self.counts['sex']),
+                'by_species': dict(self.counts['species'].most_common()),
+                # Buckets in age order, labels are '<lower>-<upper>'
+                'by_age': dict(sorted(self.counts['age'].items(), key=lambda item: int(item[0].split('-')[0]))),
+                'updated': self.updated,
+            }
+
+
+class SummaryTable:
+    """Summary of a records table kept by the database, one row per (dimension, value).
+
+    PostgreSQL keeps it as a materialized view, refreshed concurrently so that reads never wait.
+    Other backends get a plain table rebuilt in one transaction. Either way the counting runs in
+    the database and reading the summary only transfers a few dozen rows.
+    """
+
+    def __init__(self, engine: sqlalchemy.Engine, schema: str, table_name: str, age_bucket: int = 5) -> None:
+        self.engine = engine
+        self.schema = schema
+        self.table_name = table_name
+        self.age_bucket = age_bucket
+        preparer = engine.dialect.identifier_preparer
+        self._source = f"{preparer.quote(schema)}.{preparer.quote(table_name)}"
+        self._summary = f"{preparer.quote(schema)}.{preparer.quote(table_name + '_summary')}"
+        self._quote = preparer.quote
+        self._materialized = engine.dialect.name == 'postgresql'
+
+    def select_sql(self) -> str:
+        """One aggregate per dimension, plus the totals of the 'all' dimension."""
+        age = self._quote(AGE_COLUMN)
+        # Same buckets as HerdSummary.age_label. SQLite truncates when casting, which is a floor for ages
+        bucket = f"{age} / {self.age_bucket}"
+        if self.engine.dialect.name != 'sqlite':
+            bucket = f"floor({bucket})"
+        lower = f"CAST({bucket} AS INTEGER) * {self.age_bucket}"
+        age_label = f"CAST({lower} AS VARCHAR(16)) || '-' || CAST({lower} + {self.age_bucket - 1} AS VARCHAR(16))"
+        parts = [f"SELECT 'all' AS dimension, '' AS value, count(*) AS animals, sum({age}) AS age_sum, "
+                 f"count({age}) AS age_count FROM {self._source}"]
+        for dimension, col in DIMENSIONS.items():
+            col = self._quote(col)
+            parts.append(f"SELECT '{dimension}', CAST({col} AS VARCHAR(255)), count(*), sum({age}), count({age}) "
+                         f"FROM {self._source} WHERE {col} IS NOT NULL GROUP BY {col}")
+        parts.append(f"SELECT 'age', {age_label}, count(*), sum({age}), count({age}) "
+                     f"FROM {self._source} WHERE {age} IS NOT NULL GROUP BY {age_label}")
+        return ' UNION ALL '.join(parts)
+
+    def ensure(self) -> None:
+        """Create the summary, filled, unless it exists."""
+        inspector = sqlalchemy.inspect(self.engine)
+        name = f'{self.table_name}_summary'
+        if self._materialized:
+            if name in inspector.get_materialized_view_names(schema=self.schema):
+                return
+            index = self._quote(f'{name}_key')
+            with self.engine.begin() as conn:
+                conn.execute(text(f"CREATE MATERIALIZED VIEW {self._summary} AS {self.select_sql()}"))
+                # REFRESH ... CONCURRENTLY needs a unique index
+                conn.execute(text(f"CREATE UNIQUE INDEX {index} ON {self._summary} (dimension, value)"))
+        else:
+            if inspector.has_table(name, schema=self.schema):
+                return
+            with self.engine.begin() as conn:
+                conn.execute(text(f"CREATE TABLE {self._summary} (dimension VARCHAR(16), value VARCHAR(255), "
+                                  f"animals BIGINT, age_sum FLOAT, age_count BIGINT, PRIMARY KEY (dimension, value))"))
+            self.refresh()
+        LOGGER.info(f"Summary of '{self.schema}.{self.table_name}' created.")
+
+    def refresh(self) -> None:
+        start = time.perf_counter()
+        with self.engine.begin() as conn:
+            if self._materialized:
+                conn.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {self._summary}"))
+            else:
+                conn.execute(text(f"DELETE FROM {self._summary}"))
+                conn.execute(text(f"INSERT INTO {self._summary} (dimension, value, animals, age_sum, age_count) "
+                                  f"{self.select_sql()}"))
+        LOGGER.debug(f"Summary of '{self.schema}.{self.table_name}' refreshed in {time.perf_counter() - start:.2f} s.")
+
+    def read(self) -> List[SummaryRow]:
+        with self.engine.connect() as conn:
+            return [tuple(row) for row in conn.execute(
+                text(f"SELECT dimension, value, animals, age_sum, age_count FROM {self._summary}"))]
+
+
+class SummaryService:
+    """Serve a HerdSummary of a records table, kept current from both ends.
+
+    Inserts made through UtilsDB are added to the in-memory summary as they happen, and mark the
+    summary table stale. A background thread refreshes the table, and reloads the in-memory summary
+    from it, every _refresh_interval_ seconds, or _min_interval_ seconds after a change, which also
+    corrects anything the incremental path cannot see (updates, deletes, other clients).
+    """
+
+    def __init__(self,
+                 engine: sqlalchemy.Engine,
+                 schema: str,
+                 table_name: str,
+                 refresh_interval: float = 300,
+                 min_interval: float = 30,
+                 age_bucket: int = 5) -> None:
+        self.engine = engine
+        self.table_name = table_name
+        self.refresh_interval = refresh_interval
+        self.min_interval = min_interval
+        self.table = SummaryTable(engine, schema, table_name, age_bucket)
+        self.summary = HerdSummary(age_bucket)
+        self._changed = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> 'SummaryService':
+        """Load the summary from the database, then follow inserts and refresh in the background."""
+        from animal_logger.src.db.utils_db import UtilsDB
+        self.table.ensure()
+        self.reload()
+        UtilsDB.add_insert_listener(self.on_insert)
+        UtilsDB.add_update_listener(self.on_update)
+        self._thread = threading.Thread(target=self._run, name='summary-refresh', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        from animal_logger.src.db.utils_db import UtilsDB
+        UtilsDB.remove_insert_listener(self.on_insert)
+        UtilsDB.remove_update_listener(self.on_update)
+        self._stopped.set()
+        self._changed.set()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return self.summary.snapshot()
+
+    def on_insert(self, table: sqlalchemy.Table, data: Any) -> None:
+        if table.name != self.table_name:
+            return
+        for columns, rows in iter_row_batches(data):
+            self.summary.add_rows(columns, rows)
+        self._changed.set()
+
+    def on_update(self, table: sqlalchemy.Table, data: Any) -> None:
+        # The values replaced are unknown here, the next refresh recounts the updated rows
+        if table.name == self.table_name:
+            self._changed.set()
+
+    def reload(self) -> None:
+        self.summary = HerdSummary.from_rows(self.table.read(), self.summary.age_bucket)
+
+    def refresh(self) -> None:
+        self.table.refresh()
+        self.reload()
+
+    def _run(self) -> None:
+        last_refresh = time.monotonic()
+        while not self._stopped.is_set():
+            self._changed.wait(timeout=max(0.0, self.refresh_interval - (time.monotonic() - last_refresh)))
+            if self._stopped.is_set():
+                return
+            # Changes arriving in bursts are folded into one refresh
+            wait = self.min_interval - (time.monotonic() - last_refresh)
+            if wait > 0 and self._stopped.wait(timeout=wait):
+                return
+            self._changed.clear()
+            try:
+                self.refresh()
+            except Exception as e:
+                LOGGER.error(f"Refreshing the summary of '{self.table_name}' failed: {e}")
+            last_refresh = time.monotonic()
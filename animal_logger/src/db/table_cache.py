@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence, Union
+
+import sqlalchemy
+from sqlalchemy import column, func, select, table
+
+from config.log_config import LOGGER
+from animal_logger.src.lazy import lazy_import
+from animal_logger.src.db.partitioned_reader import PartitionedReader
+from animal_logger.src.db.query import Filters, filtered_select, read_query, with_index
+
+pd = lazy_import('pandas')
+pa = lazy_import('pyarrow')
+
+
+class TableCache:
+    """Local cache of tables, or filtered queries, stored as Arrow IPC files and read memory-mapped.
+
+    Before serving an entry, one aggregate query compares count(*), max(index) and, if given, the
+    max of a watermark column (e.g. 'updated_at') with the state stored next to the entry:
+        - unchanged state: the files are served as they are (hit).
+        - rows appended, or changed after the watermark: only those rows are fetched and stored
+          as an extra file (incremental refresh).
+        - anything else, e.g. deleted rows: the entry is rebuilt (miss).
+    Entries are evicted in least-recently-used order once the cache grows beyond _max_bytes_.
+    """
+
+    INDEX_FILE = 'index.json'
+
+    def __init__(self, cache_dir: Union[str, Path], max_bytes: int = 2 * 2**30, index_col: str = 'id') -> None:
+        self.cache_dir = Path(cache_dir).expanduser()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.index_col = index_col
+        self.hits = 0
+        self.misses = 0
+        self.incremental_refreshes = 0
+        self.evictions = 0
+        self._lock = threading.RLock()
+        self._entries = self._load_index()
+
+    def read(self,
+             engine: sqlalchemy.Engine,
+             schema: str,
+             table_name: str,
+             columns: Optional[Sequence[str]] = None,
+             filters: Optional[Filters] = None,
+             watermark_col: Optional[str] = None) -> pd.DataFrame:
+        """Return the rows of _schema.table_name_ matching _filters_, indexed by _index_col_ like read_query,
+        from the cache when up to date."""
+        arrow_table = self.read_arrow(engine, schema, table_name, columns, filters, watermark_col)
+        return arrow_table.to_pandas().set_index(self.index_col)
+
+    def read_arrow(self,
+                   engine: sqlalchemy.Engine,
+                   schema: str,
+                   table_name: str,
+                   columns: Optional[Sequence[str]] = None,
+                   filters: Optional[Filters] = None,
+                   watermark_col: Optional[str] = None) -> pa.Table:
+        """Same as read, but returns the memory-mapped Arrow table without converting it to pandas."""
+        columns = with_index(columns, self.index_col)
+        key = self._key(engine, schema, table_name, columns, filters, watermark_col)
+        with self._lock:
+            state = self._table_state(engine, schema, table_name, filters, watermark_col)
+            entry = self._entries.get(key)
+            if entry is not None and entry['state'] == state:
+                self.hits += 1
+            elif entry is not None and self._refresh(entry, state, engine, columns, filters, watermark_col):
+                self.incremental_refreshes += 1
+            else:
+                self.misses += 1
+                entry = self._rebuild(key, state, engine, schema, table_name, columns, filters, watermark_col)
+            entry['last_access'] = time.time()
+            self._evict(keep=key)
+            self._save_index()
+            arrow_table = self._load(entry)
+        if watermark_col and len(entry['files']) > 1:
+            # Rows changed after the watermark appear in several files, the newest copy wins
+            df = arrow_table.to_pandas()
+            df = df[~df[self.index_col].duplicated(keep='last')]
+            arrow_table = pa.Table.from_pandas(df, preserve_index=False)
+        return arrow_table
+
+    def invalidate(self, schema: Optional[str] = None, table_name: Optional[str] = None) -> None:
+        """Drop the entries of a table, of a schema, or all of them."""
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if schema in (None, entry['schema']) and table_name in (None, entry['table_name']):
+                    self._drop(key)
+            self._save_index()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'incremental_refreshes': self.incremental_refreshes,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'size_bytes': sum(entry['size'] for entry in self._entries.values()),
+            }
+
+    def _table_state(self, engine: sqlalchemy.Engine, schema: str, table_name: str,
+                     filters: Optional[Filters], watermark_col: Optional[str]) -> list:
+        aggregates = [func.count(), func.max(column(self.index_col))]
+        if watermark_col:
+            aggregates.append(func.max(column(watermark_col)))
+        with engine.connect() as conn, filtered_select(conn, schema, table_name, filters=filters) as filtered:
+            stmt = select(*aggregates).select_from(table(table_name, schema=schema))
+            if filtered.whereclause is not None:
+                stmt = stmt.where(filtered.whereclause)
+            row = conn.execute(stmt).one()
+        # JSON round trip, so that states read back from the index compare equal
+        return json.loads(json.dumps(list(row), default=str))
+
+    def _rebuild(self, key: str, state: list, engine: sqlalchemy.Engine, schema: str, table_name: str,
+                 columns: Optional[Sequence[str]], filters: Optional[Filters],
+                 watermark_col: Optional[str]) -> dict:
+        self._drop(key)
+        entry = {'key': key, 'schema': schema, 'table_name': table_name, 'state': state, 'files': [],
+                 'size': 0, 'watermark_col': watermark_col}
+        folder = self.cache_dir / key
+        folder.mkdir()
+        reader = PartitionedReader(engine, schema, table_name, self.index_col, columns, filters)
+        for partition in reader.iter_partitions():
+            self._write(entry, folder, partition)
+        if not entry['files']:
+            self._write(entry, folder, read_query(engine, schema, table_name, columns, filters,
+                                                  limit=0, index_col=self.index_col))
+        self._entries[key] = entry
+        LOGGER.debug(f"Table cache entry for '{schema}.{table_name}' rebuilt ({entry['size']} bytes).")
+        return entry
+
+    def _refresh(self, entry: dict, state: list, engine: sqlalchemy.Engine, columns: Optional[Sequence[str]],
+                 filters: Optional[Filters], watermark_col: Optional[str]) -> bool:
+        old_count, old_max = entry['state'][0], entry['state'][1]
+        if old_max is None:
+            return False
+        if watermark_col and entry['state'][2] is not None:
+            changed = column(watermark_col) > entry['state'][2]
+        else:
+            changed = column(self.index_col) > old_max
+        delta = read_query(engine, entry['schema'], entry['table_name'], columns, filters,
+                           index_col=self.index_col, conditions=[changed])
+        # Any other difference in the row count means rows were deleted, or changed unnoticed
+        if old_count + int((delta.index > old_max).sum()) != state[0]:
+            return False
+        self._write(entry, self.cache_dir / entry['key'], delta)
+        entry['state'] = state
+        LOGGER.debug(f"Table cache entry for '{entry['schema']}.{entry['table_name']}' "
+                     f"refreshed with {len(delta)} rows.")
+        return True
+
+    def _write(self, entry: dict, folder: Path, df: pd.DataFrame) -> None:
+        path = folder / f"part_{len(entry['files']):05d}.arrow"
+        arrow_table = pa.Table.from_pandas(df.reset_index(), preserve_index=False)
+        with pa.OSFile(str(path), 'wb') as sink, pa.ipc.new_file(sink, arrow_table.schema) as writer:
+            writer.write_table(arrow_table)
+        entry['files'].append(path.name)
+        entry['size'] += path.stat().st_size
+
+    def _load(self, entry: dict) -> pa.Table:
+        folder = self.cache_dir / entry['key']
+        tables = [pa.ipc.open_file(pa.memory_map(str(folder / name))).read_all() for name in entry['files']]
+        return pa.concat_tables(tables, promote_options='default')
+
+    def _evict(self, keep: str) -> None:
+        by_last_access = sorted(self._entries, key=lambda key: self._entries[key]['last_access'])
+        total = sum(entry['size'] for entry in self._entries.values())
+        for key in by_last_access:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            total -= self._entries[key]['size']
+            self._drop(key)
+            self.evictions += 1
+
+    def _drop(self, key: str) -> None:
+        self._entries.pop(key, None)
+        shutil.rmtree(self.cache_dir / key, ignore_errors=True)
+
+    def _key(self, engine: sqlalchemy.Engine, schema: str, table_name: str, columns: Optional[Sequence[str]],
+             filters: Optional[Filters], watermark_col: Optional[str]) -> str:
+        description = json.dumps([engine.url.render_as_string(hide_password=True), schema, table_name,
+                                  columns, filters, watermark_col], default=str, sort_keys=True)
+        return hashlib.sha1(description.encode()).hexdigest()
+
+    def _load_index(self) -> Dict[str, dict]:
+        index_path = self.cache_dir / self.INDEX_FILE
+        if not index_path.exists():
+            return {}
+        try:
+            return json.loads(index_path.read_text())
+        except json.JSONDecodeError:
+            LOGGER.warning(f"Table cache index '{index_path}' is corrupt, starting with an empty cache.")
+            return {}
+
+    def _save_index(self) -> None:
+        index_path = self.cache_dir / self.INDEX_FILE
+        tmp_path = index_path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(self._entries))
+        tmp_path.replace(index_path)
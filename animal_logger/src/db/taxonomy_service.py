@@ -0,0 +1,132 @@
+import atexit
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Any, Hashable, List, Optional, Union
+
+import sqlalchemy
+from sqlalchemy import func, select, table
+
+from config.log_config import LOGGER
+from animal_logger.src.animals.taxonomy import TAXONOMY_RANKS, TaxonomyIndex
+from animal_logger.src.db.bulk_load import iter_row_batches
+from animal_logger.src.db.partitioned_reader import PartitionedReader
+
+
+class TaxonomyService:
+    """Serve a TaxonomyIndex of a records table, kept current by the inserts made through UtilsDB.
+
+    The index saved by the previous session is loaded at start when it still holds as many animals
+    as the table, otherwise it is rebuilt from the taxonomy columns, one partition at a time, and
+    saved again, as it is at exit or when the user changes. Updates move an animal only when they carry all the taxonomy columns of the table.
+    Queries and inserts are serialized by a lock, as inserts arrive from writer threads.
+    """
+
+    def __init__(self,
+                 engine: sqlalchemy.Engine,
+                 schema: str,
+                 table_name: str,
+                 path: Union[str, Path],
+                 index_col: str = 'id') -> None:
+        self.engine = engine
+        self.schema = schema
+        self.table_name = table_name
+        self.path = Path(path).expanduser()
+        self.index_col = index_col
+        self.columns: List[str] = []
+        self.index = TaxonomyIndex()
+        self._lock = threading.Lock()
+
+    def start(self) -> 'TaxonomyService':
+        """Follow the inserts, then load or build the index."""
+        from animal_logger.src.db.utils_db import UtilsDB
+        inspector = sqlalchemy.inspect(self.engine)
+        table_columns = {col['name'] for col in inspector.get_columns(self.table_name, schema=self.schema)}
+        self.columns = [rank for rank in TAXONOMY_RANKS if rank in table_columns]
+        UtilsDB.add_insert_listener(self.on_insert)
+        UtilsDB.add_update_listener(self.on_update)
+        atexit.register(self.stop)
+        index = self._load()
+        if index is None:
+            index = self.build()
+            self._save(index)
+        with self._lock:
+            # Rows recorded while loading may also be in the loaded index, re-adding them moves nothing
+            for animal_id, node in self.index.items():
+                index.add(self.index.lineage(node), animal_id)
+            self.index = index
+        return self
+
+    def stop(self) -> None:
+        """Stop following the inserts and save the index for the next session."""
+        from animal_logger.src.db.utils_db import UtilsDB
+        UtilsDB.remove_insert_listener(self.on_insert)
+        UtilsDB.remove_update_listener(self.on_update)
+        atexit.unregister(self.stop)
+        with self._lock:
+            self._save(self.index)
+
+    def build(self) -> TaxonomyIndex:
+        index = TaxonomyIndex()
+        reader = PartitionedReader(self.engine, self.schema, self.table_name, self.index_col, self.columns)
+        for partition in reader.iter_partitions():
+            index.add_rows(partition.reset_index().to_dict('records'), self.index_col)
+        LOGGER.info(f"Taxonomy index of '{self.schema}.{self.table_name}' built with {index.n_animals} animals.")
+        return index
+
+    def on_insert(self, table: sqlalchemy.Table, data: Any) -> None:
+        if table.name != self.table_name:
+            return
+        for columns, rows in iter_row_batches(data):
+            self._add(columns, rows)
+
+    def on_update(self, table: sqlalchemy.Table, data: Any) -> None:
+        # Without every taxonomy column, the new lineage of the animal is unknown here
+        if table.name != self.table_name:
+            return
+        for columns, rows in iter_row_batches(data):
+            if all(col in columns for col in self.columns):
+                self._add(columns, rows)
+
+    def count_by_rank(self, rank: str) -> Counter:
+        with self._lock:
+            return self.index.count_by_rank(rank)
+
+    def count_under(self, rank: str, name: str) -> int:
+        with self._lock:
+            return self.index.count_under(rank, name)
+
+    def animals_under(self, rank: str, name: str) -> List[Hashable]:
+        with self._lock:
+            return self.index.animals_under(rank, name)
+
+    def _add(self, columns: List[str], rows: List[tuple]) -> None:
+        if self.index_col not in columns:
+            return
+        with self._lock:
+            self.index.add_rows((dict(zip(columns, row)) for row in rows), self.index_col)
+
+    def _load(self) -> Optional[TaxonomyIndex]:
+        if not self.path.exists():
+            return None
+        try:
+            index = TaxonomyIndex.load(self.path)
+        except (OSError, ValueError, KeyError) as e:
+            LOGGER.warning(f"Taxonomy index '{self.path}' cannot be read, rebuilding it: {e}")
+            return None
+        with self.engine.connect() as conn:
+            animals = conn.execute(select(func.count()).select_from(table(self.table_name, schema=self.schema))).scalar()
+        if animals != index.n_animals:
+            LOGGER.info(f"Taxonomy index '{self.path}' is out of date ({index.n_animals} animals, "
+                        f"{animals} in the table), rebuilding it.")
+            return None
+        return index
+
+    def _save(self, index: TaxonomyIndex) -> None:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix('.tmp')
+            index.save(tmp_path)
+            tmp_path.replace(self.path)
+        except OSError as e:
+            LOGGER.warning(f"Taxonomy index could not be saved to '{self.path}': {e}")
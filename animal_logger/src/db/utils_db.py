@@ -1,22 +1,50 @@
-import inspect
-import math
-from typing import Union
-from typing import Any, List, Union
-from itertools import compress
-
-import pandas as pd
-import dask.dataframe as dd
-import psycopg2
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
 import sqlalchemy
+from sqlalchemy.orm import sessionmaker
 
 from config.log_config import LOGGER
 from config.config import Config
+from animal_logger.src.lazy import lazy_import
+from animal_logger.src.db.batch_writer import ConcurrentBatchWriter, WriterMetrics
+from animal_logger.src.db.bulk_load import BulkLoader, LoadStats
+from animal_logger.src.db.connection import get_engine
+from animal_logger.src.db.dedup import KeepPolicy, KeyColumns, remove_duplicates
+from animal_logger.src.db.import_pipeline import ImportPipeline, ImportStats
+from animal_logger.src.db.metrics import current_operation, instrument, record_frame, watch_engine
+from animal_logger.src.db.model_registry import MODEL_REGISTRY
+from animal_logger.src.db.partitioned_reader import PartitionedReader
+from animal_logger.src.db.query import Filters, OrderBy, read_query
+from animal_logger.src.db.recent import RecentFeed
+from animal_logger.src.db.search import SearchBackend, create_search_index, open_search_backend
+from animal_logger.src.db.summary import SummaryService
+from animal_logger.src.db.table_cache import TableCache
+from animal_logger.src.db.taxonomy_service import TaxonomyService
+from animal_logger.src.db.write_behind import WriteBehindQueue
+
+pd = lazy_import('pandas')
+dd = lazy_import('dask.dataframe')
 
 
 class UtilsDB:
-    def __init__(self) -> None:
-        self.engine = Config.get_info()['db_engine']
-        self.dbsession = sqlalchemy.sessionmaker(bind=self.engine)
+
+    _TABLE_CACHE = None
+    _RECENT_FEED = None
+    _SUMMARY_SERVICE = None
+    _SEARCH_BACKEND = None
+    _TAXONOMY_SERVICE = None
+    _WRITE_BEHIND = None
+    _INSERT_LISTENERS: List[Callable[[sqlalchemy.Table, Any], None]] = []
+    _UPDATE_LISTENERS: List[Callable[[sqlalchemy.Table, Any], None]] = []
+
+    def __init__(self, engine: Optional[sqlalchemy.Engine] = None) -> None:
+        """Work on _engine_, by default the engine of the logged-in user."""
+        self.engine = engine if engine is not None else Config.get_engine()
+        watch_engine(self.engine)
+        self.session_factory = sessionmaker(bind=self.engine)
 
     def create_specific_model(
         self, class_name: str, model_name: str, schema_name: str, column_data: dict
@@ -36,172 +64,420 @@ class UtilsDB:
         Returns:
             object: Returns model class.
         """
-        # Define the attributes for the class
-        model_class = create_dynamic_model(
-            class_name, model_name, schema_name, column_data
-        )
-        table_name = model_class.__tablename__
-        schema_name = model_class.__table_args__["schema"]
-        insp = sqlalchemy.inspect(self.engine)
-        if not insp.has_table(table_name=table_name, schema=schema_name):
-            model_class.__table__.create(self.engine)
-            LOGGER.info(
-                f"Model '{model_name}' created successfully in schema '{schema_name}'."
-            )
+        model_class = MODEL_REGISTRY.create_dynamic_model(class_name, model_name, schema_name, column_data)
+        MODEL_REGISTRY.create_missing(self.engine, [model_class])
         return model_class
 
-    def create_new_models(self) -> None:
-        """Create all models found in database.models module, in case one of them is missing."""
-        model_list = self.__get_all_classes("database.models")
-        insp = sqlalchemy.inspect(self.engine)
-        for cls in model_list:
-            table_name = cls.__tablename__
-            schema_name = cls.__table_args__["schema"]
-            if not insp.has_table(table_name=table_name, schema=schema_name):
-                cls.__table__.create(self.engine)
-                LOGGER.info(
-                    f"Model '{table_name}' created successfully in schema '{schema_name}'."
-                )
+    def create_new_models(self, module_name: str = "database.models") -> None:
+        """Create all models found in the _module_name_ module, in case one of them is missing."""
+        MODEL_REGISTRY.create_missing(self.engine, self.__get_all_classes(module_name))
 
     @staticmethod
     def __get_all_classes(model_name: str) -> List[Any]:
         """Get a list with all models defined in the _model_name_ module."""
-        all_items = inspect.getmembers(models)
-        classes = [
-            item[1]
-            for item in all_items
-            if inspect.isclass(item[1]) and item[1].__module__ == model_name
-        ]
-        return classes
-
-    def get_model_class_with_name(self, table_name: str) -> object:
-        model_list = self.__get_all_classes("database.models")
-        for cls in model_list:
-            if cls.__tablename__ == table_name:
-                objective_cls = cls
-        return objective_cls
+        return MODEL_REGISTRY.register_module(model_name)
+
+    def get_model_class_with_name(self, table_name: str, module_name: str = "database.models") -> object:
+        self.__get_all_classes(module_name)
+        return MODEL_REGISTRY.get(table_name)
 
+    @instrument('insert_dict_in_db')
     def insert_dict_in_db(
-        self, data_dict: dict, model: object, batch_size: int = 10_000
-    ) -> None:
+        self, data_dict: dict, model: object, batch_size: int = 10_000, max_workers: int = 4,
+        on_conflict: Optional[str] = None, update_policies: Optional[Dict[str, str]] = None
+    ) -> WriterMetrics:
         """Insert the input dataframe in the corresponding model in DB.
 
+        Batches are streamed to a pool of writer threads, each one using its own pooled connection.
+        Rows clashing with existing primary keys are skipped individually, the rest of their batch is kept.
+        With _on_conflict_, batches are merged in set-based statements instead: existing rows are
+        updated ('update') or left as they are ('nothing'), see merge.BatchMerger.
+
         Args:
             data_dict (dict): Input dictionary of which its information will be stored in the DB.
             model (object): Model class with table characteristics.
-            batch_size (int, optional): Maximum rows to be inserted into the DB per iteration. Defaults to 100_000.
+            batch_size (int, optional): Maximum rows to be inserted into the DB per iteration. Defaults to 10_000.
+            max_workers (int, optional): Number of batches written concurrently. Defaults to 4.
+            on_conflict (Optional[str], optional): 'update' or 'nothing'. Defaults to None (skip clashing rows).
+            update_policies (Optional[Dict[str, str]], optional): Update policy per column when _on_conflict_ is
+                                                                 'update', e.g. {'age': 'greatest'}. Defaults
+                                                                 to None ('overwrite' for all columns).
+
+        Returns:
+            WriterMetrics: Rows written (inserted), updated and skipped, throughput and batch latencies.
         """
         # Remove duplicates
         data_dict = self.remove_duplicate_ids(data_dict)
-        list_of_dicts = [dict(zip(data_dict, t)) for t in zip(*data_dict.values())]
-        batched_list_of_dicts = self._divide_dict_in_batches(list_of_dicts, batch_size)
-        is_data_batched = len(batched_list_of_dicts) > 1
-        LOGGER.info(f"Starting data storage in DB for table '{model.__tablename__}'.")
-        for idx, dict_batch in enumerate(batched_list_of_dicts):
+        writer = ConcurrentBatchWriter(self.engine, max_workers=max_workers, on_conflict=on_conflict,
+                                       update_policies=update_policies, on_written=UtilsDB.notify_rows)
+        metrics = writer.write(data_dict, model, batch_size)
+        operation = current_operation()
+        operation.add_rows(metrics.rows_written)
+        operation.count('rows_skipped', metrics.rows_skipped)
+        operation.count('rows_updated', metrics.rows_updated)
+        if metrics.failed_batches:
+            operation.fail()
+        return metrics
+
+    @staticmethod
+    def add_insert_listener(listener: Callable[[sqlalchemy.Table, Any], None]) -> None:
+        """Call _listener(table, data)_ after rows are inserted, to keep in-memory views of the tables up to date.
+
+        _data_ holds the rows that made it to the table, in any format accepted by bulk_load.iter_row_batches.
+        Listeners run on the inserting threads, once per written batch, so they must be quick and thread-safe.
+        """
+        if listener not in UtilsDB._INSERT_LISTENERS:
+            UtilsDB._INSERT_LISTENERS.append(listener)
+
+    @staticmethod
+    def remove_insert_listener(listener: Callable[[sqlalchemy.Table, Any], None]) -> None:
+        if listener in UtilsDB._INSERT_LISTENERS:
+            UtilsDB._INSERT_LISTENERS.remove(listener)
+
+    @staticmethod
+    def add_update_listener(listener: Callable[[sqlalchemy.Table, Any], None]) -> None:
+        """Call _listener(table, data)_ after existing rows are updated by insert_dict_in_db in 'update' mode.
+
+        _data_ holds the incoming values of the updated rows, before the update policies are applied. See
+        add_insert_listener for the format and threading.
+        """
+        if listener not in UtilsDB._UPDATE_LISTENERS:
+            UtilsDB._UPDATE_LISTENERS.append(listener)
+
+    @staticmethod
+    def remove_update_listener(listener: Callable[[sqlalchemy.Table, Any], None]) -> None:
+        if listener in UtilsDB._UPDATE_LISTENERS:
+            UtilsDB._UPDATE_LISTENERS.remove(listener)
+
+    @staticmethod
+    def notify_rows(table: sqlalchemy.Table, columns: Sequence[str], inserted: Sequence[tuple],
+                    updated: Sequence[tuple] = ()) -> None:
+        """Notify the insert and update listeners of rows written to _table_, see ConcurrentBatchWriter."""
+        if inserted:
+            UtilsDB.notify_insert(table, {col: list(values) for col, values in zip(columns, zip(*inserted))})
+        if updated:
+            UtilsDB.notify_update(table, {col: list(values) for col, values in zip(columns, zip(*updated))})
+
+    @staticmethod
+    def notify_insert(table: sqlalchemy.Table, data: Any) -> None:
+        UtilsDB._notify(UtilsDB._INSERT_LISTENERS, 'Insert', table, data)
+
+    @staticmethod
+    def notify_update(table: sqlalchemy.Table, data: Any) -> None:
+        UtilsDB._notify(UtilsDB._UPDATE_LISTENERS, 'Update', table, data)
+
+    @staticmethod
+    def _notify(listeners: List[Callable[[sqlalchemy.Table, Any], None]], kind: str, table: sqlalchemy.Table,
+                data: Any) -> None:
+        for listener in list(listeners):
             try:
-                self.dbsession.bulk_insert_mappings(model, dict_batch)
-                # Commit the changes to the database for each model
-                self.dbsession.commit()
-                if is_data_batched:
-                    LOGGER.info(
-                    f"Batch number {idx + 1} of table '{model.__tablename__}' has been successfully stored in DB."
-                    )
-                else:
-                    LOGGER.info(
-                        f"Table '{model.__tablename__}' has been successfully stored in DB."
-                    )
-            except sqlalchemy.exc.IntegrityError as e:
-                LOGGER.warning(
-                    f"Duplicated primary key entries. Skipping. Error log: \n {e}"
-                )
+                listener(table, data)
             except Exception as e:
-                LOGGER.error(
-                    f"An error occurred when inserting data into database: {e}."
-                )
-        # Close connection
-        self.dbsession.close()
-
-    def remove_duplicate_ids(self, data_dict: dict) -> dict:
-        # First, check if all values in the dictionary are of the same length
-        len_keys = []
-        for k, v in data_dict.items():
-            len_key = len(v)
-            len_keys.append(len_key)
-
-        # Create an error log if size is not the same across elements in the list
-        is_same = True
-        for length in len_keys:
-            if len_keys[0] != length:
-                is_same = False
-                break
-        
-        if is_same:
-            LOGGER.info(f"All values in the keys of the dictionary are of the same size: {len_keys[0]}")
-            # Create mask so that the dict only contains unique ID's
-            mask_list = []
-            for idx, identifier in enumerate(data_dict['id']):
-                if identifier not in data_dict['id'][:idx]:
-                    mask_list.append(True)
-                else:
-                    mask_list.append(False)
-
-            # Add unique entries in dictionary
-            for k, v in data_dict.items():
-                data_dict[k] = list(compress(v, mask_list))
-        else:
-            LOGGER.error(f"Not all values in the keys of the dictionary are of the same size")
-        return data_dict
+                LOGGER.error(f"{kind} listener {listener} failed on table '{table.name}': {e}")
 
-    @staticmethod
-    def _divide_dict_in_batches(input_dict: dict, batch_size: int) -> List[List[dict]]:
-        """Divide dictionary in smaller pieces for speed improvement."""
-        n_chunks = math.ceil(len(input_dict) / batch_size)
-        batched_list_of_dicts = []
-        starting_row, ending_row = 0, batch_size
-        for n in range(n_chunks):
-            chunked_dict_list = input_dict[starting_row: ending_row]
-            batched_list_of_dicts.append(chunked_dict_list)
-            starting_row += batch_size
-            ending_row += batch_size
-        return batched_list_of_dicts
+    def bulk_load(self, source: Any, model: object, batch_size: int = 10_000,
+                  track_memory: bool = False) -> LoadStats:
+        """Stream _source_ into the table of _model_ in bounded-memory batches.
+
+        Args:
+            source (Any): Columnar dict, pandas or Dask dataframe, or an iterator of rows or dataframe chunks.
+            model (object): Model class with table characteristics.
+            batch_size (int, optional): Maximum rows to be inserted into the DB per iteration. Defaults to 10_000.
+            track_memory (bool, optional): Trace Python allocations to report their peak. Defaults to False.
+
+        Returns:
+            LoadStats: Rows inserted, throughput and peak memory of the load.
+        """
+        return BulkLoader(self.engine, track_memory=track_memory).load(source, model, batch_size)
+
+    def import_file(self, path: Union[str, Path], model: object, chunk_size: int = 50_000,
+                    state_path: Optional[Union[str, Path]] = None, restart: bool = False) -> ImportStats:
+        """Import a CSV, JSON lines or Parquet file into the table of _model_, without loading it in memory.
+
+        Rows are validated against the columns of the model, keys already imported are dropped, and an
+        interrupted import resumes where it stopped when called again, see import_pipeline.ImportPipeline.
+
+        Args:
+            path (Union[str, Path]): File to import, its format is taken from its suffix.
+            model (object): Model class with table characteristics.
+            chunk_size (int, optional): Rows read, validated and loaded at a time. Defaults to 50_000.
+            state_path (Optional[Union[str, Path]], optional): SQLite file of the seen keys and checkpoint.
+                                                               Defaults to None (next to the file).
+            restart (bool, optional): Ignore the checkpoint of a previous run. Defaults to False.
+
+        Returns:
+            ImportStats: Rows read, loaded, rejected and dropped as duplicates.
+        """
+        return ImportPipeline(self.engine, model, state_path, chunk_size).run(path, restart=restart)
+
+    @instrument('remove_duplicate_ids')
+    def remove_duplicate_ids(self, data_dict: dict, keys: KeyColumns = 'id', keep: KeepPolicy = 'first') -> dict:
+        """Drop rows of a columnar dictionary whose key has already been seen.
+
+        Args:
+            data_dict (dict): Input dictionary of the type {'col1': [...], 'col2': [...], ...}.
+            keys (KeyColumns, optional): Column, or list of columns, identifying a row. Defaults to 'id'.
+            keep (KeepPolicy, optional): Occurrence to keep, 'first' or 'last'. Defaults to 'first'.
+
+        Returns:
+            dict: Dictionary with unique keys only.
+        """
+        try:
+            data_dict, dropped = remove_duplicates(data_dict, keys=keys, keep=keep)
+        except (ValueError, KeyError) as e:  # KeyError: key columns missing from a dataframe
+            LOGGER.error(e)
+            current_operation().fail()
+            return data_dict
+        current_operation().count('duplicates_dropped', sum(dropped.values()))
+        if dropped:
+            LOGGER.info(
+                f"Dropped {sum(dropped.values())} duplicated rows over {len(dropped)} distinct keys."
+            )
+            LOGGER.debug(f"Duplicated rows dropped per key: {dict(dropped)}")
+        return data_dict
 
     @staticmethod
-    def get_table(schema: str, table_name: str, engine: str, as_df = False) -> dd.DataFrame:
+    @instrument('get_table')
+    def get_table(schema: str,
+                  table_name: str,
+                  engine: Union[str, sqlalchemy.Engine],
+                  as_df = False,
+                  columns: Optional[Sequence[str]] = None,
+                  filters: Optional[Filters] = None,
+                  order_by: Optional[OrderBy] = None,
+                  limit: Optional[int] = None,
+                  npartitions: Optional[int] = None,
+                  cached: bool = False) -> Tuple[Union[dd.DataFrame, pd.DataFrame], Optional[str]]:
         """Get dataframe out of a table in the database.
 
+        Projections, filters, ordering and limits are translated to SQL, so only the matching rows
+        and columns leave the database. Full scans are split into 'id' ranges planned from the table
+        bounds, and read concurrently when a pandas dataframe is requested. With _cached_, they are
+        served from the local table cache instead, see get_cached_table.
+
         Args:
             schema (str): Schema of the table.
             table_name (str): Table name.
+            engine (Union[str, sqlalchemy.Engine]): Database URL or engine.
+            as_df (bool, optional): Return a pandas dataframe instead of a Dask one. Defaults to False.
+            columns (Optional[Sequence[str]], optional): Columns to fetch, 'id' is always included. Defaults to None.
+            filters (Optional[Filters], optional): Row filters, see query.build_select. Defaults to None.
+            order_by (Optional[OrderBy], optional): Sorting columns, '-' prefix for descending. Defaults to None.
+            limit (Optional[int], optional): Maximum number of rows. Defaults to None.
+            npartitions (Optional[int], optional): Number of 'id' ranges to read. Defaults to None
+                                                   (one per 250k rows).
+            cached (bool, optional): Serve the rows from the table cache, refreshed first if the table
+                                     changed. Ignored with _order_by_ or _limit_. Defaults to False.
 
         Returns:
-            dd.DataFrame: Dask dataframe containing the info of the table.
+            Tuple[Union[dd.DataFrame, pd.DataFrame], Optional[str]]: Dataframe containing the info of the
+                                                                    table and an error message, if any.
         """
         # Do not forget to grant access to user
         # ALTER ROLE <user> WITH LOGIN;
         # GRANT SELECT ON ALL TABLES IN SCHEMA <schemaname> TO <user>;
         # GRANT USAGE ON SCHEMA <schemaname> TO  <user>;
-        sql_text = f" * FROM {schema}.{table_name}" # The SELECT is added in the next line
-        sql = sqlalchemy.sql.select(sqlalchemy.sql.text(sql_text))
+        if isinstance(engine, str):
+            engine = get_engine(engine)
+        watch_engine(engine)
         try:
-            ddf = dd.read_sql(sql = sql, con = engine, index_col = 'id')
-            if as_df:
-                ddf = ddf.compute()
+            if order_by is not None or limit is not None:
+                # Ordered and limited results do not survive a split by index ranges
+                ddf = read_query(engine, schema, table_name, columns, filters, order_by, limit)
+                if not as_df:
+                    ddf = dd.from_pandas(ddf, npartitions=1)
+            elif cached:
+                ddf = UtilsDB.get_table_cache().read(engine, schema, table_name, columns, filters)
+                if not as_df:
+                    ddf = dd.from_pandas(ddf, npartitions=npartitions or 1)
+            else:
+                reader = PartitionedReader(engine, schema, table_name, columns=columns, filters=filters,
+                                           npartitions=npartitions)
+                ddf = reader.to_pandas() if as_df else reader.to_dask()
             message = None
-        except UnicodeDecodeError:
-            ddf = None
-            message = 'Invalid credentials. Try again.'
-        except sqlalchemy.exc.OperationalError:
-            ddf = None
-            message = 'Please, log in with your credentials.'
-        except sqlalchemy.exc.ProgrammingError:
+        except (UnicodeDecodeError, sqlalchemy.exc.OperationalError, sqlalchemy.exc.ProgrammingError) as e:
             ddf = None
-            message = 'You have no rights to the database.'
+            message = UtilsDB.get_error_message(e)
+            current_operation().fail()
+        record_frame(ddf)
         return ddf, message
 
-    def filter_table(self, schema, table_name, engine, filtered_col: str, filtered_val: Union[str, List]) -> None:
-        ddf = self.get_table(schema, table_name, engine)
-        if isinstance(filtered_val, list):
-            ddf = ddf.loc[ddf[filtered_col].isin(filtered_val)]
-        else:
-            ddf = ddf.loc[ddf[filtered_col] == filtered_val]
-        return ddf
+    @staticmethod
+    def get_error_message(error: Exception) -> str:
+        """Translate a database access error into a message that can be shown to the user."""
+        if isinstance(error, UnicodeDecodeError):
+            return 'Invalid credentials. Try again.'
+        if isinstance(error, sqlalchemy.exc.OperationalError):
+            return 'Please, log in with your credentials.'
+        if isinstance(error, sqlalchemy.exc.ProgrammingError):
+            return 'You have no rights to the database.'
+        return 'Unexpected error when reaching the database.'
+
+    @staticmethod
+    @instrument('get_cached_table')
+    def get_cached_table(schema: str,
+                         table_name: str,
+                         engine: Union[str, sqlalchemy.Engine],
+                         columns: Optional[Sequence[str]] = None,
+                         filters: Optional[Filters] = None,
+                         watermark_col: Optional[str] = None) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
+        """Get a pandas dataframe out of a table, served from the local table cache when up to date.
+
+        Meant for reference tables read over and over, see table_cache.TableCache for the invalidation rules.
+
+        Args:
+            schema (str): Schema of the table.
+            table_name (str): Table name.
+            engine (Union[str, sqlalchemy.Engine]): Database URL or engine.
+            columns (Optional[Sequence[str]], optional): Columns to fetch. Defaults to None.
+            filters (Optional[Filters], optional): Row filters, see query.build_select. Defaults to None.
+            watermark_col (Optional[str], optional): Last-modification column, e.g. 'updated_at', used to
+                                                     fetch changed rows only. Defaults to None.
+
+        Returns:
+            Tuple[Optional[pd.DataFrame], Optional[str]]: Dataframe and an error message, if any.
+        """
+        if isinstance(engine, str):
+            engine = get_engine(engine)
+        watch_engine(engine)
+        try:
+            df = UtilsDB.get_table_cache().read(engine, schema, table_name, columns, filters, watermark_col)
+            message = None
+        except (UnicodeDecodeError, sqlalchemy.exc.OperationalError, sqlalchemy.exc.ProgrammingError) as e:
+            df = None
+            message = UtilsDB.get_error_message(e)
+            current_operation().fail()
+        record_frame(df)
+        return df, message
+
+    @staticmethod
+    def get_table_cache() -> TableCache:
+        """Process-wide table cache, configured by the 'table_cache' section of app_config.yaml."""
+        if UtilsDB._TABLE_CACHE is None:
+            settings = Config.get_info()['table_cache']
+            UtilsDB._TABLE_CACHE = TableCache(settings['path'], settings['max_size_mb'] * 2**20)
+        return UtilsDB._TABLE_CACHE
+
+    @staticmethod
+    def get_recent_feed() -> RecentFeed:
+        """Recent activity of the records table of the logged-in user, configured by the 'recent' section of
+        app_config.yaml. Loaded from the database once, then fed by the inserts."""
+        engine = Config.get_engine()
+        feed = UtilsDB._RECENT_FEED
+        if feed is None or feed.engine is not engine:
+            if feed is not None:
+                feed.stop()
+            records, settings = Config.get_info()['records'], Config.get_info()['recent']
+            feed = RecentFeed(engine, records['schema'], records['table_name'], records['columns'],
+                              settings['capacity'], settings['time_col'])
+            UtilsDB._RECENT_FEED = feed.start()
+        return feed
+
+    @staticmethod
+    def get_search_backend() -> SearchBackend:
+        """Search backend of the records table of the logged-in user, configured by the 'search' section of
+        app_config.yaml. Opened once per engine, the in-memory index of the previous one is closed."""
+        engine = Config.get_engine()
+        backend, backend_engine = UtilsDB._SEARCH_BACKEND or (None, None)
+        if backend is None or backend_engine is not engine:
+            if backend is not None:
+                backend.close()
+            records, settings = Config.get_info()['records'], Config.get_info()['search']
+            backend = open_search_backend(engine, records['schema'], records['table_name'],
+                                          create_index=settings['create_index'])
+            UtilsDB._SEARCH_BACKEND = (backend, engine)
+        return backend
+
+    def create_search_index(self) -> bool:
+        """Setup step: create the database search index of the records table, see search.create_search_index."""
+        records = Config.get_info()['records']
+        return create_search_index(self.engine, records['schema'], records['table_name'])
+
+    @staticmethod
+    def get_summary_service() -> SummaryService:
+        """Herd summary of the records table of the logged-in user, configured by the 'summary' section of
+        app_config.yaml. Loaded from the database summary once, then kept current in the background."""
+        engine = Config.get_engine()
+        service = UtilsDB._SUMMARY_SERVICE
+        if service is None or service.engine is not engine:
+            if service is not None:
+                service.stop()
+            records, settings = Config.get_info()['records'], Config.get_info()['summary']
+            service = SummaryService(engine, records['schema'], records['table_name'], settings['refresh_interval_s'],
+                                     settings['min_refresh_interval_s'], settings['age_bucket'])
+            UtilsDB._SUMMARY_SERVICE = service.start()
+        return service
+
+    @staticmethod
+    def get_taxonomy_service() -> TaxonomyService:
+        """Taxonomy index of the records table of the logged-in user, configured by the 'taxonomy' section of
+        app_config.yaml. Loaded from disk, or built, once, then fed by the inserts."""
+        engine = Config.get_engine()
+        service = UtilsDB._TAXONOMY_SERVICE
+        if service is None or service.engine is not engine:
+            if service is not None:
+                service.stop()
+            records, settings = Config.get_info()['records'], Config.get_info()['taxonomy']
+            service = TaxonomyService(engine, records['schema'], records['table_name'], settings['path'])
+            UtilsDB._TAXONOMY_SERVICE = service.start()
+        return service
+
+    @staticmethod
+    def get_write_behind() -> WriteBehindQueue:
+        """Write-behind queue of the records schema of the logged-in user, configured by the 'write_behind'
+        section of app_config.yaml. Records queued in an earlier session are flushed when it starts.
+
+        Raises:
+            RuntimeError: The flusher of the previous user is still writing a batch to the journal.
+        """
+        engine = Config.get_engine()
+        queue = UtilsDB._WRITE_BEHIND
+        if queue is None or queue.engine is not engine:
+            if queue is not None and not queue.stop():
+                raise RuntimeError('The records of the previous session are still being synced, try again shortly.')
+            records, settings = Config.get_info()['records'], Config.get_info()['write_behind']
+            queue = WriteBehindQueue(engine, records['schema'], settings['path'], settings['batch_size'],
+                                     settings['flush_interval_s'], settings['max_backoff_s'])
+            UtilsDB._WRITE_BEHIND = queue.start()
+        return queue
+
+    @staticmethod
+    def iter_table(schema: str,
+                   table_name: str,
+                   engine: Union[str, sqlalchemy.Engine],
+                   columns: Optional[Sequence[str]] = None,
+                   filters: Optional[Filters] = None,
+                   rows_per_partition: int = 250_000,
+                   max_workers: int = 4) -> Iterator[pd.DataFrame]:
+        """Yield a table as pandas partitions of about _rows_per_partition_ rows, in 'id' order.
+
+        Up to _max_workers_ partitions are read ahead concurrently, the rest stay in the database,
+        so tables bigger than memory can be processed.
+        """
+        if isinstance(engine, str):
+            engine = get_engine(engine)
+        watch_engine(engine)
+        reader = PartitionedReader(engine, schema, table_name, columns=columns, filters=filters,
+                                   rows_per_partition=rows_per_partition, max_workers=max_workers)
+        yield from reader.iter_partitions()
+
+    @instrument('filter_table')
+    def filter_table(self,
+                     schema: str,
+                     table_name: str,
+                     engine: Union[str, sqlalchemy.Engine],
+                     filtered_col: str,
+                     filtered_val: Union[str, List],
+                     as_df: bool = False,
+                     columns: Optional[Sequence[str]] = None,
+                     cached: bool = False) -> Tuple[Union[dd.DataFrame, pd.DataFrame], Optional[str]]:
+        """Get the rows of a table whose _filtered_col_ equals _filtered_val_, or is in it when a list is given.
+
+        The filter is applied by the database, or by the table cache with _cached_, see get_table.
+        """
+        ddf, message = self.get_table(schema, table_name, engine, as_df=as_df, columns=columns,
+                                      filters={filtered_col: filtered_val}, cached=cached)
+        if message is not None:
+            current_operation().fail()
+        record_frame(ddf)
+        return ddf, message
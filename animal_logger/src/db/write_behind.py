@@ -0,0 +1,424 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Union
+
+import sqlalchemy
+
+from config.log_config import LOGGER
+from animal_logger.src.db.import_pipeline import Chunk, RowValidator
+
+# Errors telling that the database cannot be reached right now: the batch is retried later as it is
+TRANSIENT_ERRORS = (sqlalchemy.exc.OperationalError, sqlalchemy.exc.InterfaceError,
+                    sqlalchemy.exc.DisconnectionError, sqlalchemy.exc.TimeoutError, ConnectionError, TimeoutError)
+# Errors caused by the records themselves: they are written one by one to set the faulty ones aside
+RECORD_ERRORS = (sqlalchemy.exc.IntegrityError, sqlalchemy.exc.DataError)
+
+LEDGER_TABLE = 'write_behind_ledger'
+
+
+class JournalEntry(NamedTuple):
+    seq: int
+    table_name: str
+    record: Dict[str, Any]
+    uid: str  # idempotency key, stored in the ledger table of the database with the record
+    sent: bool  # a transaction writing the record may have been committed
+
+
+class SyncState(NamedTuple):
+    state: str  # 'synced', 'pending', 'syncing' or 'offline'
+    pending: int  # records waiting in the journal
+    failed: int  # records rejected by validation or by the database, kept in the journal
+    last_sync: Optional[float]  # time of the last successful flush
+    last_error: Optional[str]
+    rejected_reason: Optional[str]  # error of the latest rejected record
+    retry_at: Optional[float]  # time of the next attempt while offline
+
+
+class WriteJournal:
+    """Records waiting to be written to the database, in a SQLite file.
+
+    Every append is committed in WAL mode with synchronous=FULL before returning, so a record
+    accepted by the journal survives a crash of the application or of the machine. Records are
+    removed once they are in the database, or marked with an error when they cannot be written.
+    Records are marked as sent before the transaction writing them is committed: those still in the
+    journal afterwards may already be in the database.
+
+    The file may hold the records of several users: a journal only sees those of its _owner_.
+    A file is opened by one journal at a time in the process, so that a single flusher drains it.
+    """
+
+    _OPEN_PATHS = set()
+    _OPEN_LOCK = threading.Lock()
+
+    def __init__(self, path: Union[str, Path], owner: str = '') -> None:
+        self.path = Path(path).expanduser().resolve()
+        self.owner = owner
+        with WriteJournal._OPEN_LOCK:
+            if self.path in WriteJournal._OPEN_PATHS:
+                raise RuntimeError(f"The write-behind journal '{self.path}' is still in use, try again shortly.")
+            WriteJournal._OPEN_PATHS.add(self.path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=FULL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS journal (seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+                               "table_name TEXT NOT NULL, record TEXT NOT NULL, queued_at REAL NOT NULL, "
+                               "attempts INTEGER NOT NULL DEFAULT 0, error TEXT, sent INTEGER NOT NULL DEFAULT 0, "
+                               "uid TEXT, owner TEXT)")
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(journal)")]
+            # Journal of an earlier version: its records get a key, their owner is unknown so they are left aside
+            if 'sent' not in columns:
+                self._conn.execute("ALTER TABLE journal ADD COLUMN sent INTEGER NOT NULL DEFAULT 0")
+            if 'uid' not in columns:
+                self._conn.execute("ALTER TABLE journal ADD COLUMN uid TEXT")
+                self._conn.execute("UPDATE journal SET uid = lower(hex(randomblob(16)))")
+            if 'owner' not in columns:
+                self._conn.execute("ALTER TABLE journal ADD COLUMN owner TEXT")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS journal_owner ON journal (owner, seq)")
+
+    def append(self, table_name: str, record: Dict[str, Any]) -> int:
+        with self._lock, self._conn:
+            cursor = self._conn.execute("INSERT INTO journal (table_name, record, queued_at, uid, owner) "
+                                        "VALUES (?, ?, ?, ?, ?)",
+                                        (table_name, json.dumps(record, default=str), time.time(),
+                                         uuid.uuid4().hex, self.owner))
+        return cursor.lastrowid
+
+    def pending(self, limit: int) -> List[JournalEntry]:
+        """Oldest _limit_ records without error."""
+        with self._lock:
+            rows = self._conn.execute("SELECT seq, table_name, record, uid, sent FROM journal "
+                                      "WHERE owner = ? AND error IS NULL ORDER BY seq LIMIT ?",
+                                      (self.owner, limit)).fetchall()
+        return [JournalEntry(seq, table_name, json.loads(record), uid, bool(sent))
+                for seq, table_name, record, uid, sent in rows]
+
+    def remove(self, seqs: List[int]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM journal WHERE seq = ?", ((seq,) for seq in seqs))
+
+    def count_attempt(self, seqs: List[int]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany("UPDATE journal SET attempts = attempts + 1 WHERE seq = ?", ((seq,) for seq in seqs))
+
+    def mark_sent(self, seqs: List[int]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany("UPDATE journal SET sent = 1 WHERE seq = ?", ((seq,) for seq in seqs))
+
+    def mark_failed(self, failures: List[Tuple[int, str]]) -> None:
+        """Keep the records of _failures_, (sequence number, reason), out of the next flushes."""
+        with self._lock, self._conn:
+            self._conn.executemany("UPDATE journal SET error = ? WHERE seq = ?",
+                                   ((reason, seq) for seq, reason in failures))
+
+    def retry_failed(self) -> int:
+        """Queue the failed records again, e.g. after fixing the table. Returns how many there were."""
+        with self._lock, self._conn:
+            return self._conn.execute("UPDATE journal SET error = NULL WHERE owner = ? AND error IS NOT NULL",
+                                      (self.owner,)).rowcount
+
+    def counts(self) -> Tuple[int, int]:
+        """Pending and failed records."""
+        with self._lock:
+            pending, failed = self._conn.execute("SELECT count(*) - count(error), count(error) FROM journal "
+                                                 "WHERE owner = ?", (self.owner,)).fetchone()
+        return pending, failed
+
+    def last_failure(self) -> Optional[str]:
+        """Error of the latest record kept out of the flushes, if any."""
+        with self._lock:
+            row = self._conn.execute("SELECT error FROM journal WHERE owner = ? AND error IS NOT NULL "
+                                     "ORDER BY seq DESC LIMIT 1", (self.owner,)).fetchone()
+        return row[0] if row else None
+
+    def close(self) -> None:
+        with WriteJournal._OPEN_LOCK:
+            if self.path not in WriteJournal._OPEN_PATHS:
+                return  # Already closed
+            self._conn.close()
+            WriteJournal._OPEN_PATHS.discard(self.path)
+
+
+class WriteBehindQueue:
+    """Accept records immediately and write them to the database in the background.
+
+    put only appends the record to a local WriteJournal. A flusher thread wakes up every
+    _flush_interval_ seconds and drains the journal in batches of up to _batch_size_ records:
+    records of a table sharing a primary key are coalesced into the latest one, then each table
+    gets one multi-row statement in one transaction. Records leave the journal only after that
+    transaction is committed.
+
+    While the database is unreachable, records accumulate in the journal and the flusher retries
+    with an exponential backoff capped at _max_backoff_ seconds. Records left in the journal by a
+    crash are flushed on the next start. Records that fail validation or violate a constraint, e.g.
+    an id already in the table, are kept in the journal with their error.
+
+    Every record carries a unique key, inserted in the LEDGER_TABLE of the schema by the same
+    transaction as the record. A crash, or a lost connection, between the commit and the removal
+    from the journal leaves the record marked as sent: it is replayed only if its key is not in
+    the ledger, so no record is written twice, with or without a primary key.
+
+    The journal is shared by the users of the computer, each queue only flushes the records
+    queued with the URL of its _engine_.
+    """
+
+    def __init__(self,
+                 engine: sqlalchemy.Engine,
+                 schema: str,
+                 journal_path: Union[str, Path],
+                 batch_size: int = 500,
+                 flush_interval: float = 2,
+                 max_backoff: float = 300) -> None:
+        self.engine = engine
+        self.schema = schema
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_backoff = max_backoff
+        self.journal = WriteJournal(journal_path, owner=engine.url.render_as_string(hide_password=True))
+        self._tables: Dict[str, sqlalchemy.Table] = {}
+        self._ledger: Optional[sqlalchemy.Table] = None
+        self._syncing = False
+        self._failures = 0  # consecutive failed flushes
+        self._last_sync: Optional[float] = None
+        self._last_error: Optional[str] = None
+        self._retry_at: Optional[float] = None
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> 'WriteBehindQueue':
+        self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = 5) -> bool:
+        """Stop the flusher. Records not flushed yet stay in the journal for the next start.
+
+        Returns:
+            bool: Whether the flusher is stopped. One still writing a batch after _timeout_ closes
+                  the journal when done, until then the journal cannot be opened again.
+        """
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is None:
+            self.journal.close()
+            return True
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def put(self, table_name: str, record: Dict[str, Any]) -> int:
+        """Queue _record_, a {column: value} dict, for table _table_name_ of the schema.
+
+        Returns:
+            int: Sequence number of the record in the journal.
+        """
+        return self.journal.append(table_name, record)
+
+    def flush_now(self) -> None:
+        """Wake the flusher up, also while it waits to retry."""
+        self._retry_at = None
+        self._wake.set()
+
+    def retry_failed(self) -> None:
+        if self.journal.retry_failed():
+            self.flush_now()
+
+    def state(self) -> SyncState:
+        pending, failed = self.journal.counts()
+        if self._retry_at is not None:
+            state = 'offline'
+        elif self._syncing:
+            state = 'syncing'
+        else:
+            state = 'pending' if pending else 'synced'
+        rejected_reason = self.journal.last_failure() if failed else None
+        return SyncState(state, pending, failed, self._last_sync, self._last_error, rejected_reason, self._retry_at)
+
+    def flush(self) -> int:
+        """Write the journal to the database, batch by batch, until it is empty.
+
+        Returns:
+            int: Records taken out of the journal, written or coalesced.
+
+        Raises:
+            TRANSIENT_ERRORS: The database could not be reached, the current batch stays in the journal.
+        """
+        done = 0
+        while True:
+            entries = self.journal.pending(self.batch_size)
+            if not entries:
+                return done
+            self._syncing = True
+            try:
+                self._flush_batch(entries)
+            finally:
+                self._syncing = False
+            done += len(entries)
+
+    def _flush_batch(self, entries: List[JournalEntry]) -> None:
+        # Records of a table are written together when they fill the same columns
+        by_table: Dict[tuple, List[JournalEntry]] = {}
+        for entry in entries:
+            by_table.setdefault((entry.table_name, *sorted(entry.record)), []).append(entry)
+        for (table_name, *_), table_entries in by_table.items():
+            try:
+                table = self._table(table_name)
+            except sqlalchemy.exc.NoSuchTableError:
+                self.journal.mark_failed([(entry.seq, f"No table '{table_name}'") for entry in table_entries])
+                continue
+            self._write(table, table_entries)
+
+    def _table(self, table_name: str) -> sqlalchemy.Table:
+        if table_name not in self._tables:
+            self._tables[table_name] = sqlalchemy.Table(table_name, sqlalchemy.MetaData(), schema=self.schema,
+                                                        autoload_with=self.engine)
+        return self._tables[table_name]
+
+    def _ledger_table(self) -> sqlalchemy.Table:
+        if self._ledger is None:
+            ledger = sqlalchemy.Table(LEDGER_TABLE, sqlalchemy.MetaData(),
+                                      sqlalchemy.Column('uid', sqlalchemy.String(32), primary_key=True),
+                                      schema=self.schema)
+            ledger.create(self.engine, checkfirst=True)
+            self._ledger = ledger
+        return self._ledger
+
+    def _write(self, table: sqlalchemy.Table, entries: List[JournalEntry]) -> None:
+        from animal_logger.src.db.utils_db import UtilsDB
+        ledger = self._ledger_table()
+        if any(entry.sent for entry in entries):
+            entries = self._skip_written(ledger, entries)
+            if not entries:
+                return
+        self.journal.count_attempt([entry.seq for entry in entries])
+        columns = list(entries[0].record)
+        validator = RowValidator(table)
+        try:
+            validator.check_columns(columns)
+        except ValueError as e:
+            self.journal.mark_failed([(entry.seq, str(e)) for entry in entries])
+            return
+        chunk = Chunk(columns, [tuple(entry.record.get(col) for col in columns) for entry in entries], 0)
+        columns, rows, rejected = validator.validate(chunk)
+        self.journal.mark_failed([(entries[idx].seq, reason) for idx, reason in rejected])
+        rejected_idx = {idx for idx, _ in rejected}
+        kept = [entry for idx, entry in enumerate(entries) if idx not in rejected_idx]
+        groups = self._coalesce(table, columns, list(zip(kept, rows)))
+        if not groups:
+            return
+        try:
+            self._insert(table, ledger, columns, groups)
+        except RECORD_ERRORS:
+            groups = self._insert_one_by_one(table, ledger, columns, groups)
+        written = [entry for group_entries, _ in groups for entry in group_entries]
+        self.journal.remove([entry.seq for entry in written])
+        self._forget(ledger, [entry.uid for entry in written])
+        UtilsDB.notify_rows(table, columns, [row for _, row in groups])
+
+    def _skip_written(self, ledger: sqlalchemy.Table, entries: List[JournalEntry]) -> List[JournalEntry]:
+        """Take the sent _entries_ whose key is in the ledger out of the journal. Returns the other entries."""
+        uids = [entry.uid for entry in entries if entry.sent]
+        with self.engine.connect() as conn:
+            written = set(conn.execute(sqlalchemy.select(ledger.c.uid).where(ledger.c.uid.in_(uids))).scalars())
+        if written:
+            LOGGER.info(f"{len(written)} queued records were already written by an interrupted flush.")
+            self.journal.remove([entry.seq for entry in entries if entry.uid in written])
+            self._forget(ledger, list(written))
+        return [entry for entry in entries if entry.uid not in written]
+
+    def _forget(self, ledger: sqlalchemy.Table, uids: List[str]) -> None:
+        """Drop the keys of records out of the journal from the ledger. Left-overs only take space."""
+        if not uids:
+            return
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(ledger.delete().where(ledger.c.uid.in_(uids)))
+        except TRANSIENT_ERRORS as e:
+            LOGGER.debug(f"Keys of written records left in '{LEDGER_TABLE}': {e}")
+
+    @staticmethod
+    def _coalesce(table: sqlalchemy.Table, columns: List[str],
+                  rows: List[Tuple[JournalEntry, tuple]]) -> List[Tuple[List[JournalEntry], tuple]]:
+        """Group the (entry, row) pairs of _rows_ by primary key, keeping the latest row of each key."""
+        key_columns = [col.name for col in table.primary_key.columns]
+        if not key_columns or not all(col in columns for col in key_columns):
+            return [([entry], row) for entry, row in rows]
+        positions = [columns.index(col) for col in key_columns]
+        groups: Dict[tuple, Tuple[List[JournalEntry], tuple]] = {}
+        for entry, row in rows:
+            key = tuple(row[pos] for pos in positions)
+            group_entries = groups[key][0] if key in groups else []
+            groups[key] = (group_entries + [entry], row)
+        return list(groups.values())
+
+    def _insert(self, table: sqlalchemy.Table, ledger: sqlalchemy.Table, columns: List[str],
+                groups: List[Tuple[List[JournalEntry], tuple]]) -> None:
+        """Write the rows of _groups_ and the keys of their records in one transaction."""
+        entries = [entry for group_entries, _ in groups for entry in group_entries]
+        with self.engine.begin() as conn:
+            conn.execute(table.insert(), [dict(zip(columns, row)) for _, row in groups])
+            conn.execute(ledger.insert(), [{'uid': entry.uid} for entry in entries])
+            # The commit may succeed without us knowing it: from here the ledger tells
+            self.journal.mark_sent([entry.seq for entry in entries])
+
+    def _insert_one_by_one(self, table: sqlalchemy.Table, ledger: sqlalchemy.Table, columns: List[str],
+                           groups: List[Tuple[List[JournalEntry], tuple]]) -> List[Tuple[List[JournalEntry], tuple]]:
+        """Write the rows of _groups_ separately, marking those the database rejects. Returns the groups written."""
+        done, failed = [], []
+        for group in groups:
+            try:
+                self._insert(table, ledger, columns, [group])
+                done.append(group)
+            except RECORD_ERRORS as e:
+                failed.extend((entry.seq, str(e.orig)) for entry in group[0])
+        self.journal.mark_failed(failed)
+        LOGGER.warning(f"{len(failed)} queued records were rejected by table '{table.name}'.")
+        return done
+
+    def _run(self) -> None:
+        try:
+            self._flush_loop()
+        finally:
+            # Closed here rather than in stop, which may give up waiting for a batch being written
+            self.journal.close()
+
+    def _flush_loop(self) -> None:
+        delay = 0.0  # flush what a previous session left right away
+        while not self._stopped.is_set():
+            self._wake.wait(timeout=delay)
+            self._wake.clear()
+            if self._stopped.is_set():
+                return
+            try:
+                written = self.flush()
+            except TRANSIENT_ERRORS as e:
+                self._failures += 1
+                self._last_error = str(getattr(e, 'orig', None) or e)
+                delay = min(self.max_backoff, self.flush_interval * 2 ** self._failures)
+                self._retry_at = time.time() + delay
+                LOGGER.warning(f"The database is not reachable, retrying the queued records in {delay:.0f} s: "
+                               f"{self._last_error}")
+                continue
+            except Exception as e:
+                # E.g. no rights on the table: nothing the records can fix, retry at the longest pace
+                self._failures += 1
+                self._last_error = str(getattr(e, 'orig', None) or e)
+                delay = self.max_backoff
+                self._retry_at = time.time() + delay
+                LOGGER.error(f"Writing the queued records failed: {self._last_error}")
+                continue
+            if written:
+                self._last_sync = time.time()
+                LOGGER.debug(f"{written} queued records flushed.")
+            self._failures = 0
+            self._last_error = None
+            self._retry_at = None
+            delay = self.flush_interval
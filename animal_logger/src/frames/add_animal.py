@@ -1,4 +1,7 @@
+import time
 from pathlib import Path
+from typing import Dict, Optional
+
 import customtkinter as ctk
 
 from config.config import Config
@@ -7,17 +10,56 @@ from animal_logger.src.frames.baseframe import BaseFrame
 
 
 class AddAnimal(BaseFrame):
+    """Record entry, one form per class of animal.
+
+    Saving a form only appends the record to the local write-behind journal, in the background,
+    and clears the form for the next animal once the journal has it. The records reach the database in batches, see
+    write_behind.WriteBehindQueue, and the sync label below the form tells how far behind it is.
+    """
 
-    def __init__(self, window, main_frame: ctk.CTkFrame) -> None:
+    def __init__(self, window, main_frame: ctk.CTkFrame, sync_poll_ms: int = 1000) -> None:
         super().__init__(window)
         self.main_frame = main_frame
         self.image_pool = Path(add_animal.__file__).parent
+        self.sync_poll_ms = sync_poll_ms
+        self.queue = None
+        self.records: Optional[dict] = None
+        self.entries: Dict[str, ctk.CTkEntry] = {}
+        self.animal_class = None
+        self.save_button = None
+        self.status_label = None
+        self.sync_label = None
 
     def initialize_ui(self) -> None:
         self.choose_class_of_animal()
 
     def choose_class_of_animal(self):
-        animal_classes = Config.get_info()['animal_classes']
+        # Config.get_info may reload the config files and rebuild the DB engine, keep it off the Tk thread
+        self.worker.submit(self.load_settings, on_success = self.on_settings, on_error = self.on_settings_error)
+
+    @staticmethod
+    def load_settings():
+        # Runs in the background worker: opening the queue flushes what an earlier session left
+        from animal_logger.src.db.utils_db import UtilsDB
+        return Config.get_info()['animal_classes'], Config.get_info()['records'], UtilsDB.get_write_behind()
+
+    def on_settings(self, settings) -> None:
+        animal_classes, self.records, self.queue = settings
+        self.add_animal_class_buttons(animal_classes)
+
+    def on_settings_error(self, error: Exception) -> None:
+        from animal_logger.src.db.utils_db import UtilsDB
+        if not self.main_frame.winfo_exists():
+            return
+        if isinstance(error, RuntimeError):
+            message = str(error)
+        else:
+            message = UtilsDB.get_error_message(error)
+        ctk.CTkLabel(self.main_frame, text = message, anchor = 'w', text_color = '#C0392B').pack(fill = 'x', padx = 20,
+                                                                                              pady = 10)
+        ctk.CTkButton(self.main_frame, text = "Retry", width = 80, command = self.back_to_classes).pack(padx = 20)
+
+    def add_animal_class_buttons(self, animal_classes: list) -> None:
         animal_class_colors = ['#EFBC9B', '#FFE4CF', '#FFEDD8', '#F1F5A8', '#78A083', '#B7C9F2']
         for animal_class, color in zip(animal_classes, animal_class_colors):
             button = ctk.CTkButton(self.main_frame,
@@ -32,19 +74,103 @@ class AddAnimal(BaseFrame):
             setattr(self, animal_class, button)
 
     def set_mammal_button(self):
-        pass
+        self.open_form('mammal')
 
     def set_invertebrate_button(self):
-        pass
+        self.open_form('invertebrate')
 
     def set_fish_button(self):
-        pass
+        self.open_form('fish')
 
     def set_amphibian_button(self):
-        pass
+        self.open_form('amphibian')
 
     def set_reptile_button(self):
-        pass
+        self.open_form('reptile')
 
     def set_bird_button(self):
-        pass
+        self.open_form('bird')
+
+    def open_form(self, animal_class: str) -> None:
+        self.animal_class = animal_class
+        for widget in self.main_frame.winfo_children():
+            widget.destroy()
+        self.entries = {}
+        bar = ctk.CTkFrame(self.main_frame, fg_color = 'transparent')
+        bar.pack(fill = 'x', padx = 20, pady = (10, 0))
+        ctk.CTkLabel(bar, text = f"New {animal_class}", font = ("Montserrat", 18, "bold")).pack(side = 'left')
+        ctk.CTkButton(bar, text = "Back", width = 80, command = self.back_to_classes).pack(side = 'right')
+        form = ctk.CTkFrame(self.main_frame, fg_color = 'white')
+        form.pack(fill = 'x', padx = 20, pady = 10)
+        form.columnconfigure(1, weight = 1)
+        fields = [col for col in self.records['columns'] if col != 'class_']
+        for row_idx, col in enumerate(fields):
+            ctk.CTkLabel(form, text = col, anchor = 'w', width = 100).grid(row = row_idx, column = 0, padx = 10, pady = 4)
+            entry = ctk.CTkEntry(form)
+            entry.grid(row = row_idx, column = 1, sticky = 'ew', padx = 10, pady = 4)
+            entry.bind('<Return>', lambda event: self.save())
+            self.entries[col] = entry
+        self.save_button = ctk.CTkButton(self.main_frame, text = "Save", command = self.save)
+        self.save_button.pack(padx = 20, pady = 10)
+        self.status_label = ctk.CTkLabel(self.main_frame, text = '', anchor = 'w')
+        self.status_label.pack(fill = 'x', padx = 20)
+        self.sync_label = ctk.CTkLabel(self.main_frame, text = '', anchor = 'w', text_color = '#4d4d4d')
+        self.sync_label.pack(fill = 'x', padx = 20, pady = (0, 10))
+        if fields:
+            self.entries[fields[0]].focus()
+        self.show_sync_state(self.sync_label)
+
+    def back_to_classes(self) -> None:
+        for widget in self.main_frame.winfo_children():
+            widget.destroy()
+        self.choose_class_of_animal()
+
+    def save(self) -> None:
+        # Empty fields are left to the defaults of the table, e.g. an autoincrement id
+        record = {col: entry.get().strip() for col, entry in self.entries.items() if entry.get().strip()}
+        if not record:
+            return
+        if self.save_button.cget('state') == 'disabled':
+            return  # The previous record is still being saved
+        record['class_'] = self.animal_class
+        self.save_button.configure(state = 'disabled')
+        # Only a local commit, but it waits for the disk: keep it off the Tk thread
+        self.worker.submit(self.queue.put, self.records['table_name'], record,
+                           on_success = self.on_saved, on_error = self.on_save_error)
+
+    def on_saved(self, seq: int) -> None:
+        if not self.save_button.winfo_exists():
+            return  # The form was closed
+        # The typed values are only dropped once the journal has them
+        for entry in self.entries.values():
+            entry.delete(0, 'end')
+        next(iter(self.entries.values())).focus()
+        self.save_button.configure(state = 'normal')
+        self.status_label.configure(text = f"Record {seq} saved.", text_color = '#78A083')
+
+    def on_save_error(self, error: Exception) -> None:
+        if not self.save_button.winfo_exists():
+            return
+        self.save_button.configure(state = 'normal')
+        self.status_label.configure(text = f"The record could not be saved: {error}", text_color = '#C0392B')
+
+    def show_sync_state(self, label: ctk.CTkLabel) -> None:
+        # Each form polls for its own label: the chain ends with the form
+        if not label.winfo_exists():
+            return
+        self.worker.submit(self.queue.state, on_success = lambda state: self.on_sync_state(label, state))
+
+    def on_sync_state(self, label: ctk.CTkLabel, state) -> None:
+        if not label.winfo_exists():
+            return
+        if state.state == 'offline':
+            text = (f"Offline, {state.pending} records kept on this computer. "
+                    f"Retrying in {max(0, state.retry_at - time.time()):.0f} s.")
+        elif state.pending:
+            text = f"{state.pending} records waiting to be synced."
+        else:
+            text = 'All records synced.'
+        if state.failed:
+            text += f" {state.failed} records were rejected: {state.rejected_reason or 'see the log'}."
+        label.configure(text = text)
+        self.window.after(self.sync_poll_ms, self.show_sync_state, label)
@@ -0,0 +1,218 @@
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from config.log_config import LOGGER
+
+
+class JobCancelled(Exception):
+    """Raised inside a job by Job.check_cancelled once the job has been cancelled."""
+
+
+class Job:
+    """Handle on a function running in a BackgroundWorker.
+
+    Jobs started with pass_job=True receive it as their 'job' keyword argument, to report
+    progress and to stop early when cancelled.
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self,
+                 worker: 'BackgroundWorker',
+                 on_success: Optional[Callable[[Any], None]],
+                 on_error: Optional[Callable[[Exception], None]],
+                 on_progress: Optional[Callable[[Any], None]],
+                 timeout: Optional[float]) -> None:
+        self.id = next(Job._ids)
+        self.on_success = on_success
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.future = None
+        self._worker = worker
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self) -> None:
+        """Drop the job: it does not start if still queued and none of its callbacks will run."""
+        self._cancelled.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    def check_cancelled(self) -> None:
+        if self.cancelled:
+            raise JobCancelled(f"Job {self.id} was cancelled.")
+
+    def report_progress(self, value: Any) -> None:
+        """Deliver _value_ to on_progress on the Tk thread. Safe to call from the job's thread."""
+        if self.on_progress is not None and not self.cancelled:
+            self._worker._results.put((self, 'progress', value))
+
+
+class BackgroundWorker:
+    """Run blocking work (DB queries, heavy computations) away from the Tk main loop.
+
+    Jobs run on a thread pool. Their results, errors and progress reports are queued and
+    delivered on the Tk thread by a short after() poll, which only runs while jobs are pending.
+    Use BackgroundWorker.for_window so that all frames of a window share one worker.
+    """
+
+    _WORKERS: Dict[int, 'BackgroundWorker'] = {}
+
+    def __init__(self, window, max_workers: int = 4, poll_interval_ms: int = 20) -> None:
+        self.window = window
+        self.poll_interval_ms = poll_interval_ms
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='tk-worker')
+        self._results = queue.SimpleQueue()
+        self._active: List[Job] = []
+        self._poll_id = None
+        window.bind('<Destroy>', self._on_destroy, add='+')
+
+    @classmethod
+    def for_window(cls, window) -> 'BackgroundWorker':
+        worker = cls._WORKERS.get(id(window))
+        if worker is None or worker.window is not window:
+            worker = cls._WORKERS[id(window)] = cls(window)
+        return worker
+
+    def submit(self,
+               fn: Callable,
+               *args,
+               on_success: Optional[Callable[[Any], None]] = None,
+               on_error: Optional[Callable[[Exception], None]] = None,
+               on_progress: Optional[Callable[[Any], None]] = None,
+               timeout: Optional[float] = None,
+               pass_job: bool = False,
+               **kwargs) -> Job:
+        """Run fn(*args, **kwargs) in the background. Must be called from the Tk thread.
+
+        Args:
+            fn (Callable): Function to run.
+            on_success (Optional[Callable[[Any], None]], optional): Called on the Tk thread with the result.
+            on_error (Optional[Callable[[Exception], None]], optional): Called on the Tk thread with the error,
+                                                                       TimeoutError if _timeout_ expires.
+            on_progress (Optional[Callable[[Any], None]], optional): Called on the Tk thread with every
+                                                                    value passed to Job.report_progress.
+            timeout (Optional[float], optional): Seconds after which the job is cancelled. Defaults to None.
+            pass_job (bool, optional): Pass the Job to _fn_ as its 'job' keyword argument. Defaults to False.
+
+        Returns:
+            Job: Handle to cancel the job.
+        """
+        job = Job(self, on_success, on_error, on_progress, timeout)
+        if pass_job:
+            kwargs['job'] = job
+        job.future = self._executor.submit(self._run, job, fn, args, kwargs)
+        self._active.append(job)
+        self._schedule_poll()
+        return job
+
+    def shutdown(self) -> None:
+        for job in self._active:
+            job.cancel()
+        self._active.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        BackgroundWorker._WORKERS.pop(id(self.window), None)
+
+    def _run(self, job: Job, fn: Callable, args: tuple, kwargs: dict) -> None:
+        if job.cancelled:
+            return
+        try:
+            self._results.put((job, 'success', fn(*args, **kwargs)))
+        except JobCancelled:
+            pass
+        except Exception as e:
+            self._results.put((job, 'error', e))
+
+    def _schedule_poll(self) -> None:
+        if self._poll_id is None:
+            self._poll_id = self.window.after(self.poll_interval_ms, self._poll)
+
+    def _poll(self) -> None:
+        self._poll_id = None
+        while True:
+            try:
+                job, kind, value = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if job.cancelled:
+                continue
+            if kind == 'progress':
+                self._call(job.on_progress, value)
+                continue
+            self._active.remove(job)
+            self._call(job.on_success if kind == 'success' else job.on_error, value)
+        now = time.monotonic()
+        for job in [job for job in self._active if job.deadline and job.deadline < now]:
+            job.cancel()
+            self._active.remove(job)
+            self._call(job.on_error, TimeoutError(f"Job {job.id} timed out."))
+        self._active = [job for job in self._active if not job.cancelled]
+        if self._active:
+            self._schedule_poll()
+
+    @staticmethod
+    def _call(callback: Optional[Callable], value: Any) -> None:
+        if callback is None:
+            if isinstance(value, Exception):
+                LOGGER.error(f"Background job failed: {value}")
+            return
+        try:
+            callback(value)
+        except Exception as e:
+            LOGGER.error(f"Background job callback failed: {e}")
+
+    def _on_destroy(self, event) -> None:
+        if event.widget is self.window:
+            self.shutdown()
+
+
+class StallMonitor:
+    """Measure how long the Tk event loop is blocked.
+
+    A callback is scheduled every _interval_ms_. The delay between when it was due and when it
+    actually ran is time during which the window could not redraw nor react to input.
+    """
+
+    def __init__(self, window, interval_ms: int = 10) -> None:
+        self.window = window
+        self.interval_ms = interval_ms
+        self.stalls: List[float] = []
+        self._expected = None
+        self._after_id = None
+
+    def start(self) -> None:
+        self.stalls.clear()
+        self._expected = time.perf_counter() + self.interval_ms / 1000
+        self._after_id = self.window.after(self.interval_ms, self._tick)
+
+    def stop(self) -> dict:
+        if self._after_id is not None:
+            self.window.after_cancel(self._after_id)
+            self._after_id = None
+        return self.stats()
+
+    def stats(self, threshold_ms: float = 50) -> dict:
+        """Stall figures in milliseconds. Stalls over _threshold_ms_ are noticeable by users."""
+        stalls = sorted(self.stalls)
+        if not stalls:
+            return {'ticks': 0, 'max_ms': 0.0, 'p95_ms': 0.0, 'over_threshold': 0}
+        return {
+            'ticks': len(stalls),
+            'max_ms': stalls[-1],
+            'p95_ms': stalls[int(0.95 * (len(stalls) - 1))],
+            'over_threshold': sum(stall > threshold_ms for stall in stalls),
+        }
+
+    def _tick(self) -> None:
+        now = time.perf_counter()
+        self.stalls.append(max(0.0, (now - self._expected) * 1000))
+        self._expected = now + self.interval_ms / 1000
+        self._after_id = self.window.after(self.interval_ms, self._tick)
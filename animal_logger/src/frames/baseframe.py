@@ -3,12 +3,17 @@ from typing import Union, Tuple
 from abc import ABC, abstractmethod
 
 import customtkinter as ctk
-from PIL import Image, ImageTk
+
+from animal_logger.src.frames.background import BackgroundWorker
+from animal_logger.src.frames.image_cache import IMAGE_CACHE
 
 class BaseFrame(ABC):
 
     def __init__(self, window) -> None:
         self.window = window
+        # Shared by all frames of the window, DB calls must go through it to keep the UI responsive
+        self.worker = BackgroundWorker.for_window(window)
+        IMAGE_CACHE.scale = ctk.ScalingTracker.get_window_scaling(window)
         self.window.geometry('1000x660') # Set default window size
         self.window.title("Myapp") # Name window tab
         ctk.set_appearance_mode("light")
@@ -20,10 +25,5 @@ class BaseFrame(ABC):
 
     @staticmethod
     def get_image(image_folder: Union[str, Path], img_name: str, new_shape: Tuple = None) -> ctk.CTkImage:
-        if isinstance(image_folder, str):
-            image_folder = Path(image_folder)
-        open_image = Image.open(image_folder / Path(img_name + ".png"))
-        if new_shape:
-            open_image = open_image.resize(new_shape)
-        ctk_image = ctk.CTkImage(open_image)
-        return ctk_image
+        """Icon _img_name_.png of _image_folder_, decoded and resized only the first time it is requested."""
+        return IMAGE_CACHE.get(image_folder, img_name, new_shape)
@@ -2,9 +2,14 @@ from pathlib import Path
 
 import customtkinter as ctk
 
+from config.config import Config
 from animal_logger.opt.img import menu
 from animal_logger.src.frames.baseframe import BaseFrame
 from animal_logger.src.frames.add_animal import AddAnimal
+from animal_logger.src.frames.home_view import HomeView
+from animal_logger.src.frames.recent_view import RecentView
+from animal_logger.src.frames.record_browser import RecordBrowser
+from animal_logger.src.frames.search_bar import SearchBar
 
 
 class Dashboard(BaseFrame):
@@ -65,8 +70,22 @@ class Dashboard(BaseFrame):
         logo.pack(side = 'left', padx = 10)
 
     def add_searchbar(self):
-        self.search_bar = ctk.CTkEntry(self.header)
+        self.search_bar = ctk.CTkEntry(self.header, placeholder_text = "Search animals by name, species or taxonomy")
         self.search_bar.pack(side = 'left', fill = 'x', expand = True, padx = 100)
+        SearchBar(self.window, self.search_bar, self.open_search_backend, on_select = self.show_search_result)
+
+    @staticmethod
+    def open_search_backend():
+        # Runs in the background worker, on the first search
+        from animal_logger.src.db.utils_db import UtilsDB
+        return UtilsDB.get_search_backend()
+
+    def show_search_result(self, hit: dict) -> None:
+        records = Config.get_info()['records']
+        browser = RecordBrowser(self.window, self.main_frame, records['schema'], records['table_name'],
+                                records['columns'], page_size = records['page_size'])
+        browser.filters = {'id': hit['id']}
+        browser.initialize_ui()
 
     def add_account_settings(self):
         account_settings = ctk.CTkLabel(self.header, text="Account Settings", fg_color='#1f2f40', text_color = 'white')
@@ -91,13 +110,15 @@ class Dashboard(BaseFrame):
             setattr(self, attr_name, button)
 
     def set_home_button(self):
-        print("Something")
+        HomeView(self.window, self.main_frame).initialize_ui()
 
     def set_recent_button(self):
-        pass
+        RecentView(self.window, self.main_frame, shown = Config.get_info()['recent']['shown']).initialize_ui()
 
     def set_create_record_button(self):
         AddAnimal(self.window, self.main_frame).initialize_ui()
 
     def set_view_record_button(self):
-        pass
\ No newline at end of file
+        records = Config.get_info()['records']
+        RecordBrowser(self.window, self.main_frame, records['schema'], records['table_name'], records['columns'],
+                      page_size = records['page_size']).initialize_ui()
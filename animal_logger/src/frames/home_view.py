@@ -0,0 +1,157 @@
+from typing import Any, Dict, List, Optional
+
+import customtkinter as ctk
+
+from config.config import Config
+from animal_logger.src.frames.background import Job
+from animal_logger.src.frames.baseframe import BaseFrame
+
+
+class HomeView(BaseFrame):
+    """Herd overview: animals per class, sex, order, age bucket and species.
+
+    Figures come from the SummaryService, whose snapshot does not depend on the size of the herd,
+    and from the TaxonomyService for the orders, so the view re-reads them every _poll_ms_ to show
+    new inserts. Only the first opening may wait on the database, in the background.
+    """
+
+    def __init__(self, window, main_frame: ctk.CTkFrame, top_species: int = 8, top_orders: int = 6,
+                 poll_ms: int = 5000) -> None:
+        super().__init__(window)
+        self.main_frame = main_frame
+        self.top_species = top_species
+        self.top_orders = top_orders
+        self.poll_ms = poll_ms
+        self.service = None
+        self.taxonomy = None
+        self.load_job: Optional[Job] = None
+        self.cards = None
+        self.total_label = None
+        self.class_labels: Dict[str, ctk.CTkLabel] = {}
+        self.sex_label = None
+        self.orders_label = None
+        self.age_rows: List[tuple] = []
+        self.species_labels: List[ctk.CTkLabel] = []
+
+    def initialize_ui(self) -> None:
+        for widget in self.main_frame.winfo_children():
+            widget.destroy()
+        self.total_label = ctk.CTkLabel(self.main_frame, text = 'Loading...', anchor = 'w',
+                                        font = ("Montserrat", 18, "bold"))
+        self.total_label.pack(fill = 'x', padx = 20, pady = (10, 0))
+        self.cards = ctk.CTkFrame(self.main_frame, fg_color = 'transparent')
+        self.cards.pack(fill = 'x', padx = 20, pady = 10)
+        self.sex_label = ctk.CTkLabel(self.main_frame, text = '', anchor = 'w', text_color = '#4d4d4d')
+        self.sex_label.pack(fill = 'x', padx = 20)
+        self.orders_label = ctk.CTkLabel(self.main_frame, text = '', anchor = 'w', text_color = '#4d4d4d')
+        self.orders_label.pack(fill = 'x', padx = 20)
+        columns = ctk.CTkFrame(self.main_frame, fg_color = 'transparent')
+        columns.pack(fill = 'both', expand = True, padx = 20, pady = 10)
+        self.add_age_distribution(columns)
+        self.add_species_list(columns)
+        self.load_job = self.worker.submit(self.open_service, on_success = self.on_service,
+                                           on_error = self.on_load_error)
+
+    def add_class_cards(self, animal_classes: List[str]) -> None:
+        colors = ['#EFBC9B', '#FFE4CF', '#FFEDD8', '#F1F5A8', '#78A083', '#B7C9F2']
+        for idx, (animal_class, color) in enumerate(zip(animal_classes, colors)):
+            self.cards.columnconfigure(idx, weight = 1, uniform = 'classes')
+            label = ctk.CTkLabel(self.cards, text = animal_class.capitalize(), fg_color = color, corner_radius = 8,
+                                 height = 60, text_color = '#4d4d4d')
+            label.grid(row = 0, column = idx, sticky = 'ew', padx = 4)
+            self.class_labels[animal_class] = label
+
+    def add_age_distribution(self, parent: ctk.CTkFrame) -> None:
+        frame = ctk.CTkFrame(parent, fg_color = 'white')
+        frame.pack(side = 'left', fill = 'both', expand = True, padx = (0, 10))
+        ctk.CTkLabel(frame, text = 'Age', anchor = 'w').pack(fill = 'x', padx = 10)
+        # Enough rows for ages up to 60 with the default buckets, more buckets are folded in the last one
+        for _ in range(12):
+            row = ctk.CTkFrame(frame, fg_color = 'transparent')
+            label = ctk.CTkLabel(row, text = '', width = 70, anchor = 'w')
+            label.pack(side = 'left')
+            bar = ctk.CTkProgressBar(row)
+            bar.pack(side = 'left', fill = 'x', expand = True, padx = 6)
+            count = ctk.CTkLabel(row, text = '', width = 60, anchor = 'e')
+            count.pack(side = 'left')
+            self.age_rows.append((row, label, bar, count))
+
+    def add_species_list(self, parent: ctk.CTkFrame) -> None:
+        frame = ctk.CTkFrame(parent, fg_color = 'white')
+        frame.pack(side = 'left', fill = 'both', expand = True)
+        ctk.CTkLabel(frame, text = 'Species', anchor = 'w').pack(fill = 'x', padx = 10)
+        for _ in range(self.top_species):
+            label = ctk.CTkLabel(frame, text = '', anchor = 'w')
+            label.pack(fill = 'x', padx = 10)
+            self.species_labels.append(label)
+
+    @staticmethod
+    def open_service():
+        # Runs in the background worker: the first call builds the summary in the database
+        from animal_logger.src.db.utils_db import UtilsDB
+        return UtilsDB.get_summary_service(), Config.get_info()['animal_classes']
+
+    def on_service(self, result) -> None:
+        self.service, animal_classes = result
+        self.load_job = None
+        self.add_class_cards(animal_classes)
+        self.refresh()
+        # The index may have to be built from the whole table: the summary is shown meanwhile
+        self.worker.submit(self.open_taxonomy, on_success = self.on_taxonomy, on_error = self.on_taxonomy_error)
+
+    @staticmethod
+    def open_taxonomy():
+        from animal_logger.src.db.utils_db import UtilsDB
+        return UtilsDB.get_taxonomy_service()
+
+    def on_taxonomy(self, taxonomy) -> None:
+        self.taxonomy = taxonomy
+        if self.orders_label.winfo_exists():
+            self.show_orders()
+
+    def on_taxonomy_error(self, error: Exception) -> None:
+        if self.orders_label.winfo_exists():
+            self.orders_label.configure(text = 'Orders are not available.')
+
+    def on_load_error(self, error: Exception) -> None:
+        from animal_logger.src.db.utils_db import UtilsDB
+        self.load_job = None
+        message = 'The database is not answering.' if isinstance(error, TimeoutError) else UtilsDB.get_error_message(error)
+        self.total_label.configure(text = message)
+
+    def refresh(self) -> None:
+        if not self.total_label.winfo_exists():
+            return  # The view was replaced
+        self.show(self.service.snapshot())
+        if self.taxonomy is not None:
+            self.show_orders()
+        self.window.after(self.poll_ms, self.refresh)
+
+    def show(self, summary: Dict[str, Any]) -> None:
+        mean_age = f", mean age {summary['mean_age']:.1f}" if summary['mean_age'] is not None else ''
+        self.total_label.configure(text = f"{summary['animals']:,} animals{mean_age}")
+        for animal_class, label in self.class_labels.items():
+            label.configure(text = f"{animal_class.capitalize()}\n{summary['by_class'].get(animal_class, 0):,}")
+        self.sex_label.configure(text = '   '.join(f"{sex}: {count:,}" for sex, count in summary['by_sex'].items()))
+        buckets = list(summary['by_age'].items())
+        if len(buckets) > len(self.age_rows):
+            overflow = buckets[len(self.age_rows) - 1:]
+            buckets = buckets[:len(self.age_rows) - 1] + [(f"{overflow[0][0].split('-')[0]}+",
+                                                           sum(count for _, count in overflow))]
+        largest = max((count for _, count in buckets), default = 0)
+        for idx, (row, label, bar, count_label) in enumerate(self.age_rows):
+            if idx < len(buckets):
+                bucket, count = buckets[idx]
+                label.configure(text = bucket)
+                bar.set(count / largest if largest else 0)
+                count_label.configure(text = f"{count:,}")
+                row.pack(fill = 'x', padx = 10, pady = 2)
+            else:
+                row.pack_forget()
+        species = list(summary['by_species'].items())
+        for idx, label in enumerate(self.species_labels):
+            label.configure(text = f"{species[idx][0]}: {species[idx][1]:,}" if idx < len(species) else '')
+
+    def show_orders(self) -> None:
+        orders = self.taxonomy.count_by_rank('order').most_common(self.top_orders)
+        self.orders_label.configure(text = 'Orders:   ' + '   '.join(f"{order}: {count:,}" for order, count in orders))
@@ -0,0 +1,120 @@
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Sequence, Tuple, Union
+
+import customtkinter as ctk
+from PIL import Image
+
+from config.log_config import LOGGER
+
+
+# CTkImage's own default, used when no shape is requested
+DEFAULT_SIZE = (20, 20)
+DPI_SCALES = (1.0, 1.25, 1.5, 2.0)
+
+Size = Tuple[int, int]
+
+
+class SpriteAtlas:
+    """Icons of one size and DPI scale, resized once and packed side by side into a single image."""
+
+    def __init__(self, paths: Sequence[Path], size: Size, scale: float) -> None:
+        self.size = size
+        self.scale = scale
+        pixel_size = (round(size[0] * scale), round(size[1] * scale))
+        self.sheet = Image.new('RGBA', (pixel_size[0] * len(paths), pixel_size[1]))
+        self.boxes: Dict[Path, Tuple[int, int, int, int]] = {}
+        for idx, path in enumerate(paths):
+            with Image.open(path) as image:
+                icon = image.convert('RGBA').resize(pixel_size, Image.Resampling.LANCZOS)
+            left = idx * pixel_size[0]
+            self.sheet.paste(icon, (left, 0))
+            self.boxes[path] = (left, 0, left + pixel_size[0], pixel_size[1])
+
+    def crop(self, path: Path) -> Optional[Image.Image]:
+        box = self.boxes.get(path)
+        return self.sheet.crop(box) if box else None
+
+
+class ImageCache:
+    """Process-wide cache of CTkImages keyed by (file, size, appearance mode, DPI scale).
+
+    Files are decoded lazily, once, and resized with LANCZOS at the DPI scale of the screen. When
+    a sprite atlas covering the requested icon has been built with preload_atlas, the icon is cut
+    from it and the disk is not touched. Both the decoded sources and the CTkImages are evicted in
+    least-recently-used order.
+    """
+
+    def __init__(self, max_images: int = 256, max_sources: int = 64, scale: float = 1.0) -> None:
+        self.max_images = max_images
+        self.max_sources = max_sources
+        self.scale = scale
+        self.hits = 0
+        self.misses = 0
+        self._images: OrderedDict[tuple, ctk.CTkImage] = OrderedDict()
+        self._sources: OrderedDict[Path, Image.Image] = OrderedDict()
+        self._atlases: Dict[Tuple[Size, float], SpriteAtlas] = {}
+        self._lock = threading.RLock()
+
+    def get(self, image_folder: Union[str, Path], img_name: str, new_shape: Optional[Size] = None) -> ctk.CTkImage:
+        """CTkImage of _image_folder/img_name.png_ displayed at _new_shape_ (20x20 by default)."""
+        path = Path(image_folder) / f"{img_name}.png"
+        size = tuple(new_shape) if new_shape else DEFAULT_SIZE
+        key = (path, size, ctk.get_appearance_mode(), self.scale)
+        with self._lock:
+            ctk_image = self._images.get(key)
+            if ctk_image is not None:
+                self.hits += 1
+                self._images.move_to_end(key)
+                return ctk_image
+            self.misses += 1
+            ctk_image = ctk.CTkImage(self._scaled_source(path, size), size=size)
+            self._images[key] = ctk_image
+            while len(self._images) > self.max_images:
+                self._images.popitem(last=False)
+            return ctk_image
+
+    def preload_atlas(self,
+                      image_folders: Iterable[Union[str, Path]],
+                      sizes: Iterable[Size] = (DEFAULT_SIZE,),
+                      scales: Iterable[float] = DPI_SCALES) -> None:
+        """Decode every PNG of _image_folders_ and pre-scale it to all _sizes_ at all DPI _scales_.
+
+        Safe to run from a background thread, e.g. while the login page is shown.
+        """
+        paths = sorted(path for folder in image_folders for path in Path(folder).glob('*.png'))
+        for size in sizes:
+            for scale in scales:
+                atlas = SpriteAtlas(paths, tuple(size), scale)
+                with self._lock:
+                    self._atlases[(tuple(size), scale)] = atlas
+        LOGGER.debug(f"Sprite atlases built for {len(paths)} icons.")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._images.clear()
+            self._sources.clear()
+
+    def _scaled_source(self, path: Path, size: Size) -> Image.Image:
+        atlas = self._atlases.get((size, self.scale))
+        icon = atlas.crop(path) if atlas else None
+        if icon is not None:
+            return icon
+        pixel_size = (round(size[0] * self.scale), round(size[1] * self.scale))
+        return self._source(path).resize(pixel_size, Image.Resampling.LANCZOS)
+
+    def _source(self, path: Path) -> Image.Image:
+        source = self._sources.get(path)
+        if source is None:
+            with Image.open(path) as image:
+                source = image.convert('RGBA')
+            self._sources[path] = source
+            while len(self._sources) > self.max_sources:
+                self._sources.popitem(last=False)
+        else:
+            self._sources.move_to_end(path)
+        return source
+
+
+IMAGE_CACHE = ImageCache()
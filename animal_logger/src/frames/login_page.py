@@ -1,26 +1,36 @@
-import os
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 import tkinter
 import customtkinter as ctk
-from PIL import ImageTk, Image
+from PIL import ImageTk
 
 import animal_logger
+from animal_logger.opt.img import add_animal, menu
 from config.config import Config
 from config.log_config import LOGGER
-from animal_logger.src.db.utils_db import UtilsDB
 from animal_logger.src.frames.baseframe import BaseFrame
 from animal_logger.src.frames.dashboard import Dashboard
+from animal_logger.src.frames.image_cache import DEFAULT_SIZE, IMAGE_CACHE
+from animal_logger.src.frames.resize_pipeline import ResizePipeline
+
+if TYPE_CHECKING:
+    # The DB modules pull in SQLAlchemy, they are imported when first needed to keep startup fast
+    from animal_logger.src.db.auth import AuthService
 
 
 class LoginPage(BaseFrame):
 
+    LOGIN_TIMEOUT_S = 30
+
     def __init__(self, window) -> None:
         super().__init__(window)
         self.window = window
         self.login_image = None
         self.login_image_label = None
         self.error_message = None
+        self.auth_service = None
+        self.resize_pipeline = None
 
     def get_image_path(self, img_name: str) -> Path:
         # Adjust this method to find your image correctly
@@ -30,45 +40,56 @@ class LoginPage(BaseFrame):
     def initialize_ui(self):
         """Initialize the UI of the newly-created window.
         """
-        # self.resize_image()
-        # self.app.bind('<Configure>', self.resize_image)
+        self.resize_image()
+        # Added next to CTk's own <Configure> binding, which tracks the window size and scaling
+        self.window.bind('<Configure>', self.resize_image, add = '+')
         self.add_frame()
         self.add_username_password()
         self.add_forgot_password()
         self.add_login_button()
         self.add_exit_button()
+        # Prepare the dashboard icons while the user types the credentials
+        icon_folders = [Path(menu.__file__).parent, Path(add_animal.__file__).parent]
+        self.worker.submit(IMAGE_CACHE.preload_atlas, icon_folders, [(18, 18), DEFAULT_SIZE])
         self.window.mainloop()
 
-    def resize_image(self, event: str = None) -> None:
+    def resize_image(self, event: tkinter.Event = None) -> None:
         """Take image and automatically resize it according to the current window shape requirements
-        by the user. If the image label is not created, it proceeds to do so, otherwise it configures
-        the image label with the latest reshaped version of the image.
-        
+        by the user. If the image label is not created, it proceeds to do so, otherwise the resize
+        pipeline configures it with the latest reshaped version of the image once it is ready.
+
+        Resizing is debounced and runs in the background worker, so dragging the window edge does not
+        block the Tk thread. The source image is decoded only once.
+
         IMPORTANT:
         In the context of GUI development, labels and canvases refer to the object that holds an image 
         and can perform several actions to it, like change its relative position, respond to mouse clicks...
 
         Args:
-            event (str, optional): Type of event that needs to happen for the method to work. 
-            Defaults to None.
+            event (tkinter.Event, optional): Event that triggered the resize. <Configure> events of child
+            widgets are ignored. Defaults to None.
         """
-        img_path = self.get_image_path('login.jpg')
-        img = Image.open(img_path)
-
-        # Resize the image to the current window size
-        new_width = self.window.winfo_width()
-        new_height = self.window.winfo_height()
-        # Resize to new window size using LANCZOS resampling filter
-        img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-        # Update login image
-        self.login_image = ImageTk.PhotoImage(img)
-
-        # If label already exists 
-        if self.login_image_label:
-            self.login_image_label.configure(image=self.login_image)
-        else:
-            self.login_image_label = ctk.CTkLabel(master=self.window, image=self.login_image, text = "")
+        if event is not None and event.widget is not self.window:
+            return
+        if self.login_image_label is not None and not self.login_image_label.winfo_exists():
+            return  # Logged in, the login page is gone but the binding stays with the window
+        if not self.login_image_label:
+            self.login_image_label = ctk.CTkLabel(master=self.window, text = "")
             self.login_image_label.place(x=0, y=0, relwidth=1, relheight=1)
+        if self.resize_pipeline is None:
+            self.resize_pipeline = ResizePipeline(self.window, self.worker, self.get_image_path('login.jpg'),
+                                                  on_ready = self.set_login_image,
+                                                  convert = ImageTk.PhotoImage)
+        if event is None:
+            # Apply the default geometry, otherwise the window still reports a size of 1x1
+            self.window.update_idletasks()
+        # Resize to the current window size
+        self.resize_pipeline.request((self.window.winfo_width(), self.window.winfo_height()))
+
+    def set_login_image(self, image: ImageTk.PhotoImage) -> None:
+        # Keep a reference, Tk does not, and update login image
+        self.login_image = image
+        self.login_image_label.configure(image=self.login_image)
 
     def add_frame(self) -> None:
         self.frame = ctk.CTkFrame(master = self.login_image_label, width = 350, height = 370, corner_radius = 15)
@@ -93,33 +114,60 @@ class LoginPage(BaseFrame):
         self.login_button.place(relx=0.5, rely=0.7, anchor=tkinter.CENTER)
 
     def add_exit_button(self) -> None:
-        self.login_button = ctk.CTkButton(master = self.frame, width = 235, text = "Exit", 
-                                          fg_color = "#727272", command=self.exit_application)
-        self.login_button.place(relx=0.5, rely=0.82, anchor=tkinter.CENTER)
+        self.exit_button = ctk.CTkButton(master = self.frame, width = 235, text = "Exit", 
+                                         fg_color = "#727272", command=self.exit_application)
+        self.exit_button.place(relx=0.5, rely=0.82, anchor=tkinter.CENTER)
 
     def attempt_login(self) -> None:
+        """Check the credentials in the background worker, so the window keeps responding meanwhile."""
         # Fetch username and password
         username = str(self.username.get())
-        os.environ["USERNAME"] = username
         password = str(self.password.get())
-        os.environ["PASSWORD"] = password
-        LOGGER.info(f"Attempting to login with {username}:{password}")
-        db_url = Config.get_info()['db_url']
-        login_table, message = UtilsDB.get_table(schema = 'credentials', table_name = 'login_app', engine = db_url)
+        Config.set_credentials(username, password)
+        LOGGER.info(f"Attempting to login with user '{username}'")
         # Erase any previous text if any
         if self.error_message:
             self.error_message.configure(text='')
-        if not message: # user is correctly logged in
-            user_exists = len(login_table.loc[(login_table['username'] == username) 
-                                            & (login_table['password'] == password)].index)
-            if user_exists: # user is in login database
-                for widget in self.window.winfo_children():
-                    widget.destroy()
-                    # Dashboard(self.window).initialize_ui()
+        self.login_button.configure(state = 'disabled')
+        # The first login also imports SQLAlchemy and builds the engine, all of it stays off the Tk thread
+        self.worker.submit(lambda: self.get_auth_service().authenticate(username, password),
+                           on_success = self.on_login_result,
+                           on_error = self.on_login_error,
+                           timeout = self.LOGIN_TIMEOUT_S)
+
+    def get_auth_service(self) -> 'AuthService':
+        """Reuse the authentication service, and its cache, while the DB engine stays the same."""
+        from animal_logger.src.db.auth import AuthService
+        db_engine = Config.get_engine()
+        if self.auth_service is None or self.auth_service.engine is not db_engine:
+            self.auth_service = AuthService(db_engine)
+        return self.auth_service
+
+    def on_login_result(self, user_exists: bool) -> None:
+        self.login_button.configure(state = 'normal')
+        if user_exists: # user is in login database
+            for widget in self.window.winfo_children():
+                widget.destroy()
+                # Dashboard(self.window).initialize_ui()
+        else:
+            self.show_error_message('Invalid credentials. Try again.')
+
+    def on_login_error(self, error: Exception) -> None:
+        self.login_button.configure(state = 'normal')
+        if isinstance(error, TimeoutError):
+            self.show_error_message('The database is not answering. Try again.')
+        else:
+            from animal_logger.src.db.utils_db import UtilsDB
+            self.show_error_message(UtilsDB.get_error_message(error))
+
+    def show_error_message(self, message: str) -> None:
+        if self.error_message:
+            self.error_message.configure(text = message)
         else:
             self.error_message = ctk.CTkLabel(master = self.frame, text = message, 
-                                                font = ("Montserrat", 12, "bold"), text_color = '#FF0000')
+                                              font = ("Montserrat", 12, "bold"), text_color = '#FF0000')
             self.error_message.place(relx=0.17, rely=0.58)
-        
+
     def exit_application(self):
+        Config.logout()
         self.window.destroy()
@@ -0,0 +1,86 @@
+from typing import List, Optional
+
+import customtkinter as ctk
+
+from animal_logger.src.frames.background import Job
+from animal_logger.src.frames.baseframe import BaseFrame
+
+
+class RecentView(BaseFrame):
+    """Latest inserts and edits, read from the in-memory RecentFeed.
+
+    Only the first opening may query the database (to load the feed), in the background. After
+    that, opening or refreshing the view copies the _shown_ newest entries, whatever the size of
+    the table.
+    """
+
+    COLUMNS = ['when', 'what', 'id', 'name', 'class_', 'species']
+
+    def __init__(self, window, main_frame: ctk.CTkFrame, shown: int = 20) -> None:
+        super().__init__(window)
+        self.main_frame = main_frame
+        self.shown = shown
+        self.feed = None
+        self.load_job: Optional[Job] = None
+        self.cells: List[List[ctk.CTkLabel]] = []
+        self.status_label = None
+
+    def initialize_ui(self) -> None:
+        for widget in self.main_frame.winfo_children():
+            widget.destroy()
+        bar = ctk.CTkFrame(self.main_frame, fg_color = 'transparent')
+        bar.pack(fill = 'x', padx = 20, pady = (10, 0))
+        ctk.CTkLabel(bar, text = "Recent activity", font = ("Montserrat", 18, "bold")).pack(side = 'left')
+        ctk.CTkButton(bar, text = "Refresh", width = 80, command = self.refresh).pack(side = 'right')
+        self.add_table()
+        self.status_label = ctk.CTkLabel(self.main_frame, text = 'Loading...', anchor = 'w', text_color = '#4d4d4d')
+        self.status_label.pack(fill = 'x', padx = 20, pady = (0, 10))
+        self.load_job = self.worker.submit(self.open_feed, on_success = self.on_feed, on_error = self.on_load_error)
+
+    def add_table(self) -> None:
+        body = ctk.CTkFrame(self.main_frame, fg_color = 'white')
+        body.pack(fill = 'both', expand = True, padx = 20, pady = 10)
+        for col_idx, col in enumerate(self.COLUMNS):
+            body.columnconfigure(col_idx, weight = 1, uniform = 'recent')
+            header = ctk.CTkLabel(body, text = col, anchor = 'w', padx = 6, fg_color = '#DDDDDD')
+            header.grid(row = 0, column = col_idx, sticky = 'ew')
+        for row_idx in range(self.shown):
+            color = '#FFFFFF' if row_idx % 2 else '#F3F3F3'
+            cells = []
+            for col_idx in range(len(self.COLUMNS)):
+                cell = ctk.CTkLabel(body, text = '', anchor = 'w', height = 24, fg_color = color, padx = 6)
+                cell.grid(row = row_idx + 1, column = col_idx, sticky = 'ew')
+                cells.append(cell)
+            self.cells.append(cells)
+
+    @staticmethod
+    def open_feed():
+        # Runs in the background worker: the first call loads the feed from the database
+        from animal_logger.src.db.utils_db import UtilsDB
+        return UtilsDB.get_recent_feed()
+
+    def on_feed(self, feed) -> None:
+        self.load_job = None
+        self.feed = feed
+        self.refresh()
+
+    def on_load_error(self, error: Exception) -> None:
+        from animal_logger.src.db.utils_db import UtilsDB
+        self.load_job = None
+        message = 'The database is not answering.' if isinstance(error, TimeoutError) else UtilsDB.get_error_message(error)
+        self.status_label.configure(text = message)
+
+    def refresh(self) -> None:
+        if self.feed is None:
+            return
+        activities = self.feed.latest(self.shown)
+        for row_idx, cells in enumerate(self.cells):
+            values = [''] * len(self.COLUMNS)
+            if row_idx < len(activities):
+                timestamp, kind, record = activities[row_idx]
+                values = [timestamp.strftime('%Y-%m-%d %H:%M') if timestamp else '', kind,
+                          *(record.get(col, '') for col in self.COLUMNS[2:])]
+            for cell, value in zip(cells, values):
+                cell.configure(text = '' if value is None else str(value))
+        self.status_label.configure(text = f"{len(activities)} most recent of {len(self.feed)} kept in memory"
+                                    if activities else 'No recent activity.')
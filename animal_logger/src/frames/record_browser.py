@@ -0,0 +1,249 @@
+import tkinter
+from typing import Any, Dict, List, Optional, Sequence
+
+import customtkinter as ctk
+
+from config.config import Config
+from animal_logger.src.frames.background import Job
+from animal_logger.src.frames.baseframe import BaseFrame
+
+
+class RecordBrowser(BaseFrame):
+    """Scrollable list of the records of a table, read page by page with a KeysetPager.
+
+    Only _visible_rows_ rows of labels exist, they are reused while scrolling, so the number of
+    widgets does not depend on the size of the table. At most _max_pages_ pages are kept in memory,
+    the next (or previous) one is fetched in the background before the view reaches the end of
+    the loaded rows. Sorting (click on a column header) and filtering are done by the database.
+    """
+
+    def __init__(self,
+                 window,
+                 main_frame: ctk.CTkFrame,
+                 schema: str,
+                 table_name: str,
+                 columns: Sequence[str],
+                 page_size: int = 100,
+                 visible_rows: int = 18,
+                 max_pages: int = 5,
+                 engine = None) -> None:
+        super().__init__(window)
+        self.main_frame = main_frame
+        self.schema = schema
+        self.table_name = table_name
+        self.columns = list(columns)
+        self.page_size = page_size
+        self.visible_rows = visible_rows
+        self.max_rows = max_pages * page_size
+        self.engine = engine
+        self.sort_col = 'id'
+        self.descending = False
+        self.filters: Dict[str, Any] = {}
+        self.pager = None
+        self.rows: List[tuple] = []  # loaded window of the table, each row ends with its keyset key
+        self.offset = 0  # position in the table of rows[0]
+        self.top = 0  # index in rows of the first visible row
+        self.total: Optional[int] = None
+        self.has_more_before = False
+        self.has_more_after = False
+        self.fetch_job: Optional[Job] = None
+        self.count_job: Optional[Job] = None
+        self.header_buttons: Dict[str, ctk.CTkButton] = {}
+        self.cells: List[List[ctk.CTkLabel]] = []
+        self.shown: List[Optional[tuple]] = []
+        self.status_label = None
+
+    def initialize_ui(self) -> None:
+        for widget in self.main_frame.winfo_children():
+            widget.destroy()
+        self.add_filter_bar()
+        self.add_table()
+        self.add_status_label()
+        self.reload()
+
+    def add_filter_bar(self) -> None:
+        bar = ctk.CTkFrame(self.main_frame, fg_color = 'transparent')
+        bar.pack(fill = 'x', padx = 20, pady = (10, 0))
+        self.filter_column = ctk.CTkOptionMenu(bar, values = self.columns, width = 120)
+        self.filter_column.set('name' if 'name' in self.columns else self.columns[0])
+        self.filter_column.pack(side = 'left')
+        self.filter_value = ctk.CTkEntry(bar, placeholder_text = "Filter value")
+        self.filter_value.pack(side = 'left', fill = 'x', expand = True, padx = 10)
+        self.filter_value.bind('<Return>', lambda _: self.apply_filter())
+        ctk.CTkButton(bar, text = "Filter", width = 80, command = self.apply_filter).pack(side = 'left')
+        ctk.CTkButton(bar, text = "Clear", width = 80, fg_color = "#727272",
+                      command = self.clear_filter).pack(side = 'left', padx = (10, 0))
+
+    def add_table(self) -> None:
+        self.body = ctk.CTkFrame(self.main_frame, fg_color = 'white')
+        self.body.pack(fill = 'both', expand = True, padx = 20, pady = 10)
+        for col_idx, col in enumerate(self.columns):
+            self.body.columnconfigure(col_idx, weight = 1, uniform = 'records')
+            button = ctk.CTkButton(self.body, text = col, height = 28, corner_radius = 0,
+                                   command = lambda col=col: self.sort_by(col))
+            button.grid(row = 0, column = col_idx, sticky = 'ew')
+            self.header_buttons[col] = button
+        # The only row widgets ever created, scrolling just changes their text
+        for row_idx in range(self.visible_rows):
+            color = '#FFFFFF' if row_idx % 2 else '#F3F3F3'
+            cells = []
+            for col_idx in range(len(self.columns)):
+                cell = ctk.CTkLabel(self.body, text = '', anchor = 'w', height = 26, fg_color = color, padx = 6)
+                cell.grid(row = row_idx + 1, column = col_idx, sticky = 'ew')
+                self.bind_scrolling(cell)
+                cells.append(cell)
+            self.cells.append(cells)
+        self.shown = [None] * self.visible_rows
+        self.bind_scrolling(self.body)
+
+    def add_status_label(self) -> None:
+        self.status_label = ctk.CTkLabel(self.main_frame, text = '', anchor = 'w', text_color = '#4d4d4d')
+        self.status_label.pack(fill = 'x', padx = 20, pady = (0, 10))
+
+    def bind_scrolling(self, widget) -> None:
+        widget.bind('<MouseWheel>', self.on_mouse_wheel, add = '+')
+        widget.bind('<Button-4>', lambda _: self.scroll(-3), add = '+')  # X11 wheel up
+        widget.bind('<Button-5>', lambda _: self.scroll(3), add = '+')  # X11 wheel down
+        widget.bind('<Up>', lambda _: self.scroll(-1), add = '+')
+        widget.bind('<Down>', lambda _: self.scroll(1), add = '+')
+        widget.bind('<Prior>', lambda _: self.scroll(-self.visible_rows), add = '+')
+        widget.bind('<Next>', lambda _: self.scroll(self.visible_rows), add = '+')
+        widget.bind('<Button-1>', lambda _: self.body.focus_set(), add = '+')
+
+    def on_mouse_wheel(self, event: tkinter.Event) -> None:
+        # Windows reports multiples of 120 per notch, macOS small deltas
+        steps = event.delta // 120 if abs(event.delta) >= 120 else event.delta
+        self.scroll(-3 * steps)
+
+    def sort_by(self, col: str) -> None:
+        self.descending = not self.descending if col == self.sort_col else False
+        self.sort_col = col
+        for name, button in self.header_buttons.items():
+            arrow = (' ▼' if self.descending else ' ▲') if name == col else ''
+            button.configure(text = name + arrow)
+        self.reload()
+
+    def apply_filter(self) -> None:
+        col, value = self.filter_column.get(), self.filter_value.get().strip()
+        if not value:
+            self.clear_filter()
+            return
+        try:
+            self.filters = {col: float(value) if '.' in value else int(value)}
+        except ValueError:
+            # Text matches by prefix, which an index on the column can serve
+            self.filters = {col: ('like', f"{value}%")}
+        self.reload()
+
+    def clear_filter(self) -> None:
+        self.filter_value.delete(0, 'end')
+        self.filters = {}
+        self.reload()
+
+    def reload(self) -> None:
+        """Start over from the first row, with the current sorting and filters."""
+        for job in (self.fetch_job, self.count_job):
+            if job is not None:
+                job.cancel()
+        self.rows, self.offset, self.top, self.total = [], 0, 0, None
+        self.has_more_before = self.has_more_after = False
+        self.render()
+        self.status_label.configure(text = 'Loading...')
+        self.fetch_job = self.worker.submit(self.open_pager, on_success = self.on_first_page,
+                                            on_error = self.on_fetch_error)
+
+    def open_pager(self):
+        # Runs in the background worker: may import SQLAlchemy and build the engine on first use
+        from animal_logger.src.db.pager import KeysetPager
+        engine = self.engine if self.engine is not None else Config.get_engine()
+        pager = KeysetPager(engine, self.schema, self.table_name, self.columns, self.filters,
+                            self.sort_col, self.descending, self.page_size)
+        return pager, pager.first_page()
+
+    def on_first_page(self, result) -> None:
+        self.pager, page = result
+        self.fetch_job = None
+        self.rows = list(page.rows)
+        self.has_more_after = page.has_more
+        self.render()
+        self.count_job = self.worker.submit(self.pager.count, on_success = self.on_count)
+
+    def on_count(self, total: int) -> None:
+        self.count_job = None
+        self.total = total
+        self.update_status()
+
+    def on_fetch_error(self, error: Exception) -> None:
+        from animal_logger.src.db.utils_db import UtilsDB
+        self.fetch_job = None
+        message = 'The database is not answering.' if isinstance(error, TimeoutError) else UtilsDB.get_error_message(error)
+        self.status_label.configure(text = message)
+
+    def scroll(self, delta: int) -> None:
+        max_top = max(0, len(self.rows) - self.visible_rows)
+        top = min(max(0, self.top + delta), max_top)
+        if top != self.top:
+            self.top = top
+            self.render()
+        self.prefetch()
+
+    def prefetch(self) -> None:
+        """Fetch the adjacent page once the view comes within half a page of the loaded rows' end."""
+        if self.fetch_job is not None or self.pager is None or not self.rows:
+            return
+        margin = self.page_size // 2
+        if self.has_more_after and len(self.rows) - (self.top + self.visible_rows) < margin:
+            self.fetch_job = self.worker.submit(self.pager.page_after, self.rows[-1][-2:],
+                                                on_success = self.on_page_after, on_error = self.on_fetch_error)
+        elif self.has_more_before and self.top < margin:
+            self.fetch_job = self.worker.submit(self.pager.page_before, self.rows[0][-2:],
+                                                on_success = self.on_page_before, on_error = self.on_fetch_error)
+
+    def on_page_after(self, page) -> None:
+        self.fetch_job = None
+        self.rows.extend(page.rows)
+        self.has_more_after = page.has_more
+        excess = len(self.rows) - self.max_rows
+        if excess > 0:
+            del self.rows[:excess]
+            self.offset += excess
+            self.top -= excess
+            self.has_more_before = True
+        self.render()
+        self.prefetch()
+
+    def on_page_before(self, page) -> None:
+        self.fetch_job = None
+        self.rows[:0] = page.rows
+        self.offset -= len(page.rows)
+        self.top += len(page.rows)
+        self.has_more_before = page.has_more
+        excess = len(self.rows) - self.max_rows
+        if excess > 0:
+            del self.rows[-excess:]
+            self.has_more_after = True
+        self.render()
+        self.prefetch()
+
+    def render(self) -> None:
+        n_columns = len(self.columns)
+        for row_idx, cells in enumerate(self.cells):
+            idx = self.top + row_idx
+            values = self.rows[idx][:n_columns] if idx < len(self.rows) else None
+            if values == self.shown[row_idx]:
+                continue
+            self.shown[row_idx] = values
+            for cell, value in zip(cells, values or [''] * n_columns):
+                cell.configure(text = '' if value is None else str(value))
+        self.update_status()
+
+    def update_status(self) -> None:
+        if self.status_label is None or self.fetch_job is not None and not self.rows:
+            return
+        if not self.rows:
+            self.status_label.configure(text = 'No records found.')
+            return
+        first = self.offset + self.top + 1
+        last = self.offset + min(self.top + self.visible_rows, len(self.rows))
+        total = f"{self.total:,}" if self.total is not None else '...'
+        self.status_label.configure(text = f"Records {first:,}-{last:,} of {total}")
@@ -0,0 +1,105 @@
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, List, Optional, Tuple, Union
+
+from PIL import Image
+
+from animal_logger.src.frames.background import BackgroundWorker, Job
+
+
+Size = Tuple[int, int]
+
+
+class MipmapImage:
+    """Image decoded once, with a chain of successively halved copies.
+
+    Resizing starts from the smallest level still at least as large as the target, so a LANCZOS
+    resize to a window-sized image never has to filter the full-resolution source.
+    """
+
+    def __init__(self, path: Union[str, Path], min_side: int = 64) -> None:
+        with Image.open(path) as image:
+            level = image.convert('RGB')
+        self.levels: List[Image.Image] = [level]
+        while min(level.size) // 2 >= min_side:
+            level = level.reduce(2)
+            self.levels.append(level)
+
+    def resized(self, size: Size) -> Image.Image:
+        width, height = size
+        source = self.levels[0]
+        for level in self.levels:
+            if level.width < width or level.height < height:
+                break
+            source = level
+        return source.resize(size, Image.Resampling.LANCZOS)
+
+
+class ResizePipeline:
+    """Debounced, cached, background rescaling of one image to a changing target size.
+
+    Requests arriving within _debounce_ms_ of each other collapse into one. The resize itself runs
+    on the BackgroundWorker, a newer request cancels the pending one, and the last _cache_size_
+    results are kept so that going back to a recent size is immediate. _on_ready_ is called on the
+    Tk thread with whatever _convert_ returned for the resized image (e.g. an ImageTk.PhotoImage,
+    which must be built on the Tk thread).
+    """
+
+    def __init__(self,
+                 window,
+                 worker: BackgroundWorker,
+                 path: Union[str, Path],
+                 on_ready: Callable[[Any], None],
+                 convert: Callable[[Image.Image], Any] = lambda image: image,
+                 debounce_ms: int = 80,
+                 cache_size: int = 4) -> None:
+        self.window = window
+        self.worker = worker
+        self.path = path
+        self.on_ready = on_ready
+        self.convert = convert
+        self.debounce_ms = debounce_ms
+        self.cache_size = cache_size
+        self._mipmap = None
+        self._mipmap_lock = threading.Lock()
+        self._cache: OrderedDict[Size, Any] = OrderedDict()
+        self._requested: Optional[Size] = None
+        self._after_id = None
+        self._job: Optional[Job] = None
+
+    def request(self, size: Size) -> None:
+        """Ask for the image at _size_. Must be called from the Tk thread."""
+        size = (max(1, int(size[0])), max(1, int(size[1])))
+        if size == self._requested:
+            return
+        self._requested = size
+        if self._after_id is not None:
+            self.window.after_cancel(self._after_id)
+            self._after_id = None
+        if size in self._cache:
+            self._cache.move_to_end(size)
+            self.on_ready(self._cache[size])
+            return
+        self._after_id = self.window.after(self.debounce_ms, self._start, size)
+
+    def _start(self, size: Size) -> None:
+        self._after_id = None
+        if self._job is not None:
+            self._job.cancel()
+        self._job = self.worker.submit(self._resize, size, on_success=lambda image: self._done(size, image))
+
+    def _resize(self, size: Size) -> Image.Image:
+        with self._mipmap_lock:
+            if self._mipmap is None:
+                self._mipmap = MipmapImage(self.path)
+        return self._mipmap.resized(size)
+
+    def _done(self, size: Size, image: Image.Image) -> None:
+        self._job = None
+        converted = self.convert(image)
+        self._cache[size] = converted
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        if size == self._requested:
+            self.on_ready(converted)
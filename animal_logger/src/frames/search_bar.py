@@ -0,0 +1,131 @@
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+import customtkinter as ctk
+
+from animal_logger.src.frames.background import BackgroundWorker, Job
+
+
+class SearchBar:
+    """Search-as-you-type on an entry, with the results listed in a drop-down under it.
+
+    Searches start once typing pauses for _debounce_ms_, in the background worker. Starting a
+    search cancels the previous one, so results of a stale query are never shown. The drop-down
+    reuses _limit_ labels whatever the number of searches.
+    """
+
+    def __init__(self,
+                 window,
+                 entry: ctk.CTkEntry,
+                 open_backend: Callable[[], Any],
+                 on_select: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 limit: int = 10,
+                 debounce_ms: int = 150,
+                 min_chars: int = 2) -> None:
+        """
+        Args:
+            window: Window of the entry.
+            entry (ctk.CTkEntry): Entry to search from.
+            open_backend (Callable[[], Any]): Returns the search.SearchBackend, called once in the background.
+            on_select (Optional[Callable[[Dict[str, Any]], None]], optional): Called with the record clicked on.
+            limit (int, optional): Results listed at most. Defaults to 10.
+            debounce_ms (int, optional): Pause in typing before searching. Defaults to 150.
+            min_chars (int, optional): Shorter queries do not search. Defaults to 2.
+        """
+        self.window = window
+        self.entry = entry
+        self.open_backend = open_backend
+        self.on_select = on_select
+        self.limit = limit
+        self.debounce_ms = debounce_ms
+        self.min_chars = min_chars
+        self.worker = BackgroundWorker.for_window(window)
+        self.backend = None
+        self.job: Optional[Job] = None
+        self.hits: List[Dict[str, Any]] = []
+        self._after_id = None
+        self._backend_lock = threading.Lock()
+        self.dropdown = ctk.CTkFrame(window, fg_color = 'white', border_width = 1, border_color = '#DDDDDD')
+        self.labels: List[ctk.CTkLabel] = []
+        for idx in range(limit):
+            label = ctk.CTkLabel(self.dropdown, text = '', anchor = 'w', padx = 8, text_color = '#4d4d4d')
+            label.bind('<Button-1>', lambda _, idx=idx: self.select(idx))
+            self.labels.append(label)
+        self.status = ctk.CTkLabel(self.dropdown, text = '', anchor = 'w', padx = 8, text_color = '#727272')
+        entry.bind('<KeyRelease>', self.on_key, add = '+')
+        entry.bind('<Escape>', lambda _: self.hide(), add = '+')
+        entry.bind('<FocusOut>', lambda _: self.window.after(200, self.hide), add = '+')
+
+    def on_key(self, event) -> None:
+        if event.keysym == 'Escape':
+            return
+        if self._after_id is not None:
+            self.window.after_cancel(self._after_id)
+        self._after_id = self.window.after(self.debounce_ms, self.start_search)
+
+    def start_search(self) -> None:
+        self._after_id = None
+        query = self.entry.get().strip()
+        if self.job is not None:
+            self.job.cancel()
+            self.job = None
+        if len(query) < self.min_chars:
+            self.hide()
+            return
+        if self.backend is None:
+            self.show_status('Indexing records...')
+        self.job = self.worker.submit(self.search, query, pass_job = True,
+                                      on_success = self.show_results, on_error = self.on_search_error)
+
+    def search(self, query: str, job: Job) -> List[Dict[str, Any]]:
+        # Runs in the background worker: the first search opens (and may build) the index
+        with self._backend_lock:
+            if self.backend is None:
+                self.backend = self.open_backend()
+        job.check_cancelled()
+        return self.backend.search(query, self.limit, job)
+
+    def show_results(self, hits: List[Dict[str, Any]]) -> None:
+        self.job = None
+        self.hits = hits
+        if not hits:
+            self.show_status('No animal found.')
+            return
+        self.status.pack_forget()
+        for idx, label in enumerate(self.labels):
+            if idx < len(hits):
+                label.configure(text = self.describe(hits[idx]))
+                label.pack(fill = 'x')
+            else:
+                label.pack_forget()
+        self.show()
+
+    def on_search_error(self, error: Exception) -> None:
+        from animal_logger.src.db.utils_db import UtilsDB
+        self.job = None
+        self.show_status('The database is not answering.' if isinstance(error, TimeoutError)
+                         else UtilsDB.get_error_message(error))
+
+    @staticmethod
+    def describe(hit: Dict[str, Any]) -> str:
+        taxonomy = ' '.join(str(hit[field]) for field in ('genus', 'species') if hit.get(field))
+        return f"{hit.get('name', '')}  ({taxonomy})" if taxonomy else str(hit.get('name', ''))
+
+    def select(self, idx: int) -> None:
+        if idx < len(self.hits) and self.on_select is not None:
+            self.on_select(self.hits[idx])
+        self.hide()
+
+    def show_status(self, text: str) -> None:
+        for label in self.labels:
+            label.pack_forget()
+        self.status.configure(text = text)
+        self.status.pack(fill = 'x')
+        self.show()
+
+    def show(self) -> None:
+        self.dropdown.place(in_ = self.entry, relx = 0, rely = 1, relwidth = 1, y = 2)
+        self.dropdown.lift()
+
+    def hide(self) -> None:
+        self.dropdown.place_forget()
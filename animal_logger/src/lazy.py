@@ -0,0 +1,30 @@
+import importlib
+import sys
+import types
+
+
+class LazyModule(types.ModuleType):
+    """Stand-in for a module that is only imported when one of its attributes is first used.
+
+    Used for the data stack (pandas, Dask, NumPy, Arrow), which takes longer to import than the
+    whole UI and is not needed before the first query.
+    """
+
+    def __init__(self, name: str) -> None:
+        super().__init__(name)
+        self.__dict__['_lazy_name'] = name
+
+    def __getattr__(self, attr: str):
+        module = importlib.import_module(self.__dict__['_lazy_name'])
+        # Later lookups find the attributes directly, without going through __getattr__
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attr)
+
+    def __repr__(self) -> str:
+        loaded = self.__dict__['_lazy_name'] in sys.modules
+        return f"<lazy module '{self.__dict__['_lazy_name']}' ({'loaded' if loaded else 'not loaded'})>"
+
+
+def lazy_import(name: str) -> types.ModuleType:
+    """Return _name_ if it is already imported, otherwise a LazyModule importing it on first use."""
+    return sys.modules.get(name) or LazyModule(name)
@@ -0,0 +1,45 @@
+"""Memory and construction time of 1M animals as BaseAnimal objects, AnimalRecords and an AnimalCollection.
+
+Run from the repository root:
+    python -m benchmarks.bench_animals --animals 1000000
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+
+from benchmarks import datasets
+from animal_logger.src.animals.animal_collection import AnimalCollection
+from animal_logger.src.animals.animal_record import AnimalRecord
+from animal_logger.src.animals.mammal import Mammal
+
+
+def measure(label: str, build) -> None:
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<28} {elapsed:8.2f} s  {current / 2**20:10.1f} MiB  {current / len(result):8.1f} B/animal")
+    del result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--animals', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    data = datasets.make_animals(args.animals)
+    data['subspecies'] = [None] * args.animals
+    rows = list(zip(data['name'], data['age'], data['species'], data['subspecies'], data['sex'],
+                    data['genus'], data['family'], data['order'], data['class_']))
+
+    measure("Mammal (slotted BaseAnimal)", lambda: [Mammal(*row) for row in rows])
+    measure("AnimalRecord", lambda: [AnimalRecord(*row) for row in rows])
+    measure("AnimalCollection", lambda: AnimalCollection.from_columns(data))
+
+
+if __name__ == "__main__":
+    main()
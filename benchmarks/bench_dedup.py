@@ -0,0 +1,51 @@
+"""Scaling benchmark for the duplicate removal of columnar dictionaries.
+
+Run from the repository root:
+    python -m benchmarks.bench_dedup --max-rows 10000000
+"""
+import argparse
+import random
+import time
+
+from animal_logger.src.db.dedup import remove_duplicates
+
+
+def make_columnar_dict(n_rows: int, duplicate_ratio: float = 0.05, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    n_unique = max(1, int(n_rows * (1 - duplicate_ratio)))
+    ids = list(range(n_unique)) + [rng.randrange(n_unique) for _ in range(n_rows - n_unique)]
+    rng.shuffle(ids)
+    return {
+        'id': ids,
+        'name': [f"animal_{i}" for i in ids],
+        'age': [float(i % 40) for i in ids],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--max-rows', type=int, default=1_000_000)
+    parser.add_argument('--keep', choices=['first', 'last'], default='first')
+    parser.add_argument('--tolerance', type=float, default=2.0,
+                        help='Maximum allowed growth of the per-row cost between the smallest and largest size.')
+    args = parser.parse_args()
+
+    sizes = [n for n in (10_000, 100_000, 1_000_000, 10_000_000) if n <= args.max_rows]
+    per_row = []
+    for n_rows in sizes:
+        data = make_columnar_dict(n_rows)
+        start = time.perf_counter()
+        _, dropped = remove_duplicates(data, keys='id', keep=args.keep)
+        elapsed = time.perf_counter() - start
+        per_row.append(elapsed / n_rows)
+        print(f"{n_rows:>12,} rows  {elapsed:8.3f} s  {per_row[-1] * 1e9:8.1f} ns/row  "
+              f"{sum(dropped.values()):>10,} dropped")
+
+    growth = per_row[-1] / per_row[0]
+    print(f"Per-row cost growth from {sizes[0]:,} to {sizes[-1]:,} rows: x{growth:.2f}")
+    if growth > args.tolerance:
+        raise SystemExit(f"Scaling is not linear: per-row cost grew more than x{args.tolerance}.")
+
+
+if __name__ == "__main__":
+    main()
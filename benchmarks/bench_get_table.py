@@ -0,0 +1,54 @@
+"""Compare the planned, concurrent partition reader with a plain dd.read_sql on a SQLite table.
+
+Run from the repository root:
+    python -m benchmarks.bench_get_table --rows 5000000
+"""
+import argparse
+import tempfile
+import time
+
+import dask.dataframe as dd
+import sqlalchemy
+
+from benchmarks import datasets
+from animal_logger.src.db.partitioned_reader import PartitionedReader
+
+
+def timed(label: str, func) -> None:
+    start = time.perf_counter()
+    n_rows = func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {elapsed:8.2f} s  {n_rows / elapsed:>12,.0f} rows/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=2_000_000)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        engine = datasets.make_engine(folder)
+        datasets.fill_animals_table(engine, args.rows)
+        uri = engine.url.render_as_string(hide_password=False)
+
+        def previous_path() -> int:
+            sql = sqlalchemy.select(sqlalchemy.text(f"* FROM {datasets.SCHEMA}.animals"))
+            return len(dd.read_sql(sql=sql, con=uri, index_col='id').compute())
+
+        def reader_to_pandas() -> int:
+            reader = PartitionedReader(engine, datasets.SCHEMA, 'animals', max_workers=args.workers)
+            return len(reader.to_pandas())
+
+        def reader_iter_partitions() -> int:
+            reader = PartitionedReader(engine, datasets.SCHEMA, 'animals', max_workers=args.workers)
+            return sum(len(partition) for partition in reader.iter_partitions())
+
+        timed("dd.read_sql(...).compute()", previous_path)
+        timed("PartitionedReader.to_pandas()", reader_to_pandas)
+        timed("PartitionedReader.iter_partitions()", reader_iter_partitions)
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
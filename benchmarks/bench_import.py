@@ -0,0 +1,58 @@
+"""Throughput and memory of the file import pipeline on a generated CSV census file.
+
+Writes _--rows_ synthetic animals (with 1% repeated ids) to a CSV file, imports it into a SQLite
+table and reports rows/s and the peak RSS, which should not grow with the size of the file.
+Run from the repository root:
+    python -m benchmarks.bench_import --rows 5000000
+"""
+import argparse
+import csv
+import tempfile
+import time
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+from benchmarks import datasets
+from animal_logger.src.db.utils_db import UtilsDB
+
+
+def write_csv(path: Path, n_rows: int, batch_size: int = 100_000) -> None:
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        for start in range(0, n_rows, batch_size):
+            data = datasets.make_animals(min(batch_size, n_rows - start), seed=start, duplicate_ratio=0.01)
+            data['id'] = [i + start for i in data['id']]
+            if start == 0:
+                writer.writerow(data)
+            writer.writerows(zip(*data.values()))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=5_000_000)
+    parser.add_argument('--chunk-size', type=int, default=50_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = Path(folder) / 'census.csv'
+        write_csv(path, args.rows)
+        print(f"{path.stat().st_size / 2**20:,.0f} MiB CSV file written")
+        engine = datasets.make_engine(folder)
+        table = datasets.animals_table()
+        table.create(engine)
+        start = time.perf_counter()
+        stats = UtilsDB(engine).import_file(path, table, chunk_size=args.chunk_size)
+        print(f"{stats.rows_loaded:,} rows loaded ({stats.duplicates:,} duplicates) in "
+              f"{time.perf_counter() - start:.1f} s, {stats.rows_per_second:,.0f} rows/s")
+        if resource is not None:
+            # ru_maxrss is reported in kilobytes on Linux
+            print(f"peak RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:,.0f} MiB")
+        engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Login latency of AuthService against a SQLite stand-in of the credentials.login_app table.
+
+Run from the repository root:
+    python -m benchmarks.bench_login --users 1000000
+"""
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import sqlalchemy
+
+from benchmarks import datasets
+from animal_logger.src.db.auth import AuthService, hash_password
+
+
+def make_engine(folder: Path, n_users: int, with_index: bool) -> sqlalchemy.Engine:
+    engine = datasets.make_engine(folder)
+    # Hashing is what we want to avoid measuring here, so all users share one hash
+    password_hash = hash_password('secret')
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE login_app (id INTEGER PRIMARY KEY, username TEXT, password TEXT)")
+        batch_size = 100_000
+        for start in range(0, n_users, batch_size):
+            conn.exec_driver_sql(
+                "INSERT INTO login_app (username, password) VALUES (?, ?)",
+                [(f"keeper_{i}", password_hash) for i in range(start, min(start + batch_size, n_users))],
+            )
+    if with_index:
+        AuthService(engine, schema=datasets.SCHEMA).ensure_index()
+    return engine
+
+
+def measure(service: AuthService, usernames: list, password: str) -> list:
+    latencies = []
+    for username in usernames:
+        start = time.perf_counter()
+        service.authenticate(username, password)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def report(label: str, latencies: list) -> None:
+    latencies = sorted(latencies)
+    p95 = latencies[int(0.95 * (len(latencies) - 1))]
+    print(f"{label:<32} median {statistics.median(latencies) * 1000:8.3f} ms   p95 {p95 * 1000:8.3f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=1_000_000)
+    parser.add_argument('--attempts', type=int, default=200)
+    args = parser.parse_args()
+
+    step = max(1, args.users // args.attempts)
+    usernames = [f"keeper_{i}" for i in range(0, args.users, step)][:args.attempts]
+    for with_index in (False, True):
+        with tempfile.TemporaryDirectory() as folder:
+            engine = make_engine(Path(folder), args.users, with_index)
+            service = AuthService(engine, schema=datasets.SCHEMA)
+            label = 'indexed' if with_index else 'no index'
+            report(f"{label}, wrong password (lookup)", measure(service, usernames, 'wrong'))
+            service.invalidate()
+            report(f"{label}, right password (+hash)", measure(service, usernames, 'secret'))
+            report(f"{label}, cached", measure(service, usernames, 'secret'))
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
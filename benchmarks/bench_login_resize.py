@@ -0,0 +1,64 @@
+"""Frame times of the login background while the window edge is dragged.
+
+Simulates a drag by requesting a new size every 16 ms, once with the previous synchronous
+open + LANCZOS resize per <Configure> event and once with the ResizePipeline.
+Needs a display. Run from the repository root:
+    python -m benchmarks.bench_login_resize --steps 120
+"""
+import argparse
+from pathlib import Path
+
+import customtkinter as ctk
+from PIL import Image, ImageTk
+
+import animal_logger
+from animal_logger.src.frames.background import BackgroundWorker, StallMonitor
+from animal_logger.src.frames.resize_pipeline import ResizePipeline
+
+IMAGE_PATH = Path(animal_logger.__file__).parent / 'opt/img/login.jpg'
+FRAME_MS = 16
+
+
+def drag_sizes(steps: int) -> list:
+    return [(800 + 5 * i, 500 + 3 * i) for i in range(steps)]
+
+
+def run(window: ctk.CTk, label: str, on_size, sizes: list) -> None:
+    monitor = StallMonitor(window, interval_ms=FRAME_MS)
+    monitor.start()
+    for i, size in enumerate(sizes):
+        window.after(i * FRAME_MS, on_size, size)
+    window.after(len(sizes) * FRAME_MS + 1000, window.quit)
+    window.mainloop()
+    stats = monitor.stop()
+    print(f"{label:<16} worst frame delay {stats['max_ms']:8.1f} ms   p95 {stats['p95_ms']:8.1f} ms   "
+          f"frames late by > 50 ms: {stats['over_threshold']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--steps', type=int, default=120)
+    args = parser.parse_args()
+
+    window = ctk.CTk()
+    label = ctk.CTkLabel(window, text="")
+    label.place(x=0, y=0, relwidth=1, relheight=1)
+    references = []
+
+    def show(photo: ImageTk.PhotoImage) -> None:
+        references[:] = [photo]
+        label.configure(image=photo)
+
+    def synchronous(size: tuple) -> None:
+        show(ImageTk.PhotoImage(Image.open(IMAGE_PATH).resize(size, Image.Resampling.LANCZOS)))
+
+    pipeline = ResizePipeline(window, BackgroundWorker.for_window(window), IMAGE_PATH,
+                              on_ready=show, convert=ImageTk.PhotoImage)
+    sizes = drag_sizes(args.steps)
+    run(window, "synchronous", synchronous, sizes)
+    run(window, "ResizePipeline", pipeline.request, sizes)
+    window.destroy()
+
+
+if __name__ == "__main__":
+    main()
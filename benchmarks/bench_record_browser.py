@@ -0,0 +1,59 @@
+"""Frame times of the record browser while scrolling through a large SQLite table.
+
+Scrolls down by three rows every 16 ms, as a mouse wheel would, and reports how late the Tk event
+loop ran, the number of row widgets and the most rows held in memory at once.
+Needs a display. Run from the repository root:
+    python -m benchmarks.bench_record_browser --rows 1000000 --steps 2000
+"""
+import argparse
+import tempfile
+
+import customtkinter as ctk
+
+from benchmarks import datasets
+from animal_logger.src.frames.background import StallMonitor
+from animal_logger.src.frames.record_browser import RecordBrowser
+
+FRAME_MS = 16
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--steps', type=int, default=2_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        engine = datasets.make_engine(folder)
+        table = datasets.fill_animals_table(engine, args.rows)
+        window = ctk.CTk()
+        main_frame = ctk.CTkFrame(window)
+        main_frame.pack(fill='both', expand=True)
+        browser = RecordBrowser(window, main_frame, datasets.SCHEMA, 'animals', [col.name for col in table.columns],
+                                engine=engine)
+        browser.initialize_ui()
+        max_rows = []
+
+        def step() -> None:
+            browser.scroll(3)
+            max_rows.append(len(browser.rows))
+
+        monitor = StallMonitor(window, interval_ms=FRAME_MS)
+        # Give the first page time to arrive before scrolling
+        window.after(500, monitor.start)
+        for i in range(args.steps):
+            window.after(500 + i * FRAME_MS, step)
+        window.after(500 + args.steps * FRAME_MS + 500, window.quit)
+        window.mainloop()
+        stats = monitor.stop()
+        print(f"Scrolled to record {browser.offset + browser.top + 1:,} of {args.rows:,}")
+        print(f"worst frame delay {stats['max_ms']:.1f} ms   p95 {stats['p95_ms']:.1f} ms   "
+              f"frames late by > 50 ms: {stats['over_threshold']}")
+        print(f"row widgets: {sum(len(cells) for cells in browser.cells)}   "
+              f"most rows in memory: {max(max_rows, default=0)}")
+        window.destroy()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Latency of the search bar's queries on a large animals table.
+
+Indexes _--rows_ synthetic animals in memory, and with SQLite FTS5 unless --skip-fts is given,
+then times typical queries as typed: prefixes, several words, numbers and fragments inside words.
+Exits with status 1 when the p95 latency of a backend exceeds the budget. Run from the repository root:
+    python -m benchmarks.bench_search --rows 1000000 --budget-ms 50
+"""
+import argparse
+import sys
+import tempfile
+import time
+
+from benchmarks import datasets
+from benchmarks.suite import percentile
+from animal_logger.src.db.bulk_load import iter_row_batches
+from animal_logger.src.db.search import MemorySearchIndex, SqliteFtsSearch
+
+QUERIES = ['le', 'leo', 'panthera l', 'panthera leo', 'octo', 'octopus vulg', 'arct ursus', 'an', 'animal',
+           'animal_4', 'animal_4242', 'animal 99999', '12345', 'mammal carn', 'bird sphen', 'zzz', 'ther', 'imal_77']
+
+
+def time_queries(backend, repeat: int, limit: int) -> list:
+    latencies = []
+    for _ in range(repeat):
+        for query in QUERIES:
+            start = time.perf_counter()
+            backend.search(query, limit)
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def report(name: str, latencies: list, budget_ms: float) -> bool:
+    p50, p95, worst = (percentile(latencies, q) * 1000 for q in (0.5, 0.95, 1.0))
+    within = p95 <= budget_ms
+    print(f"{name:<8} p50 {p50:8.2f} ms   p95 {p95:8.2f} ms   max {worst:8.2f} ms   "
+          f"{'OK' if within else f'OVER BUDGET ({budget_ms:.0f} ms)'}")
+    return within
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--budget-ms', type=float, default=50.0)
+    parser.add_argument('--skip-fts', action='store_true', help="Only benchmark the in-memory index.")
+    args = parser.parse_args()
+
+    index = MemorySearchIndex()
+    start = time.perf_counter()
+    for batch_start in range(0, args.rows, 100_000):
+        data = datasets.make_animals(min(100_000, args.rows - batch_start), seed=batch_start)
+        data['id'] = [i + batch_start for i in data['id']]
+        for columns, rows in iter_row_batches(data):
+            index.add_rows(columns, rows)
+    print(f"memory index of {len(index):,} animals built in {time.perf_counter() - start:.1f} s")
+    within_budget = report('memory', time_queries(index, args.repeat, args.limit), args.budget_ms)
+
+    if not args.skip_fts:
+        with tempfile.TemporaryDirectory() as folder:
+            engine = datasets.make_engine(folder)
+            datasets.fill_animals_table(engine, args.rows)
+            start = time.perf_counter()
+            fts = SqliteFtsSearch(engine, datasets.SCHEMA, 'animals')
+            fts.ensure_index()
+            print(f"FTS5 index built in {time.perf_counter() - start:.1f} s")
+            within_budget &= report('fts5', time_queries(fts, args.repeat, args.limit), args.budget_ms)
+            engine.dispose()
+
+    if not within_budget:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
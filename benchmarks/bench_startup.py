@@ -0,0 +1,121 @@
+"""Startup profile of the application: import time of the entry point and time to the first frame.
+
+Both are measured in fresh interpreters, so nothing is cached in sys.modules:
+    - `python -X importtime` on animal_logger.src.main, reporting the slowest imports and failing
+      if the data stack (pandas, Dask, SQLAlchemy, ...) is loaded before the first query.
+    - time from spawning the process until the login page has been drawn (needs a display).
+Exits with status 1 when a budget is exceeded. Run from the repository root:
+    python -m benchmarks.bench_startup --repeat 5 --import-budget-ms 800 --frame-budget-ms 1500
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+HEAVY_MODULES = ('pandas', 'dask', 'numpy', 'pyarrow', 'sqlalchemy', 'psycopg2')
+IMPORTTIME_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+FIRST_FRAME_SCRIPT = """
+import customtkinter as ctk
+from config.config import Config
+from animal_logger.src.frames.login_page import LoginPage
+
+Config()
+window = ctk.CTk()
+def first_frame():
+    print('FIRST_FRAME', flush=True)
+    window.quit()
+# Runs once the initial redraws queued by initialize_ui are done
+window.after(0, lambda: window.after_idle(first_frame))
+LoginPage(window).initialize_ui()
+window.destroy()
+"""
+
+
+def child_env(logs_path: str) -> dict:
+    env = dict(os.environ, LOGS_PATH=logs_path, PYTHONPATH=str(REPO_ROOT))
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    return env
+
+
+def import_profile(env: dict) -> Tuple[float, List[Tuple[str, float, float]]]:
+    """Total import time in ms and (module, self ms, cumulative ms) of every import."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import animal_logger.src.main'],
+                            cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True)
+    modules, total = [], 0.0
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        modules.append((name, int(self_us) / 1000, int(cumulative_us) / 1000))
+        if len(indent) == 1:  # Top-level import, its cumulative time covers its children
+            total += int(cumulative_us) / 1000
+    return total, modules
+
+
+def time_to_first_frame(env: dict) -> float:
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, '-c', FIRST_FRAME_SCRIPT], cwd=REPO_ROOT, env=env,
+                               stdout=subprocess.PIPE, text=True)
+    for line in process.stdout:
+        if line.strip() == 'FIRST_FRAME':
+            elapsed = (time.perf_counter() - start) * 1000
+            break
+    else:
+        process.wait()
+        raise RuntimeError(f"The login page was never drawn (exit status {process.returncode}).")
+    process.stdout.close()
+    process.wait()
+    return elapsed
+
+
+def heavy_imports(modules: List[Tuple[str, float, float]]) -> Dict[str, float]:
+    return {name: cumulative for name, _, cumulative in modules if name in HEAVY_MODULES}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15, help="Number of slowest imports to list.")
+    parser.add_argument('--import-budget-ms', type=float, default=800)
+    parser.add_argument('--frame-budget-ms', type=float, default=1500)
+    parser.add_argument('--skip-frame', action='store_true', help="Only profile imports, e.g. without a display.")
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory() as logs_path:
+        env = child_env(logs_path)
+        # The first run also compiles the bytecode, it is not counted
+        import_profile(env)
+        runs = [import_profile(env) for _ in range(args.repeat)]
+        import_ms = statistics.median(total for total, _ in runs)
+        modules = runs[-1][1]
+        print(f"Import of animal_logger.src.main: median {import_ms:.1f} ms over {args.repeat} runs")
+        print(f"{'module':<50}{'self ms':>10}{'cumulative ms':>16}")
+        for name, self_ms, cumulative_ms in sorted(modules, key=lambda m: m[2], reverse=True)[:args.top]:
+            print(f"{name:<50}{self_ms:>10.1f}{cumulative_ms:>16.1f}")
+        if import_ms > args.import_budget_ms:
+            failures.append(f"import time {import_ms:.1f} ms > budget {args.import_budget_ms:.0f} ms")
+        for name, cumulative_ms in heavy_imports(modules).items():
+            failures.append(f"'{name}' is imported at startup ({cumulative_ms:.1f} ms)")
+
+        if not args.skip_frame:
+            frame_ms = statistics.median(time_to_first_frame(env) for _ in range(args.repeat))
+            print(f"Time to first frame: median {frame_ms:.1f} ms over {args.repeat} runs")
+            if frame_ms > args.frame_budget_ms:
+                failures.append(f"time to first frame {frame_ms:.1f} ms > budget {args.frame_budget_ms:.0f} ms")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
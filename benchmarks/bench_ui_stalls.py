@@ -0,0 +1,44 @@
+"""Event-loop stall times of the Tk window while a slow DB call runs inline or in the BackgroundWorker.
+
+Needs a display. Run from the repository root:
+    python -m benchmarks.bench_ui_stalls --call-seconds 0.5
+"""
+import argparse
+import time
+
+import customtkinter as ctk
+
+from animal_logger.src.frames.background import BackgroundWorker, StallMonitor
+
+
+def run(window: ctk.CTk, label: str, start_call, calls: int, spacing_ms: int) -> None:
+    monitor = StallMonitor(window)
+    monitor.start()
+    for i in range(calls):
+        window.after(i * spacing_ms, start_call)
+    window.after(calls * spacing_ms + 1000, window.quit)
+    window.mainloop()
+    stats = monitor.stop()
+    print(f"{label:<20} ticks {stats['ticks']:6}  max {stats['max_ms']:8.1f} ms  "
+          f"p95 {stats['p95_ms']:8.1f} ms  stalls > 50 ms: {stats['over_threshold']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--call-seconds', type=float, default=0.5, help='Duration of the simulated DB call.')
+    parser.add_argument('--calls', type=int, default=5)
+    args = parser.parse_args()
+
+    def slow_call() -> None:
+        time.sleep(args.call_seconds)
+
+    window = ctk.CTk()
+    worker = BackgroundWorker.for_window(window)
+    spacing_ms = int(args.call_seconds * 1000) + 100
+    run(window, "inline", slow_call, args.calls, spacing_ms)
+    run(window, "BackgroundWorker", lambda: worker.submit(slow_call), args.calls, spacing_ms)
+    window.destroy()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Synthetic animal data and SQLite stand-ins of the production database for the benchmarks.
+
+SQLite has no schemas: tables live in its 'main' database, which can be addressed as main.<table>
+just like a PostgreSQL schema.
+"""
+from pathlib import Path
+
+import numpy as np
+import sqlalchemy
+
+SCHEMA = 'main'
+
+TAXONOMY = [
+    # (class_, order, family, genus, species)
+    ('mammal', 'carnivora', 'felidae', 'panthera', 'leo'),
+    ('mammal', 'carnivora', 'ursidae', 'ursus', 'arctos'),
+    ('mammal', 'primates', 'hominidae', 'pongo', 'abelii'),
+    ('bird', 'sphenisciformes', 'spheniscidae', 'spheniscus', 'humboldti'),
+    ('reptile', 'squamata', 'varanidae', 'varanus', 'komodoensis'),
+    ('amphibian', 'anura', 'dendrobatidae', 'dendrobates', 'tinctorius'),
+    ('fish', 'perciformes', 'pomacentridae', 'amphiprion', 'ocellaris'),
+    ('invertebrate', 'octopoda', 'octopodidae', 'octopus', 'vulgaris'),
+]
+
+
+def make_animals(n_rows: int, seed: int = 0, duplicate_ratio: float = 0.0) -> dict:
+    """Columnar dict of _n_rows_ animals, with a share of repeated ids if requested."""
+    rng = np.random.default_rng(seed)
+    ids = np.arange(1, n_rows + 1)
+    n_duplicates = int(n_rows * duplicate_ratio)
+    if n_duplicates:
+        ids[rng.choice(n_rows, n_duplicates, replace=False)] = rng.integers(1, n_rows + 1, n_duplicates)
+    taxa = rng.integers(0, len(TAXONOMY), n_rows)
+    columns = list(zip(*TAXONOMY))
+    return {
+        'id': ids.tolist(),
+        'name': [f"animal_{i}" for i in range(n_rows)],
+        'age': np.round(rng.uniform(0, 40, n_rows), 1).tolist(),
+        'sex': rng.choice(['male', 'female'], n_rows).tolist(),
+        'class_': [columns[0][t] for t in taxa],
+        'order': [columns[1][t] for t in taxa],
+        'family': [columns[2][t] for t in taxa],
+        'genus': [columns[3][t] for t in taxa],
+        'species': [columns[4][t] for t in taxa],
+    }
+
+
+def animals_table(table_name: str = 'animals') -> sqlalchemy.Table:
+    return sqlalchemy.Table(
+        table_name,
+        sqlalchemy.MetaData(),
+        sqlalchemy.Column('id', sqlalchemy.Integer, primary_key=True),
+        sqlalchemy.Column('name', sqlalchemy.String),
+        sqlalchemy.Column('age', sqlalchemy.Float),
+        sqlalchemy.Column('sex', sqlalchemy.String),
+        sqlalchemy.Column('class_', sqlalchemy.String),
+        sqlalchemy.Column('order', sqlalchemy.String),
+        sqlalchemy.Column('family', sqlalchemy.String),
+        sqlalchemy.Column('genus', sqlalchemy.String),
+        sqlalchemy.Column('species', sqlalchemy.String),
+        schema=SCHEMA,
+    )
+
+
+def make_engine(folder: Path) -> sqlalchemy.Engine:
+    return sqlalchemy.create_engine(f"sqlite:///{Path(folder) / 'animals.db'}")
+
+
+def fill_animals_table(engine: sqlalchemy.Engine, n_rows: int, batch_size: int = 100_000) -> sqlalchemy.Table:
+    """Create the animals table and fill it with _n_rows_ synthetic animals, in bounded memory."""
+    table = animals_table()
+    table.create(engine)
+    with engine.begin() as conn:
+        for start in range(0, n_rows, batch_size):
+            data = make_animals(min(batch_size, n_rows - start), seed=start)
+            data['id'] = [i + start for i in data['id']]
+            conn.execute(table.insert(), [dict(zip(data, row)) for row in zip(*data.values())])
+    return table
@@ -0,0 +1,289 @@
+"""Benchmark suite of the data-ingest and query paths of UtilsDB on a file-backed SQLite database.
+
+Every case runs in its own interpreter, so that its peak RSS is its own, and records its
+throughput, latency percentiles and peak RSS. Results are written as JSON and, given a baseline,
+compared with it: the run fails when a case is slower, or uses more memory, by more than the threshold.
+
+Run from the repository root:
+    python -m benchmarks.suite --sizes 10k,1m --save-baseline benchmarks/results/baseline.json
+    python -m benchmarks.suite --sizes 10k,1m --baseline benchmarks/results/baseline.json --threshold 0.2
+The 10m size needs several GB of memory and about an hour.
+"""
+import argparse
+import importlib
+import json
+import multiprocessing
+import platform
+import queue as queue_module
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+from benchmarks import datasets
+
+SIZES = {'10k': 10_000, '1m': 1_000_000, '10m': 10_000_000}
+RESULTS_DIR = Path(__file__).parent / 'results'
+BATCH_SIZE = 10_000
+LOOKUPS = 50
+IDS_PER_LOOKUP = 100
+# Imported lazily by the code under test, so the first timed run would pay for them
+WARM_IMPORTS = ('numpy', 'pandas', 'dask.dataframe', 'pyarrow', 'animal_logger.src.db.utils_db')
+
+CaseResult = Tuple[int, float, List[float]]  # rows handled per run, seconds per run, latencies in seconds
+
+
+def case_remove_duplicate_ids(engine, n_rows: int, run: int) -> CaseResult:
+    from animal_logger.src.db.utils_db import UtilsDB
+    data = datasets.make_animals(n_rows, seed=run, duplicate_ratio=0.01)
+    start = time.perf_counter()
+    UtilsDB(engine).remove_duplicate_ids(data)
+    elapsed = time.perf_counter() - start
+    return n_rows, elapsed, [elapsed]
+
+
+def case_iter_row_batches(engine, n_rows: int, run: int) -> CaseResult:
+    from animal_logger.src.db.bulk_load import iter_row_batches
+    data = datasets.make_animals(n_rows, seed=run)
+    latencies = []
+    start = last = time.perf_counter()
+    for _ in iter_row_batches(data, BATCH_SIZE):
+        now = time.perf_counter()
+        latencies.append(now - last)
+        last = now
+    return n_rows, time.perf_counter() - start, latencies
+
+
+def case_insert_dict_in_db(engine, n_rows: int, run: int) -> CaseResult:
+    from animal_logger.src.db.utils_db import UtilsDB
+    table = datasets.animals_table(f'animals_insert_{run}')
+    table.create(engine)
+    data = datasets.make_animals(n_rows, seed=run)
+    start = time.perf_counter()
+    metrics = UtilsDB(engine).insert_dict_in_db(data, table, batch_size=BATCH_SIZE)
+    elapsed = time.perf_counter() - start
+    table.drop(engine)
+    return metrics.rows_written, elapsed, metrics.latencies
+
+
+def case_get_table(engine, n_rows: int, run: int) -> CaseResult:
+    from animal_logger.src.db.utils_db import UtilsDB
+    start = time.perf_counter()
+    df, message = UtilsDB.get_table(datasets.SCHEMA, 'animals', engine, as_df=True)
+    elapsed = time.perf_counter() - start
+    _check(message)
+    return len(df), elapsed, [elapsed]
+
+
+def case_get_table_filtered(engine, n_rows: int, run: int) -> CaseResult:
+    from animal_logger.src.db.utils_db import UtilsDB
+    start = time.perf_counter()
+    df, message = UtilsDB.get_table(datasets.SCHEMA, 'animals', engine, as_df=True,
+                                    columns=['name', 'age'], filters={'class_': 'mammal', 'age': ('>=', 20)})
+    elapsed = time.perf_counter() - start
+    _check(message)
+    return len(df), elapsed, [elapsed]
+
+
+def case_filter_table(engine, n_rows: int, run: int) -> CaseResult:
+    from animal_logger.src.db.utils_db import UtilsDB
+    utils = UtilsDB(engine)
+    rng = random.Random(run)
+    rows, latencies = 0, []
+    start = time.perf_counter()
+    for _ in range(LOOKUPS):
+        ids = [rng.randint(1, n_rows) for _ in range(IDS_PER_LOOKUP)]
+        lookup_start = time.perf_counter()
+        df, message = utils.filter_table(datasets.SCHEMA, 'animals', engine, 'id', ids, as_df=True)
+        latencies.append(time.perf_counter() - lookup_start)
+        _check(message)
+        rows += len(df)
+    return rows, time.perf_counter() - start, latencies
+
+
+CASES: Dict[str, Callable[..., CaseResult]] = {
+    'remove_duplicate_ids': case_remove_duplicate_ids,
+    'iter_row_batches': case_iter_row_batches,
+    'insert_dict_in_db': case_insert_dict_in_db,
+    'get_table': case_get_table,
+    'get_table_filtered': case_get_table_filtered,
+    'filter_table': case_filter_table,
+}
+
+
+def _check(message: Optional[str]) -> None:
+    if message is not None:
+        raise RuntimeError(message)
+
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+def warm_up(engine) -> None:
+    """Pay the one-off costs of the process before timing: lazy imports and the first connection."""
+    for module in WARM_IMPORTS:
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            pass
+    with engine.connect() as conn:
+        conn.exec_driver_sql('SELECT 1')
+
+
+def run_case(case: str, n_rows: int, db_path: str, repeat: int, queue) -> None:
+    """Child process body: run _case_ _repeat_ times and send its figures back."""
+    import sqlalchemy
+    engine = sqlalchemy.create_engine(f"sqlite:///{db_path}")
+    warm_up(engine)
+    rows, seconds, latencies = [], [], []
+    for run in range(repeat):
+        run_rows, run_seconds, run_latencies = CASES[case](engine, n_rows, run)
+        rows.append(run_rows)
+        seconds.append(run_seconds)
+        latencies.extend(run_latencies)
+    engine.dispose()
+    median_seconds = statistics.median(seconds)
+    queue.put({
+        'case': case,
+        'rows': n_rows,
+        'rows_per_run': statistics.median(rows),
+        'seconds': median_seconds,
+        'throughput_rows_s': statistics.median(rows) / median_seconds if median_seconds else 0.0,
+        'latency_ms': {name: percentile(latencies, q) * 1000
+                       for name, q in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99), ('max', 1.0))},
+        # ru_maxrss is reported in kilobytes on Linux
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 if resource else None,
+    })
+
+
+def run_isolated(case: str, n_rows: int, db_path: Path, repeat: int, timeout: Optional[float] = None) -> dict:
+    """Run _case_ in a child process and return its figures.
+
+    Raises:
+        RuntimeError: The child exited without sending its figures, e.g. it crashed, or ran past _timeout_ seconds.
+    """
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=run_case, args=(case, n_rows, str(db_path), repeat, queue))
+    process.start()
+    deadline = time.monotonic() + timeout if timeout else None
+    try:
+        while True:
+            try:
+                return queue.get(timeout=1)
+            except queue_module.Empty:
+                pass
+            if not process.is_alive():
+                # The figures may have been queued right before the exit
+                try:
+                    return queue.get(timeout=1)
+                except queue_module.Empty:
+                    raise RuntimeError(f"case '{case}' exited with code {process.exitcode} "
+                                       f"without results") from None
+            if deadline is not None and time.monotonic() > deadline:
+                process.terminate()
+                raise RuntimeError(f"case '{case}' did not finish within {timeout:.0f} s")
+    finally:
+        process.join()
+
+
+def compare(results: List[dict], baseline: List[dict], threshold: float) -> List[str]:
+    """Regressions of _results_ against _baseline_, e.g. threshold 0.2 tolerates 20% slower runs."""
+    previous = {(result['case'], result['rows']): result for result in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get((result['case'], result['rows']))
+        if before is None:
+            continue
+        label = f"{result['case']} @ {result['rows']:,} rows"
+        if result['throughput_rows_s'] < before['throughput_rows_s'] * (1 - threshold):
+            regressions.append(f"{label}: throughput {result['throughput_rows_s']:,.0f} rows/s "
+                               f"vs {before['throughput_rows_s']:,.0f} rows/s")
+        if result['latency_ms']['p95'] > before['latency_ms']['p95'] * (1 + threshold):
+            regressions.append(f"{label}: p95 latency {result['latency_ms']['p95']:.1f} ms "
+                               f"vs {before['latency_ms']['p95']:.1f} ms")
+        if result['peak_rss_mb'] and before['peak_rss_mb'] and \
+                result['peak_rss_mb'] > before['peak_rss_mb'] * (1 + threshold):
+            regressions.append(f"{label}: peak RSS {result['peak_rss_mb']:.0f} MB vs {before['peak_rss_mb']:.0f} MB")
+    return regressions
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=Path(__file__).parent).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {'python': platform.python_version(), 'platform': platform.platform(),
+            'cpus': multiprocessing.cpu_count(), 'commit': commit}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='10k,1m', help=f"Comma-separated sizes among {', '.join(SIZES)}.")
+    parser.add_argument('--cases', default=','.join(CASES), help="Comma-separated cases to run.")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', type=Path, default=None,
+                        help="Results file. Defaults to benchmarks/results/<timestamp>.json.")
+    parser.add_argument('--baseline', type=Path, default=None, help="Results file to compare with.")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Tolerated regression, 0.2 = 20%%.")
+    parser.add_argument('--save-baseline', type=Path, default=None, help="Also write the results there.")
+    parser.add_argument('--timeout', type=float, default=None, help="Seconds allowed per case. Defaults to no limit.")
+    args = parser.parse_args()
+
+    cases = args.cases.split(',')
+    for case in cases:
+        if case not in CASES:
+            parser.error(f"Unknown case '{case}', choose among {', '.join(CASES)}.")
+    results, failures = [], []
+    for size in args.sizes.split(','):
+        n_rows = SIZES[size.lower()]
+        with tempfile.TemporaryDirectory() as folder:
+            engine = datasets.make_engine(folder)
+            datasets.fill_animals_table(engine, n_rows)
+            engine.dispose()
+            for case in cases:
+                try:
+                    result = run_isolated(case, n_rows, Path(folder) / 'animals.db', args.repeat, args.timeout)
+                except RuntimeError as e:
+                    failures.append(f"{e} ({n_rows:,} rows)")
+                    print(f"{case:<22}{n_rows:>12,} rows  FAILED: {e}")
+                    continue
+                results.append(result)
+                print(f"{case:<22}{n_rows:>12,} rows  {result['throughput_rows_s']:>14,.0f} rows/s  "
+                      f"p50 {result['latency_ms']['p50']:>9.1f} ms  p95 {result['latency_ms']['p95']:>9.1f} ms  "
+                      f"peak RSS {result['peak_rss_mb'] or 0:>8.0f} MB")
+
+    report = {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'environment': environment(), 'results': results}
+    output = args.output or RESULTS_DIR / f"{time.strftime('%Y%m%d_%H%M%S')}.json"
+    for path in filter(None, (output, args.save_baseline)):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(report, indent=2))
+    print(f"Results written to '{output}'.")
+    for failure in failures:
+        print(f"FAILED: {failure}")
+
+    if args.baseline is not None:
+        regressions = compare(results, json.loads(args.baseline.read_text())['results'], args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regression beyond {args.threshold:.0%} against '{args.baseline}'.")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
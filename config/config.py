@@ -3,7 +3,6 @@ from pathlib import Path
 from typing import Union
 
 import yaml
-from sqlalchemy import create_engine
 
 from config.log_config import LOGGER
 
@@ -11,33 +10,92 @@ class Config:
 
     DEFAULT_DB_CONFIG_FILE = Path(__file__).parent.parent / 'config/db_config.yaml'
     DEFAULT_APP_CONFIG_FILE = Path(__file__).parent.parent / 'config/app_config.yaml'
+    POOL_SETTINGS = ('pool_size', 'max_overflow', 'pool_timeout', 'pool_pre_ping')
     _DB_URL = None
     _CONFIG_DICT = {}
-    
-    def __init__(self, 
+    _CONFIG_FILES = {} # path -> modification time of the loaded version
+    _STATE = None # Inputs the derived values were computed from
+    _CREDENTIALS = None # (username, password) of the logged-in user, kept out of the environment
+
+    def __init__(self,
                  db_config_path: Union[str, Path] = DEFAULT_DB_CONFIG_FILE,
                  app_config_path: Union[str, Path] = DEFAULT_APP_CONFIG_FILE) -> None:
         self._load_config_file(db_config_path)
         self._load_config_file(app_config_path)
-    
+
     @staticmethod
     def _load_config_file(config_file: Union[str, Path]) -> None:
+        config_file = Path(config_file)
+        modified = config_file.stat().st_mtime_ns
         with open(config_file, 'rb') as f:
-                config_file = yaml.safe_load(f)
-        Config._CONFIG_DICT.update(config_file)
-    
+                config_data = yaml.safe_load(f)
+        Config._CONFIG_DICT.update(config_data)
+        Config._CONFIG_FILES[config_file] = modified
+
+    @staticmethod
+    def _reload_changed_files() -> None:
+        for config_file, modified in list(Config._CONFIG_FILES.items()):
+            if config_file.stat().st_mtime_ns != modified:
+                LOGGER.info(f"Config file '{config_file}' changed on disk, reloading it.")
+                Config._load_config_file(config_file)
+
     @staticmethod
     def get_info() -> dict:
-        if Config._CONFIG_DICT:
-                Config._CONFIG_DICT['user'] = os.getenv('USERNAME')
-                Config._CONFIG_DICT['password'] = os.getenv('PASSWORD')
-                Config._CONFIG_DICT['db_url'] = (
-                                                    f"postgresql://{os.getenv('USERNAME')}:"
-                                                    f"{os.getenv('PASSWORD')}@"
-                                                    f"{Config._CONFIG_DICT['host']}/"
-                                                    f"{Config._CONFIG_DICT['database']}"
-                                                )
-                Config._CONFIG_DICT['db_engine'] = create_engine(Config._CONFIG_DICT['db_url'])
-        else:
+        """Return the configuration, with the DB URL derived from the current credentials.
+
+        The credentials are those given to set_credentials, else the USERNAME/PASSWORD environment
+        variables, e.g. for scripts. The derived values are only recomputed when a config file or the
+        credentials change. No engine is built here, see get_engine.
+        """
+        if not Config._CONFIG_DICT:
             raise Exception("Attempting to fetch config info, but Config constructor has not been called yet.")
+        Config._reload_changed_files()
+        username, password = Config._CREDENTIALS or (os.getenv('USERNAME'), os.getenv('PASSWORD'))
+        state = (username,
+                 password,
+                 tuple(Config._CONFIG_FILES.values()))
+        if state != Config._STATE:
+            previous_url = Config._DB_URL
+            Config._CONFIG_DICT['user'] = username
+            Config._CONFIG_DICT['password'] = password
+            Config._DB_URL = (
+                                f"postgresql://{username}:"
+                                f"{password}@"
+                                f"{Config._CONFIG_DICT['host']}/"
+                                f"{Config._CONFIG_DICT['database']}"
+                            )
+            Config._CONFIG_DICT['db_url'] = Config._DB_URL
+            if Config._CONFIG_DICT.pop('db_engine', None) is not None and previous_url:
+                from animal_logger.src.db.connection import dispose_engines
+                dispose_engines(previous_url)
+            Config._STATE = state
         return Config._CONFIG_DICT
+
+    @staticmethod
+    def get_engine():
+        """Return the engine of the current credentials, creating it on first use.
+
+        SQLAlchemy and the DB driver are imported here rather than at startup. The engine comes from
+        the process-wide registry, and the engine of the previous credentials is disposed when they change.
+        """
+        config = Config.get_info()
+        if config.get('db_engine') is None:
+            from animal_logger.src.db.connection import get_engine
+            pool_settings = {key: config[key] for key in Config.POOL_SETTINGS if key in config}
+            config['db_engine'] = get_engine(Config._DB_URL, **pool_settings)
+        return config['db_engine']
+
+    @staticmethod
+    def set_credentials(username: str, password: str) -> None:
+        """Use the credentials typed at login. They stay in this process: child processes do not inherit them."""
+        Config._CREDENTIALS = (username, password)
+
+    @staticmethod
+    def logout() -> None:
+        """Close every pooled connection, the engine is rebuilt on the next get_engine call."""
+        if Config._CONFIG_DICT.pop('db_engine', None) is not None:
+            from animal_logger.src.db.connection import dispose_engines
+            dispose_engines()
+        Config._DB_URL = None
+        Config._STATE = None
+        Config._CREDENTIALS = None
@@ -1,34 +1,241 @@
+import atexit
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import re
+import sys
+import threading
+import time
 from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+# Settings, all optional:
+#   LOGS_PATH        folder of the log files. When unset, or not writable, only the console is used.
+#   LOG_FORMAT       'text' (default) or 'json', one object per line.
+#   LOG_DEBUG_LIMIT  debug records kept per second and call site, the rest is summarised. 0 disables the cap.
+LOG_PATH = os.environ.get('LOGS_PATH')
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text').lower()
+LOG_DEBUG_LIMIT = int(os.environ.get('LOG_DEBUG_LIMIT', 20))
+LOG_MAX_BYTES = 10 * 2**20
+LOG_BACKUP_COUNT = 14
+LOG_BATCH_SIZE = 512
+# Suffix of rotated files: time of the rollover, so size rollovers within a day do not collide
+ROTATED_SUFFIX = '%Y-%m-%d_%H-%M-%S'
+_ROTATED_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2}(\.\d+)?$')
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+# Attributes every LogRecord has, anything else was passed through 'extra'
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'taskName'}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with the fields passed through 'extra' kept as keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'message': record.getMessage(),
+            'module': record.module,
+            'line': record.lineno,
+            'thread': record.threadName,
+        }
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+        data.update({key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES})
+        return json.dumps(data, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """Keep at most _limit_ records per _interval_ seconds from each call site at or below _max_level_.
+
+    Meant for debug logging inside loops over batches or rows. The first record let through after
+    a suppression says how many records of that call site were dropped meanwhile.
+    """
+
+    def __init__(self, limit: int, interval: float = 1.0, max_level: int = logging.DEBUG) -> None:
+        super().__init__()
+        self.limit = limit
+        self.interval = interval
+        self.max_level = max_level
+        self._sites: Dict[Tuple[str, int], List[float]] = {}  # site -> [window start, kept, suppressed]
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.max_level or self.limit <= 0:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            site = self._sites.setdefault((record.pathname, record.lineno), [now, 0, 0])
+            if now - site[0] >= self.interval:
+                site[0], site[1] = now, 0
+            if site[1] >= self.limit:
+                site[2] += 1
+                return False
+            site[1] += 1
+            suppressed, site[2] = site[2], 0
+        if suppressed:
+            record.msg = f"{record.msg} ({suppressed} similar messages suppressed)"
+        return True
+
+
+class _BatchFlushMixin:
+    """Handler whose stream is flushed by the listener once per batch, instead of after every record."""
+
+    def flush(self) -> None:
+        pass
+
+    def flush_batch(self) -> None:
+        stream = getattr(self, 'stream', None)
+        if stream is None or getattr(stream, 'closed', False):
+            return  # Not opened yet, or closed under us at exit, e.g. a captured sys.stderr
+        super().flush()
+
+
+class BatchedStreamHandler(_BatchFlushMixin, logging.StreamHandler):
+    pass
+
+
+class RotatingLogFileHandler(_BatchFlushMixin, logging.handlers.TimedRotatingFileHandler):
+    """File rotated every midnight and whenever it grows beyond _max_bytes_.
+
+    Rotated files are named '<file>.<ROTATED_SUFFIX>' after the time of the rollover, and those of
+    the last _backup_count_ days are kept, however many size rollovers each day had. Naming and
+    retention do not rely on the stdlib's, which changed across Python versions.
+    """
+
+    def __init__(self, filename: str, max_bytes: int = LOG_MAX_BYTES, backup_count: int = LOG_BACKUP_COUNT) -> None:
+        super().__init__(filename, when='midnight', backupCount=backup_count, encoding='utf-8', delay=True)
+        self.max_bytes = max_bytes
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if super().shouldRollover(record):
+            return True
+        if self.max_bytes <= 0 or self.stream is None:
+            return False
+        return self.stream.tell() + len(self.format(record)) + 1 >= self.max_bytes
+
+    def doRollover(self) -> None:
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        name = f"{self.baseFilename}.{time.strftime(ROTATED_SUFFIX)}"
+        rotated_name, counter = name, 1
+        while os.path.exists(rotated_name):  # Several rollovers within a second
+            rotated_name, counter = f"{name}.{counter}", counter + 1
+        if os.path.exists(self.baseFilename):
+            self.rotate(self.baseFilename, rotated_name)
+        for path in self.getFilesToDelete():
+            os.remove(path)
+        if not self.delay:
+            self.stream = self._open()
+        self.rolloverAt = self._next_rollover()
+
+    def getFilesToDelete(self) -> List[str]:
+        """Rotated files of this log older than the last _backupCount_ days with rotated files."""
+        if self.backupCount <= 0:
+            return []
+        folder, base = os.path.split(self.baseFilename)
+        prefix = base + '.'
+        rotated = [name for name in os.listdir(folder)
+                   if name.startswith(prefix) and _ROTATED_PATTERN.match(name[len(prefix):])]
+        days = sorted({name[len(prefix): len(prefix) + 10] for name in rotated})
+        kept = set(days[-self.backupCount:])
+        return [os.path.join(folder, name) for name in rotated if name[len(prefix): len(prefix) + 10] not in kept]
+
+    def _next_rollover(self) -> int:
+        now = int(time.time())
+        rollover_at = self.computeRollover(now)
+        while rollover_at <= now:
+            rollover_at += self.interval
+        if not self.utc:
+            # Midnight moves by an hour when the daylight saving time changes in between
+            dst_now, dst_then = time.localtime(now).tm_isdst, time.localtime(rollover_at).tm_isdst
+            if dst_now != dst_then:
+                rollover_at += 3600 if dst_now else -3600
+        return rollover_at
+
+
+class BatchingQueueListener(logging.handlers.QueueListener):
+    """QueueListener writing everything queued so far before flushing the handlers once.
+
+    Records are written as soon as the thread wakes up, so nothing waits for a batch to fill up,
+    but a burst of records costs one flush per _batch_size_ records instead of one per record.
+    """
+
+    def __init__(self, log_queue, *handlers: logging.Handler, batch_size: int = LOG_BATCH_SIZE) -> None:
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.batch_size = batch_size
+
+    def _monitor(self) -> None:
+        stop = False
+        while not stop:
+            batch = [self.dequeue(True)]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.dequeue(False))
+                except queue.Empty:
+                    break
+            for record in batch:
+                if record is self._sentinel:
+                    stop = True
+                    break
+                self.handle(record)
+            for handler in self.handlers:
+                try:
+                    handler.flush_batch()
+                except Exception as e:
+                    print(f"Log handler {handler} failed to flush: {e}", file=sys.stderr)
+
+
+def _file_handlers(log_path: Optional[str]) -> List[logging.Handler]:
+    if not log_path:
+        return []
+    try:
+        os.makedirs(log_path, exist_ok=True)
+        if not os.access(log_path, os.W_OK):
+            raise PermissionError(f"'{log_path}' is not writable")
+    except OSError as e:
+        print(f"Logging to the console only, the logs folder cannot be used: {e}", file=sys.stderr)
+        return []
+    current_datetime = datetime.now().strftime("%Y_%m_%d__%H_%M_%S")
+    file_handler_info = RotatingLogFileHandler(os.path.join(log_path, f'animal_INFO_{current_datetime}.txt'))
+    file_handler_debug = RotatingLogFileHandler(os.path.join(log_path, f'animal_DEBUG_{current_datetime}.txt'))
+    file_handler_info.setLevel(logging.INFO)
+    file_handler_debug.setLevel(logging.DEBUG)
+    return [file_handler_info, file_handler_debug]
+
 
 # Create a logger
 LOGGER = logging.getLogger(__name__)
 LOGGER.setLevel(logging.DEBUG)
 
-log_path = os.environ.get('LOGS_PATH')
+# Console handler, plus the INFO and DEBUG files when LOGS_PATH is usable
+console_handler = BatchedStreamHandler()
+console_handler.setLevel(logging.DEBUG)
+handlers = [*_file_handlers(LOG_PATH), console_handler]
+formatter = JsonFormatter() if LOG_FORMAT == 'json' else logging.Formatter(TEXT_FORMAT)
+for handler in handlers:
+    handler.setFormatter(formatter)
 
-# Create a file handler and set level to INFO
-current_datetime = datetime.now().strftime("%Y_%m_%d__%H_%M_%S")
-log_file_info = os.path.join(log_path, f'animal_INFO_{current_datetime}.txt')
-log_file_debug = os.path.join(log_path, f'animal_DEBUG_{current_datetime}.txt')
+# Callers only enqueue the record, the handlers write from the listener thread
+QUEUE_HANDLER = logging.handlers.QueueHandler(queue.SimpleQueue())
+QUEUE_HANDLER.addFilter(RateLimitFilter(LOG_DEBUG_LIMIT))
+LOGGER.addHandler(QUEUE_HANDLER)
+LISTENER = BatchingQueueListener(QUEUE_HANDLER.queue, *handlers)
+LISTENER.start()
 
-file_handler_info = logging.FileHandler(log_file_info)
-file_handler_debug = logging.FileHandler(log_file_debug)
-file_handler_info.setLevel(logging.INFO)
-file_handler_debug.setLevel(logging.DEBUG)
 
-# Create a console handler and set level to INFO
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.DEBUG)
+def _stop_logging() -> None:
+    # Drain the queue and close the handlers before the interpreter tears their streams down
+    LISTENER.stop()
+    for handler in handlers:
+        handler.flush_batch()
+        handler.close()
 
-# Create a formatter and set it for both handlers
-formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-file_handler_info.setFormatter(formatter)
-file_handler_debug.setFormatter(formatter)
-console_handler.setFormatter(formatter)
 
-# Add both handlers to the logger
-LOGGER.addHandler(file_handler_info)
-LOGGER.addHandler(file_handler_debug)
-LOGGER.addHandler(console_handler)
+atexit.register(_stop_logging)
+if not LOG_PATH:
+    LOGGER.warning("LOGS_PATH is not set, logging to the console only.")
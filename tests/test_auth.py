@@ -0,0 +1,43 @@
+import pytest
+
+sqlalchemy = pytest.importorskip('sqlalchemy')
+
+from animal_logger.src.db.auth import AuthService, hash_password, verify_password
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = sqlalchemy.create_engine(f"sqlite:///{tmp_path / 'credentials.db'}")
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE login_app (username TEXT PRIMARY KEY, password TEXT)")
+        conn.exec_driver_sql("INSERT INTO login_app VALUES ('keeper', 'savanna')")
+    yield engine
+    engine.dispose()
+
+
+def stored_password(engine, username):
+    with engine.connect() as conn:
+        return conn.exec_driver_sql("SELECT password FROM login_app WHERE username = ?", (username,)).scalar()
+
+
+def test_verify_password():
+    stored_hash = hash_password('ñandú', iterations=1_000)
+    assert verify_password('ñandú', stored_hash)
+    assert verify_password('ñandú', stored_hash.encode())
+    assert not verify_password('nandu', stored_hash)
+
+
+@pytest.mark.parametrize('stored', ['savanna', 'pbkdf2_sha256$x$salt$00', 'pbkdf2_sha256$0$salt$00',
+                                    'pbkdf2_sha256$10$sälz$ünïcode', b'\xff\xfe', None])
+def test_malformed_hashes_do_not_match(stored):
+    assert not verify_password('savanna', stored)
+
+
+def test_legacy_password_is_hashed_on_login(engine):
+    service = AuthService(engine, schema=None)
+    assert not service.authenticate('keeper', 'wrong')
+    assert stored_password(engine, 'keeper') == 'savanna'
+    assert service.authenticate('keeper', 'savanna')
+    assert verify_password('savanna', stored_password(engine, 'keeper'))
+    service.invalidate()
+    assert service.authenticate('keeper', 'savanna')
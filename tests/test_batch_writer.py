@@ -0,0 +1,125 @@
+import sqlite3
+import threading
+
+import pytest
+
+sqlalchemy = pytest.importorskip('sqlalchemy')
+
+from animal_logger.src.db.batch_writer import ConcurrentBatchWriter, _is_transient
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = sqlalchemy.create_engine(f"sqlite:///{tmp_path / 'animals.db'}",
+                                      connect_args={'timeout': 10, 'check_same_thread': False})
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def table(engine):
+    table = sqlalchemy.Table('animals', sqlalchemy.MetaData(),
+                             sqlalchemy.Column('id', sqlalchemy.Integer, primary_key=True),
+                             sqlalchemy.Column('name', sqlalchemy.String(50), nullable=False))
+    table.create(engine)
+    return table
+
+
+def count_rows(engine, table):
+    with engine.connect() as conn:
+        return conn.execute(sqlalchemy.select(sqlalchemy.func.count()).select_from(table)).scalar()
+
+
+def test_write_in_batches(engine, table):
+    data = {'id': list(range(1000)), 'name': [f'animal_{i}' for i in range(1000)]}
+    metrics = ConcurrentBatchWriter(engine, max_workers=4).write(data, table, batch_size=100)
+    assert metrics.rows_written == 1000
+    assert metrics.batches == 10
+    assert metrics.failed_batches == 0
+    assert count_rows(engine, table) == 1000
+
+
+def test_clashing_rows_are_bisected_out(engine, table):
+    with engine.begin() as conn:
+        conn.execute(table.insert(), [{'id': 3, 'name': 'old'}, {'id': 77, 'name': 'old'}])
+    data = {'id': list(range(100)), 'name': ['new'] * 100}
+    metrics = ConcurrentBatchWriter(engine, max_workers=2).write(data, table, batch_size=50)
+    assert (metrics.rows_written, metrics.rows_skipped, metrics.failed_batches) == (98, 2, 0)
+    assert count_rows(engine, table) == 100
+    with engine.connect() as conn:
+        names = dict(conn.execute(sqlalchemy.select(table.c.id, table.c.name).where(table.c.id.in_([3, 4]))).all())
+    assert names == {3: 'old', 4: 'new'}
+
+
+def test_transient_errors_are_retried(engine, table, monkeypatch):
+    writer = ConcurrentBatchWriter(engine, max_workers=1, retry_backoff=0)
+    original = writer._insert_with_savepoints
+    calls = []
+
+    def locked_once(*args):
+        calls.append(1)
+        if len(calls) == 1:
+            raise sqlalchemy.exc.OperationalError('INSERT', {}, sqlite3.OperationalError('database is locked'))
+        return original(*args)
+
+    monkeypatch.setattr(writer, '_insert_with_savepoints', locked_once)
+    metrics = writer.write({'id': [1, 2], 'name': ['a', 'b']}, table)
+    assert (metrics.rows_written, metrics.retries, metrics.failed_batches) == (2, 1, 0)
+
+
+def test_permanent_errors_are_not_retried(engine, table):
+    missing = sqlalchemy.Table('missing', sqlalchemy.MetaData(),
+                               sqlalchemy.Column('id', sqlalchemy.Integer, primary_key=True))
+    metrics = ConcurrentBatchWriter(engine, max_workers=1, retry_backoff=0).write({'id': [1]}, missing)
+    assert (metrics.rows_written, metrics.retries, metrics.failed_batches) == (0, 0, 1)
+
+
+def test_is_transient():
+    def error(message):
+        return sqlalchemy.exc.OperationalError('SELECT', {}, sqlite3.OperationalError(message))
+
+    assert _is_transient(error('database is locked'))
+    assert not _is_transient(error('no such table: animals'))
+    assert not _is_transient(error('near "SELEC": syntax error'))
+
+
+def test_concurrent_writers(engine, table):
+    errors = []
+
+    def write(offset):
+        data = {'id': list(range(offset, offset + 500)), 'name': ['x'] * 500}
+        metrics = ConcurrentBatchWriter(engine, max_workers=2).write(data, table, batch_size=50)
+        if metrics.failed_batches or metrics.rows_written != 500:
+            errors.append(str(metrics))
+
+    threads = [threading.Thread(target=write, args=(offset,)) for offset in range(0, 2000, 500)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert count_rows(engine, table) == 2000
+
+
+def test_other_connections_keep_the_driver_transactions(engine, table):
+    ConcurrentBatchWriter(engine, max_workers=1).write({'id': [1], 'name': ['a']}, table)
+    with engine.connect() as conn:
+        # The writer puts its connection back in the pool as it found it
+        assert conn.connection.dbapi_connection.isolation_level == ''
+
+
+def test_on_written_gets_only_the_rows_written(engine, table):
+    with engine.begin() as conn:
+        conn.execute(table.insert(), [{'id': 3, 'name': 'old'}])
+    written = []
+    writer = ConcurrentBatchWriter(engine, max_workers=1, on_written=lambda _, columns, rows, updated: written.extend(rows))
+    writer.write({'id': [1, 2, 3, 4], 'name': ['a', 'b', 'new', 'd']}, table, batch_size=2)
+    assert sorted(written) == [(1, 'a'), (2, 'b'), (4, 'd')]
+
+
+def test_failing_listener_does_not_fail_the_batch(engine, table):
+    def listener(*args):
+        raise RuntimeError('listener bug')
+
+    metrics = ConcurrentBatchWriter(engine, max_workers=1, on_written=listener).write({'id': [1], 'name': ['a']}, table)
+    assert (metrics.rows_written, metrics.failed_batches, metrics.retries) == (1, 0, 0)
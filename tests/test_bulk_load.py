@@ -0,0 +1,47 @@
+import pytest
+
+sqlalchemy = pytest.importorskip('sqlalchemy')
+
+from animal_logger.src.db.bulk_load import BulkLoader, iter_row_batches
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = sqlalchemy.create_engine(f"sqlite:///{tmp_path / 'animals.db'}")
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def table(engine):
+    table = sqlalchemy.Table('animals', sqlalchemy.MetaData(),
+                             sqlalchemy.Column('id', sqlalchemy.Integer, primary_key=True),
+                             sqlalchemy.Column('name', sqlalchemy.String(50)))
+    table.create(engine)
+    return table
+
+
+def test_columnar_dict_is_split_in_batches():
+    data = {'id': list(range(7)), 'name': [f'animal_{idx}' for idx in range(7)]}
+    batches = list(iter_row_batches(data, batch_size=3))
+    assert [len(rows) for _, rows in batches] == [3, 3, 1]
+    assert batches[0] == (['id', 'name'], [(0, 'animal_0'), (1, 'animal_1'), (2, 'animal_2')])
+
+
+def test_sqlite_falls_back_to_executemany(engine, table):
+    loader = BulkLoader(engine)
+    assert not loader.supports_copy
+    stats = loader.load({'id': list(range(25)), 'name': ['x'] * 25}, table, batch_size=10)
+    assert (stats.rows, stats.batches, stats.failed_batches) == (25, 3, 0)
+    with engine.connect() as conn:
+        assert conn.execute(sqlalchemy.select(sqlalchemy.func.count()).select_from(table)).scalar() == 25
+
+
+def test_failed_batch_does_not_stop_the_load(engine, table):
+    with engine.begin() as conn:
+        conn.execute(table.insert(), [{'id': 3, 'name': 'taken'}])
+    stats = BulkLoader(engine).load({'id': list(range(6)), 'name': ['x'] * 6}, table, batch_size=3)
+    assert (stats.rows, stats.batches, stats.failed_batches) == (3, 2, 1)
+    with engine.connect() as conn:
+        ids = conn.execute(sqlalchemy.select(table.c.id).order_by(table.c.id)).scalars().all()
+    assert ids == [0, 1, 2, 3]
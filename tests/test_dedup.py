@@ -0,0 +1,19 @@
+from collections import Counter
+
+import pytest
+
+from animal_logger.src.db.dedup import remove_duplicates
+
+
+def test_plain_columns_keep_the_first_or_last_row():
+    data = {'id': [1, 1, 2, 1], 'name': ('a', 'b', 'c', 'd')}
+    assert remove_duplicates(data) == ({'id': [1, 2], 'name': ['a', 'c']}, Counter({1: 2}))
+    assert remove_duplicates(data, keep='last')[0] == {'id': [2, 1], 'name': ['c', 'd']}
+
+
+def test_composite_keys_on_arrays():
+    np = pytest.importorskip('numpy')
+    data = {'herd': np.array([1, 1, 2]), 'id': np.array([7, 7, 7]), 'age': np.array([3.0, 4.0, 5.0])}
+    deduplicated, dropped = remove_duplicates(data, keys=['herd', 'id'])
+    assert deduplicated['age'].tolist() == [3.0, 5.0]
+    assert dropped == Counter({(1, 7): 1})
@@ -0,0 +1,73 @@
+import pytest
+
+sqlalchemy = pytest.importorskip('sqlalchemy')
+
+from animal_logger.src.db.import_pipeline import ImportPipeline, iter_chunks
+from animal_logger.src.db.utils_db import UtilsDB
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = sqlalchemy.create_engine(f"sqlite:///{tmp_path / 'animals.db'}")
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def table(engine):
+    table = sqlalchemy.Table('animals', sqlalchemy.MetaData(),
+                             sqlalchemy.Column('id', sqlalchemy.Integer, primary_key=True),
+                             sqlalchemy.Column('name', sqlalchemy.String(50)),
+                             sqlalchemy.Column('age', sqlalchemy.Integer))
+    table.create(engine)
+    return table
+
+
+@pytest.fixture
+def csv_file(tmp_path):
+    path = tmp_path / 'animals.csv'
+    # Ids 2 and 5 come back in later chunks, row 7 has an invalid age
+    lines = ['id,name,age', '1,leo,3', '2,zara,4', '3,kim,1', '2,zara again,4', '4,max,2', '5,ana,7',
+             '5,ana again,7', '6,bo,5', '7,rex,old', '8,tom,9']
+    path.write_text('\n'.join(lines) + '\n')
+    return path
+
+
+def rows_of(engine, table):
+    with engine.connect() as conn:
+        return dict(conn.execute(sqlalchemy.select(table.c.id, table.c.name).order_by(table.c.id)).all())
+
+
+def test_chunks_resume_from_their_position(csv_file):
+    chunks = list(iter_chunks(csv_file, 'csv', 4))
+    resumed = list(iter_chunks(csv_file, 'csv', 4, chunks[0].position, chunks[0].columns))
+    assert [chunk.rows for chunk in resumed] == [chunk.rows for chunk in chunks[1:]]
+
+
+def test_duplicates_across_chunks_are_dropped(engine, table, csv_file, tmp_path):
+    stats = ImportPipeline(engine, table, tmp_path / 'state.db', chunk_size=3).run(csv_file)
+    assert (stats.chunks, stats.rows_read, stats.rows_loaded, stats.duplicates, stats.rows_rejected) == (4, 10, 7, 2, 1)
+    assert rows_of(engine, table) == {1: 'leo', 2: 'zara', 3: 'kim', 4: 'max', 5: 'ana', 6: 'bo', 8: 'tom'}
+    again = ImportPipeline(engine, table, tmp_path / 'state.db', chunk_size=3).run(csv_file)
+    assert again.rows_read == 0
+
+
+def test_failed_import_resumes_after_the_last_chunk(engine, table, csv_file, tmp_path, monkeypatch):
+    insert = UtilsDB.insert_dict_in_db
+    calls = []
+
+    def fail_on_second_chunk(self, data_dict, *args, **kwargs):
+        calls.append(data_dict['id'])
+        if len(calls) == 2:
+            raise ConnectionError('database went away')
+        return insert(self, data_dict, *args, **kwargs)
+
+    monkeypatch.setattr(UtilsDB, 'insert_dict_in_db', fail_on_second_chunk)
+    with pytest.raises(ConnectionError):
+        ImportPipeline(engine, table, tmp_path / 'state.db', chunk_size=3).run(csv_file)
+    assert rows_of(engine, table) == {1: 'leo', 2: 'zara', 3: 'kim'}
+    monkeypatch.setattr(UtilsDB, 'insert_dict_in_db', insert)
+    stats = ImportPipeline(engine, table, tmp_path / 'state.db', chunk_size=3).run(csv_file)
+    assert stats.resumed_from > 0 and stats.rows_read == 7
+    assert stats.duplicates == 2  # id 2 was committed by the first run, id 5 repeats within the rest
+    assert sorted(rows_of(engine, table)) == [1, 2, 3, 4, 5, 6, 8]
@@ -0,0 +1,30 @@
+import logging
+
+from config.log_config import RotatingLogFileHandler
+
+
+def write(handler, message):
+    handler.handle(logging.makeLogRecord({'msg': message, 'levelno': logging.INFO, 'levelname': 'INFO'}))
+
+
+def test_size_rollovers_keep_every_file(tmp_path):
+    handler = RotatingLogFileHandler(str(tmp_path / 'app.log'), max_bytes=50, backup_count=2)
+    for idx in range(6):
+        write(handler, f'record {idx} ' + 'x' * 30)
+    handler.close()
+    rotated = sorted(path.name for path in tmp_path.iterdir() if path.name != 'app.log')
+    # Rollovers within the same second get a counter instead of replacing each other
+    assert len(rotated) == 5
+    assert all(name.startswith('app.log.') for name in rotated)
+
+
+def test_retention_counts_days(tmp_path):
+    for day in range(1, 6):
+        for second in range(3):
+            (tmp_path / f'app.log.2026-01-0{day}_10-00-0{second}').touch()
+    (tmp_path / 'app.log.2026-01-05_10-00-02.1').touch()
+    (tmp_path / 'other.log.2026-01-01_10-00-00').touch()
+    handler = RotatingLogFileHandler(str(tmp_path / 'app.log'), backup_count=2)
+    to_delete = sorted(path.rsplit('/', 1)[-1] for path in handler.getFilesToDelete())
+    handler.close()
+    assert to_delete == [f'app.log.2026-01-0{day}_10-00-0{second}' for day in range(1, 4) for second in range(3)]
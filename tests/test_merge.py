@@ -0,0 +1,88 @@
+from decimal import Decimal
+
+import pytest
+
+sqlalchemy = pytest.importorskip('sqlalchemy')
+
+from animal_logger.src.db.batch_writer import ConcurrentBatchWriter
+from animal_logger.src.db.merge import BatchMerger, _key
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = sqlalchemy.create_engine(f"sqlite:///{tmp_path / 'animals.db'}")
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def table(engine):
+    table = sqlalchemy.Table('animals', sqlalchemy.MetaData(),
+                             sqlalchemy.Column('id', sqlalchemy.Integer, primary_key=True),
+                             sqlalchemy.Column('name', sqlalchemy.String(50)),
+                             sqlalchemy.Column('age', sqlalchemy.Integer),
+                             sqlalchemy.Column('sightings', sqlalchemy.Integer))
+    table.create(engine)
+    with engine.begin() as conn:
+        conn.execute(table.insert(), [{'id': 1, 'name': 'leo', 'age': 5, 'sightings': 2},
+                                      {'id': 2, 'name': 'zara', 'age': 3, 'sightings': 1}])
+    return table
+
+
+def rows_of(engine, table):
+    with engine.connect() as conn:
+        return {row.id: tuple(row)[1:] for row in conn.execute(sqlalchemy.select(table))}
+
+
+def test_update_splits_inserted_and_updated_rows(engine, table):
+    columns = ['id', 'name', 'age', 'sightings']
+    rows = [(1, 'leo', 6, 1), (3, 'kim', 1, 1)]
+    with engine.begin() as conn:
+        result = BatchMerger(table, 'sqlite').merge(conn, columns, rows)
+    assert result.inserted == [(3, 'kim', 1, 1)]
+    assert result.updated == [(1, 'leo', 6, 1)]
+    assert result.skipped == []
+    assert rows_of(engine, table)[1] == ('leo', 6, 1)
+
+
+def test_nothing_skips_existing_rows(engine, table):
+    with engine.begin() as conn:
+        result = BatchMerger(table, 'sqlite', on_conflict='nothing').merge(conn, ['id', 'name'],
+                                                                           [(2, 'other'), (4, 'max')])
+    assert (result.inserted, result.updated, result.skipped) == ([(4, 'max')], [], [(2, 'other')])
+    assert rows_of(engine, table)[2][0] == 'zara'
+
+
+def test_update_policies(engine, table):
+    policies = {'name': 'keep', 'age': 'greatest', 'sightings': 'add'}
+    with engine.begin() as conn:
+        BatchMerger(table, 'sqlite', update_policies=policies).merge(
+            conn, ['id', 'name', 'age', 'sightings'], [(1, 'renamed', 4, 3), (2, None, 7, None)])
+    assert rows_of(engine, table) == {1: ('leo', 5, 5), 2: ('zara', 7, 1)}
+
+
+def test_keys_given_as_text_are_matched(engine, table):
+    with engine.begin() as conn:
+        result = BatchMerger(table, 'sqlite').merge(conn, ['id', 'age'], [('1', 9)])
+    assert (len(result.inserted), len(result.updated)) == (0, 1)
+
+
+def test_keys_of_other_numeric_types_are_matched(engine, table):
+    with engine.begin() as conn:
+        result = BatchMerger(table, 'sqlite').merge(conn, ['id', 'age'], [(1.0, 9), (7.0, 4)])
+    assert (result.updated, result.inserted) == ([(1.0, 9)], [(7.0, 4)])
+    assert _key((Decimal('1'), 'x'), [0], [int]) == _key(('1', 'y'), [0], [int]) == (1,)
+
+
+def test_writer_reports_inserted_and_updated_rows(engine, table):
+    notified = []
+    writer = ConcurrentBatchWriter(engine, max_workers=1, on_conflict='update',
+                                   on_written=lambda _, columns, inserted, updated: notified.append((inserted, updated)))
+    metrics = writer.write({'id': [1, 5], 'name': ['leo', 'ana']}, table)
+    assert (metrics.rows_written, metrics.rows_updated, metrics.rows_skipped) == (1, 1, 0)
+    assert notified == [([(5, 'ana')], [(1, 'leo')])]
+
+
+def test_unknown_policy_is_rejected(table):
+    with pytest.raises(ValueError):
+        BatchMerger(table, 'sqlite', update_policies={'age': 'average'})
@@ -0,0 +1,47 @@
+import pytest
+
+sqlalchemy = pytest.importorskip('sqlalchemy')
+
+from animal_logger.src.db.model_registry import ModelRegistry
+
+
+def columns():
+    return {'id': sqlalchemy.Column(sqlalchemy.Integer, primary_key=True), 'name': sqlalchemy.Column(sqlalchemy.String(50))}
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = sqlalchemy.create_engine(f"sqlite:///{tmp_path / 'animals.db'}")
+    yield engine
+    engine.dispose()
+
+
+def test_same_table_returns_the_same_class():
+    registry = ModelRegistry()
+    model = registry.create_dynamic_model('RegistryLions', 'registry_lions', 'main', columns())
+    assert registry.create_dynamic_model('RegistryLions', 'registry_lions', 'main', columns()) is model
+    assert registry.get('registry_lions') is model and registry.get('registry_lions', 'main') is model
+    with pytest.raises(KeyError):
+        registry.get('registry_unknown')
+
+
+def test_only_missing_tables_are_created(engine):
+    registry = ModelRegistry()
+    present = registry.create_dynamic_model('RegistryOwls', 'registry_owls', 'main', columns())
+    missing = registry.create_dynamic_model('RegistryTrouts', 'registry_trouts', 'main', columns())
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE registry_owls (id INTEGER PRIMARY KEY, name TEXT)")
+    assert registry.create_missing(engine, [present, missing]) == [missing]
+    assert registry.create_missing(engine, [present, missing]) == []
+    assert {'registry_owls', 'registry_trouts'} <= set(sqlalchemy.inspect(engine).get_table_names())
+
+
+def test_tables_dropped_elsewhere_are_seen_after_refresh(engine):
+    registry = ModelRegistry()
+    model = registry.create_dynamic_model('RegistryFrogs', 'registry_frogs', 'main', columns())
+    assert registry.create_missing(engine, [model]) == [model]
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP TABLE registry_frogs")
+    assert registry.create_missing(engine, [model]) == []
+    registry.refresh()
+    assert registry.create_missing(engine, [model]) == [model]
@@ -0,0 +1,55 @@
+import pytest
+
+sqlalchemy = pytest.importorskip('sqlalchemy')
+
+from animal_logger.src.db.pager import KeysetPager
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = sqlalchemy.create_engine(f"sqlite:///{tmp_path / 'animals.db'}")
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE animals (id INTEGER PRIMARY KEY, name TEXT, age INTEGER)")
+        conn.exec_driver_sql("INSERT INTO animals VALUES (?, ?, ?)", [(idx, f'animal_{idx}', idx % 3) for idx in range(10)])
+    yield engine
+    engine.dispose()
+
+
+def ids(page):
+    return [row[0] for row in page.rows]
+
+
+def test_first_page_and_the_following_ones(engine):
+    pager = KeysetPager(engine, None, 'animals', ['id', 'name'], page_size=4)
+    first = pager.first_page()
+    assert first.columns == ['id', 'name']
+    assert (ids(first), first.has_more) == ([0, 1, 2, 3], True)
+    second = pager.page_after(first.last_key)
+    assert (ids(second), second.has_more) == ([4, 5, 6, 7], True)
+    last = pager.page_after(second.last_key)
+    assert (ids(last), last.has_more) == ([8, 9], False)
+
+
+def test_page_before_comes_back_in_display_order(engine):
+    pager = KeysetPager(engine, None, 'animals', ['id'], page_size=4)
+    second = pager.page_after(pager.first_page().last_key)
+    previous = pager.page_before(second.first_key)
+    assert (ids(previous), previous.has_more) == ([0, 1, 2, 3], False)
+
+
+def test_repeated_sort_values_are_ordered_by_id(engine):
+    pager = KeysetPager(engine, None, 'animals', ['id'], sort_col='age', descending=True, page_size=3)
+    pages, page = [], pager.first_page()
+    while True:
+        pages.append(ids(page))
+        if not page.has_more:
+            break
+        page = pager.page_after(page.last_key)
+    assert pages == [[8, 5, 2], [7, 4, 1], [9, 6, 3], [0]]
+    assert ids(pager.page_before(page.first_key)) == [9, 6, 3]
+
+
+def test_filters_apply_to_pages_and_count(engine):
+    pager = KeysetPager(engine, None, 'animals', ['id'], {'age': 0}, page_size=2)
+    assert pager.count() == 4
+    assert ids(pager.page_after(pager.first_page().last_key)) == [6, 9]
@@ -0,0 +1,49 @@
+import pytest
+
+sqlalchemy = pytest.importorskip('sqlalchemy')
+
+from animal_logger.src.db.partitioned_reader import PartitionedReader
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = sqlalchemy.create_engine(f"sqlite:///{tmp_path / 'animals.db'}")
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE animals (id INTEGER PRIMARY KEY, name TEXT, age INTEGER)")
+        conn.exec_driver_sql("INSERT INTO animals VALUES (?, ?, ?)",
+                             [(idx, f'animal_{idx}', idx % 20) for idx in range(1000)])
+        conn.exec_driver_sql("CREATE TABLE species (id TEXT PRIMARY KEY, name TEXT)")
+        conn.exec_driver_sql("INSERT INTO species VALUES ('felis', 'cat'), ('canis', 'dog')")
+    yield engine
+    engine.dispose()
+
+
+def test_partitions_split_the_index_range(engine):
+    reader = PartitionedReader(engine, None, 'animals', npartitions=4)
+    assert reader.divisions == [0, 249, 499, 749, 999]
+
+
+def test_partitions_follow_the_row_count(engine):
+    assert len(PartitionedReader(engine, None, 'animals', rows_per_partition=300).divisions) == 5
+    assert PartitionedReader(engine, None, 'animals', rows_per_partition=5000).divisions == [0, 999]
+
+
+def test_filters_narrow_the_range(engine):
+    reader = PartitionedReader(engine, None, 'animals', filters={'id': ('>=', 900), 'age': ('<', 5)}, npartitions=2)
+    assert reader.divisions == [900, 942, 984]
+
+
+def test_single_value_and_empty_tables(engine):
+    assert PartitionedReader(engine, None, 'animals', filters={'id': 7}).divisions == [7, 7]
+    assert PartitionedReader(engine, None, 'animals', filters={'id': -1}).divisions == []
+
+
+def test_text_index_is_read_in_one_partition(engine):
+    assert PartitionedReader(engine, None, 'species', npartitions=4).divisions == ['canis', 'felis']
+
+
+def test_partitions_cover_every_row_once(engine):
+    pytest.importorskip('pandas')
+    partitions = list(PartitionedReader(engine, None, 'animals', columns=['age'], npartitions=3).iter_partitions())
+    assert len(partitions) == 3
+    assert sorted(idx for partition in partitions for idx in partition.index) == list(range(1000))
@@ -0,0 +1,59 @@
+import pytest
+
+sqlalchemy = pytest.importorskip('sqlalchemy')
+
+from animal_logger.src.db.pager import KeysetPager
+from animal_logger.src.db.query import LARGE_LIST_THRESHOLD, build_select, filtered_select, has_large_lists
+
+ROWS = 50_000  # more than the bound parameters SQLite accepts in one statement
+
+
+@pytest.fixture(scope='module')
+def engine(tmp_path_factory):
+    engine = sqlalchemy.create_engine(f"sqlite:///{tmp_path_factory.mktemp('query') / 'animals.db'}")
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE animals (id INTEGER PRIMARY KEY, name TEXT, age INTEGER)")
+        conn.exec_driver_sql("INSERT INTO animals VALUES (?, ?, ?)",
+                             [(idx, f'animal_{idx}', idx % 20) for idx in range(ROWS)])
+    yield engine
+    engine.dispose()
+
+
+def test_projection_filters_order_and_limit(engine):
+    stmt = build_select(None, 'animals', ['id', 'name'], {'age': ('>=', 18), 'id': [1, 18, 19, 38, 39]},
+                        order_by='-id', limit=2, dialect_name='sqlite')
+    with engine.connect() as conn:
+        assert conn.execute(stmt).all() == [(39, 'animal_39'), (38, 'animal_38')]
+
+
+def test_null_and_like_filters(engine):
+    stmt = build_select(None, 'animals', ['id'], {'name': ('like', 'animal_1234%'), 'age': None})
+    with engine.connect() as conn:
+        assert conn.execute(stmt).all() == []
+
+
+def test_large_lists_are_joined_from_a_temp_table(engine):
+    ids = list(range(0, ROWS, 2))
+    assert len(ids) > LARGE_LIST_THRESHOLD and has_large_lists({'id': ids}, 'sqlite')
+    assert not has_large_lists({'id': ids}, 'postgresql')
+    with engine.connect() as conn:
+        with filtered_select(conn, None, 'animals', ['id'], {'id': ids, 'age': ('in', list(range(10)))}) as stmt:
+            rows = conn.execute(stmt).scalars().all()
+        temp_tables = conn.exec_driver_sql("SELECT name FROM sqlite_temp_master WHERE type = 'table'").all()
+    assert rows == [idx for idx in ids if idx % 20 < 10]
+    assert temp_tables == []
+
+
+def test_pager_with_a_large_list(engine):
+    ids = list(range(5, ROWS, 5))
+    pager = KeysetPager(engine, None, 'animals', ['name'], {'id': ids}, page_size=3)
+    assert pager.count() == len(ids)
+    assert [row[0] for row in pager.first_page().rows] == ['animal_5', 'animal_10', 'animal_15']
+
+
+def test_read_query(engine):
+    pytest.importorskip('pandas')
+    from animal_logger.src.db.query import read_query
+    df = read_query(engine, None, 'animals', ['name'], {'id': list(range(3000))}, order_by='id', limit=5)
+    assert list(df.columns) == ['name']
+    assert list(df.index) == [0, 1, 2, 3, 4]
@@ -0,0 +1,67 @@
+from datetime import datetime
+
+import pytest
+
+sqlalchemy = pytest.importorskip('sqlalchemy')
+
+from animal_logger.src.db.recent import RecentFeed
+from animal_logger.src.db.utils_db import UtilsDB
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = sqlalchemy.create_engine(f"sqlite:///{tmp_path / 'animals.db'}")
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def table(engine):
+    table = sqlalchemy.Table('animals', sqlalchemy.MetaData(),
+                             sqlalchemy.Column('id', sqlalchemy.Integer, primary_key=True),
+                             sqlalchemy.Column('name', sqlalchemy.String(50)),
+                             sqlalchemy.Column('created_at', sqlalchemy.DateTime))
+    table.create(engine)
+    with engine.begin() as conn:
+        conn.execute(table.insert(), [{'id': idx, 'name': f'animal_{idx}', 'created_at': datetime(2024, 1, idx + 1)}
+                                      for idx in range(10)])
+    return table
+
+
+def names(feed, k=20):
+    return [activity.record['name'] for activity in feed.latest(k)]
+
+
+def test_warm_up_loads_the_newest_rows(engine, table):
+    feed = RecentFeed(engine, None, 'animals', ['id', 'name'], capacity=3).start()
+    try:
+        assert names(feed) == ['animal_9', 'animal_8', 'animal_7']
+        assert feed.latest(1)[0].timestamp == datetime(2024, 1, 10)
+        assert 'ix_animals_created_at' in {index['name'] for index in sqlalchemy.inspect(engine).get_indexes('animals')}
+    finally:
+        feed.stop()
+
+
+def test_inserts_and_edits_are_fed_by_the_listeners(engine, table):
+    feed = RecentFeed(engine, None, 'animals', ['id', 'name'], capacity=4).start()
+    try:
+        UtilsDB.notify_rows(table, ['id', 'name'], [(10, 'new'), (11, 'newer')], updated=[(3, 'renamed')])
+        feed.record_edit({'id': 4, 'name': 'edited'})
+        assert names(feed) == ['edited', 'renamed', 'newer', 'new']
+        assert [activity.kind for activity in feed.latest(2)] == ['edit', 'edit']
+        UtilsDB.notify_rows(sqlalchemy.table('other'), ['id', 'name'], [(1, 'elsewhere')])
+        assert len(feed) == 4 and 'elsewhere' not in names(feed)
+    finally:
+        feed.stop()
+    UtilsDB.notify_rows(table, ['id', 'name'], [(12, 'after stop')])
+    assert names(feed, 1) == ['edited']
+
+
+def test_table_without_time_column_uses_the_newest_ids(engine):
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE plain (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.exec_driver_sql("INSERT INTO plain VALUES (1, 'a'), (2, 'b'), (3, 'c')")
+    feed = RecentFeed(engine, None, 'plain', capacity=2)
+    feed.warm_up()
+    assert names(feed) == ['c', 'b']
+    assert feed.latest(1)[0].timestamp is None
@@ -0,0 +1,65 @@
+import pytest
+
+sqlalchemy = pytest.importorskip('sqlalchemy')
+
+from animal_logger.src.db.summary import HerdSummary, SummaryService, SummaryTable
+from animal_logger.src.db.utils_db import UtilsDB
+
+COLUMNS = ['id', 'class_', 'sex', 'species', 'age']
+ROWS = [(1, 'mammal', 'F', 'lion', 4), (2, 'mammal', 'M', 'lion', 7), (3, 'bird', 'F', 'owl', None)]
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = sqlalchemy.create_engine(f"sqlite:///{tmp_path / 'animals.db'}")
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def table(engine):
+    table = sqlalchemy.Table('animals', sqlalchemy.MetaData(),
+                             sqlalchemy.Column('id', sqlalchemy.Integer, primary_key=True),
+                             *(sqlalchemy.Column(col, sqlalchemy.String(50)) for col in COLUMNS[1:4]),
+                             sqlalchemy.Column('age', sqlalchemy.Float))
+    table.create(engine)
+    with engine.begin() as conn:
+        conn.execute(table.insert(), [dict(zip(COLUMNS, row)) for row in ROWS])
+    return table
+
+
+def test_incremental_summary():
+    summary = HerdSummary()
+    summary.add_rows(COLUMNS, ROWS)
+    snapshot = summary.snapshot()
+    assert snapshot['animals'] == 3 and snapshot['mean_age'] == 5.5
+    assert snapshot['by_class'] == {'mammal': 2, 'bird': 1}
+    assert snapshot['by_age'] == {'0-4': 1, '5-9': 1}
+
+
+def test_table_matches_the_incremental_summary(engine, table):
+    summary_table = SummaryTable(engine, 'main', 'animals')
+    summary_table.ensure()
+    from_table = HerdSummary.from_rows(summary_table.read()).snapshot()
+    incremental = HerdSummary()
+    incremental.add_rows(COLUMNS, ROWS)
+    expected = incremental.snapshot()
+    assert {key: value for key, value in from_table.items() if key != 'updated'} == \
+        {key: value for key, value in expected.items() if key != 'updated'}
+
+
+def test_service_follows_inserts_and_refreshes(engine, table):
+    service = SummaryService(engine, 'main', 'animals', refresh_interval=3600, min_interval=3600).start()
+    try:
+        assert service.snapshot()['animals'] == 3
+        new_rows = [(4, 'fish', 'M', 'trout', 2)]
+        with engine.begin() as conn:
+            conn.execute(table.insert(), [dict(zip(COLUMNS, row)) for row in new_rows])
+        UtilsDB.notify_rows(table, COLUMNS, new_rows)
+        assert service.snapshot()['by_class']['fish'] == 1
+        with engine.begin() as conn:
+            conn.execute(table.update().where(table.c.id == 4).values(class_='bird'))
+        service.refresh()
+        assert service.snapshot()['by_class'] == {'mammal': 2, 'bird': 2}
+    finally:
+        service.stop()
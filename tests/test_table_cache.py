@@ -0,0 +1,63 @@
+import pytest
+
+sqlalchemy = pytest.importorskip('sqlalchemy')
+pytest.importorskip('pandas')
+pytest.importorskip('pyarrow')
+
+from animal_logger.src.db.table_cache import TableCache
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = sqlalchemy.create_engine(f"sqlite:///{tmp_path / 'animals.db'}")
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE animals (id INTEGER PRIMARY KEY, name TEXT, updated_at INTEGER)")
+        conn.exec_driver_sql("INSERT INTO animals VALUES (?, ?, ?)", [(idx, f'animal_{idx}', 0) for idx in range(100)])
+    yield engine
+    engine.dispose()
+
+
+def test_unchanged_table_is_a_hit(engine, tmp_path):
+    cache = TableCache(tmp_path / 'cache')
+    first = cache.read(engine, None, 'animals')
+    second = cache.read(engine, None, 'animals')
+    assert (cache.misses, cache.hits) == (1, 1)
+    assert second.equals(first) and list(second.index) == list(range(100))
+
+
+def test_appended_rows_are_fetched_incrementally(engine, tmp_path):
+    cache = TableCache(tmp_path / 'cache')
+    cache.read(engine, None, 'animals')
+    with engine.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO animals VALUES (100, 'new', 0)")
+    df = cache.read(engine, None, 'animals')
+    assert (cache.misses, cache.incremental_refreshes) == (1, 1)
+    assert df.loc[100, 'name'] == 'new' and len(df) == 101
+
+
+def test_watermark_picks_up_changed_rows(engine, tmp_path):
+    cache = TableCache(tmp_path / 'cache')
+    cache.read(engine, None, 'animals', watermark_col='updated_at')
+    with engine.begin() as conn:
+        conn.exec_driver_sql("UPDATE animals SET name = 'renamed', updated_at = 1 WHERE id = 5")
+    df = cache.read(engine, None, 'animals', watermark_col='updated_at')
+    assert cache.incremental_refreshes == 1
+    assert df.loc[5, 'name'] == 'renamed' and len(df) == 100
+
+
+def test_deleted_rows_rebuild_the_entry(engine, tmp_path):
+    cache = TableCache(tmp_path / 'cache')
+    cache.read(engine, None, 'animals')
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DELETE FROM animals WHERE id < 10")
+    assert len(cache.read(engine, None, 'animals')) == 90
+    assert cache.misses == 2
+
+
+def test_least_recently_used_entries_are_evicted(engine, tmp_path):
+    cache = TableCache(tmp_path / 'cache', max_bytes=1)
+    cache.read(engine, None, 'animals', filters={'id': ('<', 50)})
+    cache.read(engine, None, 'animals', filters={'id': ('>=', 50)})
+    assert cache.evictions == 1
+    assert cache.stats()['entries'] == 1
+    assert len(list((tmp_path / 'cache').iterdir())) == 2  # the kept entry and the index file
@@ -0,0 +1,65 @@
+import pytest
+
+from animal_logger.src.animals.taxonomy import TaxonomyIndex
+
+CAT = {'class_': 'mammalia', 'order': 'carnivora', 'family': 'felidae', 'genus': 'felis', 'species': 'catus'}
+DOG = {'class_': 'mammalia', 'order': 'carnivora', 'family': 'canidae', 'genus': 'canis', 'species': 'familiaris'}
+COW = {'class_': 'mammalia', 'order': 'artiodactyla', 'family': 'bovidae', 'genus': 'bos', 'species': 'taurus'}
+
+
+def test_counts_follow_insertions_and_moves():
+    index = TaxonomyIndex()
+    index.add_rows([{**CAT, 'id': 1}, {**DOG, 'id': 2}, {**COW, 'id': 3}])
+    assert index.count_by_rank('order') == {'carnivora': 2, 'artiodactyla': 1}
+    index.add(COW, 2)  # the dog was mistyped
+    assert index.count_by_rank('order') == {'carnivora': 1, 'artiodactyla': 2}
+    assert index.count_by_rank('family') == {'felidae': 1, 'bovidae': 2}
+    assert index.count_under('class_', 'mammalia') == index.n_animals == 3
+
+
+def test_subtree_queries_see_later_insertions():
+    index = TaxonomyIndex()
+    cat = index.add(CAT, 1)
+    carnivora = index.find('order', 'carnivora')[0]
+    assert index.is_descendant(cat, carnivora)
+    dog = index.add(DOG, 2)
+    assert index.is_descendant(dog, carnivora) and not index.is_descendant(carnivora, dog)
+    assert set(index.subtree(carnivora)) >= {cat, dog}
+    assert sorted(index.animals_under('order', 'carnivora')) == [1, 2]
+    assert index.lineage(dog)['family'] == 'canidae'
+
+
+def test_save_and_load_keep_tuple_ids(tmp_path):
+    index = TaxonomyIndex()
+    index.add(CAT, ('herd_a', 1))
+    index.add(DOG, ('herd_b', 1))
+    index.save(tmp_path / 'taxonomy.json.gz')
+    loaded = TaxonomyIndex.load(tmp_path / 'taxonomy.json.gz')
+    assert loaded.lineage(loaded.node_of(('herd_a', 1))) == index.lineage(index.node_of(('herd_a', 1)))
+    loaded.add(COW, ('herd_b', 1))
+    assert loaded.count_by_rank('order') == {'carnivora': 1, 'artiodactyla': 1}
+
+
+def test_service_follows_inserts_and_reloads(tmp_path):
+    sqlalchemy = pytest.importorskip('sqlalchemy')
+    from animal_logger.src.db.taxonomy_service import TaxonomyService
+    from animal_logger.src.db.utils_db import UtilsDB
+    engine = sqlalchemy.create_engine(f"sqlite:///{tmp_path / 'animals.db'}")
+    metadata = sqlalchemy.MetaData()
+    records = sqlalchemy.Table('animals', metadata, sqlalchemy.Column('id', sqlalchemy.Integer, primary_key=True),
+                               *(sqlalchemy.Column(col, sqlalchemy.String) for col in CAT))
+    metadata.create_all(engine)
+    service = TaxonomyService(engine, None, 'animals', tmp_path / 'taxonomy.json.gz').start()
+    rows = [(1, *CAT.values()), (2, *DOG.values())]
+    with engine.begin() as conn:
+        conn.execute(records.insert(), [dict(zip(records.c.keys(), row)) for row in rows])
+    UtilsDB.notify_rows(records, records.c.keys(), rows)
+    assert service.count_by_rank('order') == {'carnivora': 2}
+    UtilsDB.notify_rows(records, records.c.keys(), [], updated=[(2, *COW.values())])
+    assert service.count_by_rank('order') == {'carnivora': 1, 'artiodactyla': 1}
+    service.stop()
+    UtilsDB.notify_rows(records, records.c.keys(), [(3, *COW.values())])
+    reloaded = TaxonomyService(engine, None, 'animals', tmp_path / 'taxonomy.json.gz').start()
+    assert reloaded.animals_under('order', 'artiodactyla') == [2]
+    reloaded.stop()
+    engine.dispose()
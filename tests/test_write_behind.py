@@ -0,0 +1,101 @@
+import pytest
+
+sqlalchemy = pytest.importorskip('sqlalchemy')
+
+from animal_logger.src.db.utils_db import UtilsDB
+from animal_logger.src.db.write_behind import WriteBehindQueue
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = sqlalchemy.create_engine(f"sqlite:///{tmp_path / 'animals.db'}")
+    table = sqlalchemy.Table('animals', sqlalchemy.MetaData(),
+                             sqlalchemy.Column('id', sqlalchemy.Integer, primary_key=True),
+                             sqlalchemy.Column('name', sqlalchemy.String(50)))
+    table.create(engine)
+    with engine.begin() as conn:
+        conn.execute(table.insert(), [{'id': 1, 'name': 'leo'}])
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def queue(engine, tmp_path):
+    queue = WriteBehindQueue(engine, None, tmp_path / 'journal.db')
+    yield queue
+    queue.journal.close()
+
+
+@pytest.fixture
+def inserted():
+    rows = []
+
+    def listener(table, data):
+        rows.extend(zip(data['id'], data['name']))
+
+    UtilsDB.add_insert_listener(listener)
+    yield rows
+    UtilsDB.remove_insert_listener(listener)
+
+
+def names(engine):
+    with engine.connect() as conn:
+        return dict(conn.execute(sqlalchemy.text("SELECT id, name FROM animals")).all())
+
+
+def test_records_are_written_and_notified(engine, queue, inserted):
+    queue.put('animals', {'id': 2, 'name': 'zara'})
+    queue.put('animals', {'id': 3, 'name': 'kim'})
+    assert queue.flush() == 2
+    assert names(engine) == {1: 'leo', 2: 'zara', 3: 'kim'}
+    assert sorted(inserted) == [(2, 'zara'), (3, 'kim')]
+    assert queue.state()[:3] == ('synced', 0, 0)
+
+
+def test_clashing_record_is_kept_with_its_error(engine, queue, inserted):
+    queue.put('animals', {'id': 1, 'name': 'other'})
+    queue.put('animals', {'id': 2, 'name': 'zara'})
+    queue.flush()
+    assert names(engine) == {1: 'leo', 2: 'zara'}
+    assert inserted == [(2, 'zara')]
+    state = queue.state()
+    assert (state.pending, state.failed) == (0, 1)
+    assert 'UNIQUE' in state.rejected_reason
+
+
+def test_records_committed_before_a_crash_are_not_written_again(engine, queue, monkeypatch):
+    # The form leaves the id to the table, so only the ledger tells a replay apart
+    queue.put('animals', {'name': 'zara'})
+    remove = queue.journal.remove
+    monkeypatch.setattr(queue.journal, 'remove', lambda seqs: (_ for _ in ()).throw(RuntimeError('crash')))
+    with pytest.raises(RuntimeError):
+        queue.flush()
+    monkeypatch.setattr(queue.journal, 'remove', remove)
+    queue.flush()
+    assert sorted(names(engine).values()) == ['leo', 'zara']
+    assert queue.journal.counts() == (0, 0)
+
+
+def test_sent_records_not_committed_are_written(engine, queue):
+    seq = queue.put('animals', {'name': 'zara'})
+    queue.journal.mark_sent([seq])
+    queue.flush()
+    assert sorted(names(engine).values()) == ['leo', 'zara']
+
+
+def test_records_of_another_user_are_left_aside(engine, queue, tmp_path):
+    queue.put('animals', {'name': 'zara'})
+    queue.journal.close()
+    other_engine = sqlalchemy.create_engine(f"sqlite:///{tmp_path / 'other.db'}")
+    other = WriteBehindQueue(other_engine, None, tmp_path / 'journal.db')
+    try:
+        assert other.journal.counts() == (0, 0)
+        assert other.flush() == 0
+    finally:
+        other.journal.close()
+        other_engine.dispose()
+
+
+def test_journal_is_opened_once(engine, queue, tmp_path):
+    with pytest.raises(RuntimeError):
+        WriteBehindQueue(engine, None, tmp_path / 'journal.db')